@@ -0,0 +1,123 @@
+"""
+Score the CISA KEV catalog with the closed-form risk formula
+Script: 10_score_vulnerabilities.py
+
+The vulnerability risk score is a fixed formula (risk_scoring.py), so the
+whole catalog is rescored in one vectorized NumPy pass instead of loading
+and running the models trained by 6_train_vulnerability_scoring.py. Writes
+data/processed/kev_risk_scores.csv (cveID, risk score, severity and the
+points of each component).
+
+Script 6's regressors learn this same formula, so they add nothing to
+its scores; --compare-model loads one of them and reports its time and
+error against the formula.
+
+Usage:
+    python scripts/10_score_vulnerabilities.py
+    python scripts/10_score_vulnerabilities.py --delta   # only the CVEs new/changed in the last KEV sync
+    python scripts/10_score_vulnerabilities.py --compare-model models/saved_models/vulnerability_scoring/xgb_regressor.pkl
+"""
+
+import argparse
+import os
+import time
+import warnings
+import joblib
+import numpy as np
+import pandas as pd
+from raw_store import load_cisa_kev, load_cisa_kev_delta
+from risk_scoring import kev_features, risk_components, risk_score, severity_labels
+from model_inputs import vulnerability_features
+warnings.filterwarnings('ignore')
+
+OUTPUT_PATH = 'data/processed/kev_risk_scores.csv'
+
+parser = argparse.ArgumentParser(description="Score the CISA KEV catalog with the closed-form risk formula")
+parser.add_argument('--delta', action='store_true',
+                    help="Score only the CVEs new or changed in the last CISA KEV sync")
+parser.add_argument('--compare-model', default=None,
+                    help="Saved script 6 regressor to time and compare against the formula")
+parser.add_argument('--output', default=OUTPUT_PATH,
+                    help=f"Scores CSV (default: {OUTPUT_PATH})")
+args = parser.parse_args()
+
+print("=" * 70)
+print("VULNERABILITY RISK SCORING (CISA KEV)")
+print("=" * 70)
+
+# ============================================
+# 1. LOAD CISA DATA
+# ============================================
+print("\n[1/3] Loading CISA KEV data...")
+
+columns = ['cveID', 'dateAdded', 'dueDate', 'shortDescription', 'knownRansomwareCampaignUse']
+if args.compare_model:
+    columns += ['vendorProject', 'product', 'vulnerabilityName']
+
+try:
+    df = load_cisa_kev_delta(columns=columns) if args.delta else load_cisa_kev(columns=columns)
+except FileNotFoundError as e:
+    print(f"❌ Error: {e}")
+    print("   Run '1_download_datasets.py' first")
+    exit(1)
+
+if len(df) == 0:
+    print("✅ No new or changed CVEs since the last sync - nothing to score")
+    exit(0)
+
+print(f"✅ Loaded {len(df):,} vulnerability records")
+
+# ============================================
+# 2. SCORE
+# ============================================
+print("\n[2/3] Scoring...")
+
+started = time.perf_counter()
+features = kev_features(df, risk_inputs_only=True)
+features_seconds = time.perf_counter() - started
+
+started = time.perf_counter()
+components = risk_components(features)
+scores = risk_score(features)
+severity = severity_labels(scores)
+score_seconds = time.perf_counter() - started
+
+print(f"   ✅ Scored {len(df):,} CVEs in {(features_seconds + score_seconds) * 1e3:.1f} ms "
+      f"(features {features_seconds * 1e3:.1f} ms, formula {score_seconds * 1e3:.2f} ms)")
+print(f"      Range: {scores.min():.1f} - {scores.max():.1f}, mean {scores.mean():.1f}")
+for label, count in pd.Series(severity).value_counts().reindex(['Low', 'Medium', 'High'], fill_value=0).items():
+    print(f"         {label}: {count:,}")
+
+if args.compare_model:
+    started = time.perf_counter()
+    model = joblib.load(args.compare_model)
+    load_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    predicted = model.predict(vulnerability_features(df))
+    predict_seconds = time.perf_counter() - started
+
+    print(f"\n   📊 {os.path.basename(args.compare_model)} vs formula:")
+    print(f"      Time: {load_seconds * 1e3:,.0f} ms load + {predict_seconds * 1e3:,.0f} ms features/predict "
+          f"vs {(features_seconds + score_seconds) * 1e3:.1f} ms")
+    print(f"      MAE: {np.mean(np.abs(predicted - scores)):.4f}, "
+          f"severity agreement: {np.mean(severity_labels(predicted) == severity):.2%}")
+
+# ============================================
+# 3. SAVE SCORES
+# ============================================
+print("\n[3/3] Saving scores...")
+
+scores_df = pd.DataFrame({
+    'cveID': df['cveID'].to_numpy(),
+    'risk_score': np.round(scores, 2),
+    'severity': severity,
+    **{f'{name}_points': np.round(points, 2) for name, points in components.items()},
+})
+
+os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+scores_df.to_csv(args.output, index=False)
+print(f"✅ Saved: {args.output}")
+
+print("\n" + "=" * 70)
+print("SCORING COMPLETE!")
+print("=" * 70)
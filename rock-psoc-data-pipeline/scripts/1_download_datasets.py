@@ -1,11 +1,36 @@
 """
 This script downloads cybersecurity datasets from the internet
 and saves them to the data/raw folder.
+
+Downloads are streamed to disk, resumed if interrupted, and skipped
+entirely when the remote file has not changed since the last run.
+
+Usage:
+    python scripts/1_download_datasets.py                 # one feed at a time
+    python scripts/1_download_datasets.py --concurrent    # all feeds in parallel
+    python scripts/1_download_datasets.py --concurrent --max-workers 2 --timeout 300
 """
 
-import requests
-import pandas as pd
+import argparse
+import json
+import time
 from pathlib import Path
+from downloader import fetch_all, print_timing_summary
+from kev_sync import sync_catalog, clear_delta
+from raw_store import (
+    convert_nsl_kdd, convert_cisa_kev, convert_phishing,
+    NSL_KDD_PARQUET, NSL_KDD_TEST_CSV, NSL_KDD_TEST_PARQUET,
+    CISA_KEV_PARQUET, PHISHING_PARQUET, HAS_PARQUET
+)
+
+parser = argparse.ArgumentParser(description="Download raw cybersecurity datasets")
+parser.add_argument('--concurrent', action='store_true',
+                    help="Download all feeds at the same time")
+parser.add_argument('--max-workers', type=int, default=4,
+                    help="Maximum simultaneous downloads in --concurrent mode (default: 4)")
+parser.add_argument('--timeout', type=float, default=None,
+                    help="Per-feed time budget in seconds (default: no limit)")
+args = parser.parse_args()
 
 # Create data folders if they don't exist
 Path('data/raw').mkdir(parents=True, exist_ok=True)
@@ -14,77 +39,157 @@ print("=" * 50)
 print("DATASET DOWNLOADER")
 print("=" * 50)
 
-# Dataset 1: NSL-KDD (Network Intrusion Detection)
-print("\n1. Downloading NSL-KDD dataset...")
-print("   This contains 125,000+ records of network attacks")
-
-try:
-    # Download the training dataset
-    url = "https://raw.githubusercontent.com/defcom17/NSL_KDD/master/KDDTrain%2B.txt"
-    
-    print("   Downloading... (this may take 1-2 minutes)")
-    response = requests.get(url)
-    
-    # Save to file
-    with open('data/raw/nsl_kdd_train.csv', 'wb') as f:
-        f.write(response.content)
-    
-    print("   ✅ Downloaded: data/raw/nsl_kdd_train.csv")
-    
-    # Read it to show you what's inside
-    df = pd.read_csv('data/raw/nsl_kdd_train.csv', header=None)
+# ============================================
+# DATA SOURCES
+# ============================================
+# To add a feed, append an entry here and (optionally) a summary function below.
+
+SOURCES = [
+    {
+        'name': 'NSL-KDD',
+        'title': 'NSL-KDD dataset',
+        'about': 'This contains 125,000+ records of network attacks',
+        'url': "https://raw.githubusercontent.com/defcom17/NSL_KDD/master/KDDTrain%2B.txt",
+        'dest': 'data/raw/nsl_kdd_train.csv',
+    },
+    {
+        'name': 'NSL-KDD Test',
+        'title': 'NSL-KDD test set',
+        'about': 'This contains 22,000+ held-out network records (used by --full processing)',
+        'url': "https://raw.githubusercontent.com/defcom17/NSL_KDD/master/KDDTest%2B.txt",
+        'dest': 'data/raw/nsl_kdd_test.csv',
+    },
+    {
+        'name': 'CISA KEV',
+        'title': 'CISA KEV catalog',
+        'about': 'This contains real vulnerabilities hackers are exploiting',
+        'url': "https://www.cisa.gov/sites/default/files/feeds/known_exploited_vulnerabilities.json",
+        'dest': 'data/raw/cisa_kev.json',
+    },
+    {
+        'name': 'Phishing',
+        'title': 'Phishing URLs dataset',
+        'about': 'This contains 11,000+ phishing website URLs',
+        'url': "https://raw.githubusercontent.com/GregaVrbancic/Phishing-Dataset/master/dataset_full.csv",
+        'dest': 'data/raw/phishing_urls.csv',
+    },
+]
+
+
+def is_current(result, parquet_path):
+    """True if the feed is unchanged and its columnar copy already exists"""
+    return result['status'] == 'cached' and (not HAS_PARQUET or Path(parquet_path).exists())
+
+
+def summarize_nsl_kdd(result):
+    if is_current(result, NSL_KDD_PARQUET):
+        print("   ✅ Unchanged since last run: data/raw/nsl_kdd_train.csv")
+        return
+
+    print(f"   ✅ Downloaded: data/raw/nsl_kdd_train.csv ({result['status']}, {result['bytes']:,} bytes)")
+
+    # Read it once with an explicit schema and keep a typed columnar copy
+    df = convert_nsl_kdd()
+    print(f"   💾 Columnar copy: {NSL_KDD_PARQUET}")
     print(f"   📊 Dataset size: {len(df)} rows, {len(df.columns)} columns")
     print(f"   👀 First row preview:")
     print(f"      {df.iloc[0][:5].tolist()}...")  # Show first 5 values
-    
-except Exception as e:
-    print(f"   ❌ Error: {e}")
-
-# Dataset 2: CISA Known Exploited Vulnerabilities
-print("\n2. Downloading CISA KEV catalog...")
-print("   This contains real vulnerabilities hackers are exploiting")
-
-try:
-    url = "https://www.cisa.gov/sites/default/files/feeds/known_exploited_vulnerabilities.json"
-    
-    print("   Downloading...")
-    response = requests.get(url)
-    data = response.json()
-    
-    # Convert to CSV for easier processing
-    df = pd.DataFrame(data['vulnerabilities'])
-    df.to_csv('data/raw/cisa_kev.csv', index=False)
-    
+
+
+def summarize_nsl_kdd_test(result):
+    if is_current(result, NSL_KDD_TEST_PARQUET):
+        print(f"   ✅ Unchanged since last run: {NSL_KDD_TEST_CSV}")
+        return
+
+    df = convert_nsl_kdd(NSL_KDD_TEST_CSV, NSL_KDD_TEST_PARQUET)
+    print(f"   ✅ Downloaded: {NSL_KDD_TEST_CSV} ({result['status']}, {result['bytes']:,} bytes)")
+    print(f"   💾 Columnar copy: {NSL_KDD_TEST_PARQUET}")
+    print(f"   📊 Dataset size: {len(df)} rows, {len(df.columns)} columns")
+
+
+def summarize_cisa(result):
+    if is_current(result, CISA_KEV_PARQUET) and Path('data/raw/cisa_kev.csv').exists():
+        clear_delta()
+        print("   ✅ Unchanged since last run: data/raw/cisa_kev.csv (empty delta)")
+        return
+
+    with open('data/raw/cisa_kev.json', 'r') as f:
+        data = json.load(f)
+
+    # Convert to CSV for easier processing, plus a typed columnar copy
+    df = convert_cisa_kev(data['vulnerabilities'])
+
     print("   ✅ Downloaded: data/raw/cisa_kev.csv")
+    print(f"   💾 Columnar copy: {CISA_KEV_PARQUET}")
     print(f"   📊 Dataset size: {len(df)} vulnerabilities")
     print(f"   👀 Sample vulnerability:")
     print(f"      CVE: {df.iloc[0]['cveID']}")
     print(f"      Name: {df.iloc[0]['vulnerabilityName']}")
-    
-except Exception as e:
-    print(f"   ❌ Error: {e}")
-
-# Dataset 3: Phishing URLs
-print("\n3. Downloading Phishing URLs dataset...")
-print("   This contains 11,000+ phishing website URLs")
-
-try:
-    # This dataset is from a GitHub repo
-    url = "https://raw.githubusercontent.com/GregaVrbancic/Phishing-Dataset/master/dataset_full.csv"
-    
-    print("   Downloading...")
-    df = pd.read_csv(url)
-    df.to_csv('data/raw/phishing_urls.csv', index=False)
-    
-    print("   ✅ Downloaded: data/raw/phishing_urls.csv")
+
+    # Record the catalog version and write the new/changed CVEs as a delta
+    sync = sync_catalog(data)
+    print(f"   🔄 Catalog version: {sync['previousVersion'] or 'none'} -> {sync['catalogVersion']} "
+          f"(released {sync['dateReleased']})")
+    print(f"      New: {len(sync['new'])}, Changed: {len(sync['changed'])}, "
+          f"Removed: {len(sync['removed'])}")
+    print("      Delta: data/raw/cisa_kev_delta.csv")
+
+
+def summarize_phishing(result):
+    if is_current(result, PHISHING_PARQUET):
+        print("   ✅ Unchanged since last run: data/raw/phishing_urls.csv")
+        return
+
+    df = convert_phishing()
+
+    print(f"   ✅ Downloaded: data/raw/phishing_urls.csv ({result['status']}, {result['bytes']:,} bytes)")
+    print(f"   💾 Columnar copy: {PHISHING_PARQUET}")
     print(f"   📊 Dataset size: {len(df)} URLs")
     print(f"   👀 Sample URL: {df.iloc[0]['url']}")
-    
-except Exception as e:
-    print(f"   ❌ Error: {e}")
+
+
+SUMMARIES = {
+    'NSL-KDD': summarize_nsl_kdd,
+    'NSL-KDD Test': summarize_nsl_kdd_test,
+    'CISA KEV': summarize_cisa,
+    'Phishing': summarize_phishing,
+}
+
+# ============================================
+# DOWNLOAD
+# ============================================
+max_workers = args.max_workers if args.concurrent else 1
+
+if args.concurrent:
+    print(f"\nDownloading {len(SOURCES)} feeds concurrently (max {max_workers} at a time)...")
+else:
+    print(f"\nDownloading {len(SOURCES)} feeds...")
+
+started = time.perf_counter()
+results = fetch_all(SOURCES, max_workers=max_workers, timeout=args.timeout)
+wall_seconds = time.perf_counter() - started
+
+for number, (source, result) in enumerate(zip(SOURCES, results), start=1):
+    print(f"\n{number}. {source['title']}")
+    print(f"   {source['about']}")
+
+    if result['error'] is not None:
+        print(f"   ❌ Error: {result['error']}")
+        continue
+
+    try:
+        summary = SUMMARIES.get(source['name'])
+        if summary:
+            summary(result)
+        else:
+            print(f"   ✅ {result['status'].capitalize()}: {result['path']}")
+    except Exception as e:
+        print(f"   ❌ Error: {e}")
+
+print_timing_summary(results, wall_seconds)
 
 print("\n" + "=" * 50)
 print("DOWNLOAD COMPLETE!")
 print("=" * 50)
 print("\nYour datasets are in: data/raw/")
-print("Next step: Run 2_process_nsl_kdd.py")
\ No newline at end of file
+print("Next step: Run 2_process_nsl_kdd.py")
@@ -3,161 +3,149 @@ This script reads the NSL-KDD dataset and converts attack records
 into "predictions" that will appear in your dashboard.
 
 Think of it like: "If we saw this attack before, we can predict similar ones"
+
+Usage:
+    python scripts/2_process_nsl_kdd.py                     # random sample of 500 attacks
+    python scripts/2_process_nsl_kdd.py --sample-size 5000
+    python scripts/2_process_nsl_kdd.py --all               # every attack record
+    python scripts/2_process_nsl_kdd.py --full              # stream KDDTrain+ and KDDTest+ in chunks
+    python scripts/2_process_nsl_kdd.py --full --inputs data/raw/nsl_kdd_train.csv extra.csv
+    python scripts/2_process_nsl_kdd.py --full --format jsonl   # one record per line
 """
 
-import pandas as pd
-from datetime import datetime, timedelta
-import random
+import argparse
+import glob
+import json
+import time
+import numpy as np
+from raw_store import load_nsl_kdd, iter_nsl_kdd_chunks
+from nsl_kdd_predictions import build_predictions, iter_records, REQUIRED_COLUMNS
+from record_io import RecordWriter, write_records, output_path
+from runtime_stats import format_peak_rss
+
+parser = argparse.ArgumentParser(description="Convert NSL-KDD attacks into predictions")
+parser.add_argument('--sample-size', type=int, default=500,
+                    help="Number of attack records to turn into predictions (default: 500)")
+parser.add_argument('--all', action='store_true',
+                    help="Use every attack record instead of a sample")
+parser.add_argument('--seed', type=int, default=None,
+                    help="Random seed for sampling and jitter (default: random)")
+parser.add_argument('--full', action='store_true',
+                    help="Stream every NSL-KDD file in chunks with bounded memory")
+parser.add_argument('--inputs', nargs='+', default=None,
+                    help="NSL-KDD format CSVs for --full (default: data/raw/nsl_kdd_*.csv)")
+parser.add_argument('--chunk-size', type=int, default=50_000,
+                    help="Rows per chunk in --full mode (default: 50000)")
+parser.add_argument('--format', choices=['json', 'jsonl'], default='json',
+                    help="Output format: indented JSON array or JSON Lines (default: json)")
+args = parser.parse_args()
+
+OUTPUT_PATH = output_path('data/processed/predictions_from_nsl_kdd.json', args.format)
 
 print("=" * 50)
 print("PROCESSING NSL-KDD DATASET")
 print("=" * 50)
 
-# Step 1: Read the CSV file
+rng = np.random.default_rng(args.seed)
+
+if args.full:
+    # Steps 1-4 run chunk by chunk: read, filter attacks, build predictions
+    # and append them to the output, so memory stays bounded by --chunk-size
+    input_paths = args.inputs or sorted(glob.glob('data/raw/nsl_kdd_*.csv'))
+    if not input_paths:
+        print("❌ Error: no NSL-KDD files found in data/raw/")
+        print("   Run '1_download_datasets.py' first")
+        exit(1)
+
+    print(f"\nStreaming {len(input_paths)} file(s) in chunks of {args.chunk_size:,} rows...")
+
+    total_rows = 0
+    total_predictions = 0
+    severity_counts = {}
+    started = time.perf_counter()
+
+    with RecordWriter(OUTPUT_PATH) as writer:
+        for path in input_paths:
+            file_rows = 0
+            for chunk in iter_nsl_kdd_chunks(path, columns=REQUIRED_COLUMNS, chunksize=args.chunk_size):
+                predictions = build_predictions(chunk, rng=rng)
+
+                for severity, count in predictions['severity'].value_counts().items():
+                    severity_counts[severity] = severity_counts.get(severity, 0) + int(count)
+
+                for record in iter_records(predictions):
+                    writer.write(record)
+
+                file_rows += len(chunk)
+                total_predictions += len(predictions)
+
+            total_rows += file_rows
+            print(f"   ✅ {path}: {file_rows:,} rows")
+
+    elapsed = time.perf_counter() - started
+
+    print(f"\n✅ Created {total_predictions:,} predictions from {total_rows:,} records")
+    print(f"   Severity breakdown: {severity_counts}")
+    print(f"✅ Saved to: {OUTPUT_PATH}")
+
+    print(f"\n⏱️  Throughput: {total_rows / max(elapsed, 1e-9):,.0f} rows/s ({elapsed:.2f}s)")
+    print(f"   Peak RSS: {format_peak_rss()}")
+
+    print("\n" + "=" * 50)
+    print("PROCESSING COMPLETE!")
+    print("=" * 50)
+    print("\nNext step: Run 4_upload_to_supabase.py to put this in your database")
+    exit(0)
+
+# Step 1: Read the dataset (typed columnar copy, only the columns we use)
 print("\nStep 1: Reading dataset...")
-df = pd.read_csv('data/raw/nsl_kdd_train.csv', header=None)
-
-# Add column names (the dataset doesn't have headers)
-column_names = [
-    'duration', 'protocol_type', 'service', 'flag', 'src_bytes', 'dst_bytes',
-    'land', 'wrong_fragment', 'urgent', 'hot', 'num_failed_logins',
-    'logged_in', 'num_compromised', 'root_shell', 'su_attempted',
-    'num_root', 'num_file_creations', 'num_shells', 'num_access_files',
-    'num_outbound_cmds', 'is_host_login', 'is_guest_login', 'count',
-    'srv_count', 'serror_rate', 'srv_serror_rate', 'rerror_rate',
-    'srv_rerror_rate', 'same_srv_rate', 'diff_srv_rate',
-    'srv_diff_host_rate', 'dst_host_count', 'dst_host_srv_count',
-    'dst_host_same_srv_rate', 'dst_host_diff_srv_rate',
-    'dst_host_same_src_port_rate', 'dst_host_srv_diff_host_rate',
-    'dst_host_serror_rate', 'dst_host_srv_serror_rate',
-    'dst_host_rerror_rate', 'dst_host_srv_rerror_rate',
-    'attack_type', 'difficulty'
-]
-
-df.columns = column_names
+df = load_nsl_kdd(columns=REQUIRED_COLUMNS)
 
 print(f"✅ Loaded {len(df)} records")
 print(f"📊 Attack distribution:")
 print(df['attack_type'].value_counts().head(10))
 
-# Step 2: Map attack types to threat categories
-print("\nStep 2: Categorizing attacks...")
-
-attack_to_threat = {
-    'neptune': 'DDoS Attack',
-    'smurf': 'DDoS Attack',
-    'pod': 'DDoS Attack',
-    'teardrop': 'DDoS Attack',
-    'back': 'DDoS Attack',
-    'land': 'DDoS Attack',
-    
-    'satan': 'Port Scan',
-    'ipsweep': 'Port Scan',
-    'nmap': 'Port Scan',
-    'portsweep': 'Port Scan',
-    
-    'warezclient': 'Unauthorized Access',
-    'warezmaster': 'Unauthorized Access',
-    'ftp_write': 'Unauthorized Access',
-    'imap': 'Unauthorized Access',
-    'multihop': 'Unauthorized Access',
-    'phf': 'Unauthorized Access',
-    'spy': 'Unauthorized Access',
-    
-    'guess_passwd': 'Brute Force Attack',
-    
-    'buffer_overflow': 'Buffer Overflow Exploit',
-    'loadmodule': 'Privilege Escalation',
-    'perl': 'Script Exploit',
-    'rootkit': 'Rootkit Installation',
-    
-    'normal': None  # Skip normal traffic
-}
-
-# Step 3: Convert to predictions
-print("\nStep 3: Creating predictions...")
-
-predictions = []
-sample_size = 500  # We'll create 500 predictions
+# Step 2: Select attack records (normal traffic is skipped)
+print("\nStep 2: Selecting attacks...")
 
 # Filter to only attacks (not normal traffic)
 attacks_df = df[df['attack_type'] != 'normal']
 
-# Take random sample
-sample = attacks_df.sample(n=min(sample_size, len(attacks_df)))
-
-for idx, row in sample.iterrows():
-    attack_type = row['attack_type']
-    threat_type = attack_to_threat.get(attack_type, 'Unknown Threat')
-    
-    if threat_type is None:
-        continue
-    
-    # Calculate severity based on attack characteristics
-    severity = 'medium'
-    
-    if row['dst_bytes'] > 10000 or row['wrong_fragment'] > 0:
-        severity = 'high'
-    
-    if row['num_failed_logins'] > 3 or row['root_shell'] > 0:
-        severity = 'critical'
-    
-    if row['dst_bytes'] < 1000 and row['src_bytes'] < 1000:
-        severity = 'low'
-    
-    # Calculate probability (higher for more severe attacks)
-    base_probability = 0.65
-    if severity == 'critical':
-        base_probability = 0.85
-    elif severity == 'high':
-        base_probability = 0.75
-    elif severity == 'low':
-        base_probability = 0.55
-    
-    # Add some randomness
-    probability = round(base_probability + random.uniform(-0.1, 0.1), 2)
-    probability = max(0.5, min(0.99, probability))  # Keep between 0.5 and 0.99
-    
-    # Create prediction object
-    prediction = {
-        'threat_type': threat_type,
-        'severity': severity,
-        'probability': probability,
-        'confidence_score': 0.82,  # Fixed confidence for historical data
-        'predicted_timeframe': random.choice(['1-2 days', '3-5 days', '5-7 days', '1-2 weeks']),
-        'description': f'Historical pattern analysis detected {threat_type.lower()} signature similar to {attack_type} attack. Network traffic patterns match known attack vectors.',
-        'indicators': {
-            'protocol': row['protocol_type'],
-            'service': row['service'],
-            'src_bytes': int(row['src_bytes']),
-            'dst_bytes': int(row['dst_bytes']),
-            'failed_logins': int(row['num_failed_logins']) if row['num_failed_logins'] > 0 else None,
-            'attack_signature': attack_type
-        },
-        'source': 'NSL-KDD Historical Dataset',
-        # Spread created_at over last 30 days
-        'created_at': (datetime.now() - timedelta(days=random.randint(0, 30))).isoformat()
-    }
-    
-    predictions.append(prediction)
-
-print(f"✅ Created {len(predictions)} predictions")
+if args.all:
+    sample = attacks_df
+    print(f"✅ Using all {len(sample)} attack records")
+else:
+    # Take random sample
+    sample = attacks_df.sample(n=min(args.sample_size, len(attacks_df)), random_state=rng)
+    print(f"✅ Sampled {len(sample)} of {len(attacks_df)} attack records")
+
+# Step 3: Convert to predictions (whole frame at once)
+print("\nStep 3: Creating predictions...")
+
+started = time.perf_counter()
+predictions = build_predictions(sample, rng=rng)
+elapsed = time.perf_counter() - started
+
+print(f"✅ Created {len(predictions)} predictions in {elapsed:.2f}s")
+print(f"   Severity breakdown: {predictions['severity'].value_counts().to_dict()}")
 
 # Step 4: Save to processed folder
 print("\nStep 4: Saving processed data...")
 
-import json
-
-with open('data/processed/predictions_from_nsl_kdd.json', 'w') as f:
-    json.dump(predictions, f, indent=2)
+if args.format == 'jsonl':
+    write_records(OUTPUT_PATH, iter_records(predictions))
+else:
+    with open(OUTPUT_PATH, 'w') as f:
+        json.dump(list(iter_records(predictions)), f, indent=2)
 
-print("✅ Saved to: data/processed/predictions_from_nsl_kdd.json")
+print(f"✅ Saved to: {OUTPUT_PATH}")
 
 # Show preview
-print("\n👀 Sample prediction:")
-print(json.dumps(predictions[0], indent=2))
+if len(predictions) > 0:
+    print("\n👀 Sample prediction:")
+    print(json.dumps(next(iter_records(predictions.head(1))), indent=2))
 
 print("\n" + "=" * 50)
 print("PROCESSING COMPLETE!")
 print("=" * 50)
-print("\nNext step: Run 4_upload_to_supabase.py to put this in your database")
\ No newline at end of file
+print("\nNext step: Run 4_upload_to_supabase.py to put this in your database")
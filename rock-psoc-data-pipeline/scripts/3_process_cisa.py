@@ -1,11 +1,26 @@
 """
 Process CISA Known Exploited Vulnerabilities into threat intelligence
+
+Usage:
+    python scripts/3_process_cisa.py            # first 200 CVEs of the catalog
+    python scripts/3_process_cisa.py --delta    # only CVEs new/changed since the last sync
+    python scripts/3_process_cisa.py --format jsonl
 """
 
+import argparse
 import pandas as pd
 import json
 from datetime import datetime
 import random
+from raw_store import load_cisa_kev, load_cisa_kev_delta
+from record_io import RecordWriter, output_path
+
+parser = argparse.ArgumentParser(description="Process CISA KEV into threat intelligence")
+parser.add_argument('--delta', action='store_true',
+                    help="Process only the CVEs in data/raw/cisa_kev_delta.csv")
+parser.add_argument('--format', choices=['json', 'jsonl'], default='json',
+                    help="Output format: indented JSON array or JSON Lines (default: json)")
+args = parser.parse_args()
 
 print("=" * 50)
 print("PROCESSING CISA KEV DATASET")
@@ -13,62 +28,88 @@ print("=" * 50)
 
 # Read dataset
 print("\nReading CISA data...")
-df = pd.read_csv('data/raw/cisa_kev.csv')
+columns = [
+    'cveID', 'vendorProject', 'product', 'vulnerabilityName',
+    'shortDescription', 'dateAdded', 'dueDate'
+]
 
-print(f"✅ Loaded {len(df)} vulnerabilities")
+if args.delta:
+    df = load_cisa_kev_delta(columns=columns)
+    rows = df  # The delta is small - process all of it
+    save_path = output_path('data/processed/threats_from_cisa_delta.json', args.format)
+    print(f"✅ Loaded {len(df)} new/changed vulnerabilities from the last sync")
+else:
+    df = load_cisa_kev(columns=columns)
+    rows = df.head(200)  # Process first 200
+    save_path = output_path('data/processed/threats_from_cisa.json', args.format)
+    print(f"✅ Loaded {len(df)} vulnerabilities")
 
-# Create threat intelligence records
-threats = []
 
-for idx, row in df.head(200).iterrows():  # Process first 200
-    # Calculate relevance score (you'll improve this later with org profiles)
-    relevance = 0.6  # Base relevance
+def format_date(value):
+    """Dates are loaded as timestamps - store them as YYYY-MM-DD strings"""
+    return value.strftime('%Y-%m-%d') if pd.notna(value) else None
+
+
+# Create threat intelligence records
+def iter_threats(rows):
+    """Threat record per CVE row, built as the output is written"""
+    for idx, row in rows.iterrows():
+        # Calculate relevance score (you'll improve this later with org profiles)
+        relevance = 0.6  # Base relevance
     
-    # Increase if recently added
-    date_added = datetime.strptime(row['dateAdded'], '%Y-%m-%d')
-    days_old = (datetime.now() - date_added).days
+        # Increase if recently added
+        date_added = row['dateAdded']
+        days_old = (datetime.now() - date_added).days
     
-    if days_old < 30:
-        relevance += 0.2
-    elif days_old < 90:
-        relevance += 0.1
+        if days_old < 30:
+            relevance += 0.2
+        elif days_old < 90:
+            relevance += 0.1
     
-    # Increase if critical product
-    critical_products = ['Windows', 'Apache', 'Cisco', 'Linux', 'Oracle']
-    if any(prod in row['product'] for prod in critical_products):
-        relevance += 0.15
+        # Increase if critical product
+        critical_products = ['Windows', 'Apache', 'Cisco', 'Linux', 'Oracle']
+        if any(prod in row['product'] for prod in critical_products):
+            relevance += 0.15
     
-    relevance = min(0.95, relevance)  # Cap at 0.95
+        relevance = min(0.95, relevance)  # Cap at 0.95
     
-    threat = {
-        'threat_type': 'Known Exploited Vulnerability',
-        'title': f"{row['vendorProject']} {row['product']} - {row['vulnerabilityName']}",
-        'description': row['shortDescription'],
-        'source': 'CISA KEV Catalog',
-        'severity': 'high',  # All CISA KEV are high by default
-        'relevance_score': round(relevance, 2),
-        'indicators': {
-            'cve_id': row['cveID'],
-            'vendor': row['vendorProject'],
-            'product': row['product'],
-            'date_added': row['dateAdded'],
-            'due_date': row['dueDate'] if 'dueDate' in row else None
-        },
-        'created_at': row['dateAdded']
-    }
+        threat = {
+            'threat_type': 'Known Exploited Vulnerability',
+            'title': f"{row['vendorProject']} {row['product']} - {row['vulnerabilityName']}",
+            'description': row['shortDescription'],
+            'source': 'CISA KEV Catalog',
+            'severity': 'high',  # All CISA KEV are high by default
+            'relevance_score': round(relevance, 2),
+            'indicators': {
+                'cve_id': row['cveID'],
+                'vendor': row['vendorProject'],
+                'product': row['product'],
+                'date_added': format_date(row['dateAdded']),
+                'due_date': format_date(row['dueDate']) if 'dueDate' in row else None
+            },
+            'created_at': format_date(row['dateAdded'])
+        }
+
+        if args.delta:
+            threat['change'] = row['change']  # 'new' or 'changed'
     
-    threats.append(threat)
+        yield threat
 
-print(f"✅ Created {len(threats)} threat intelligence records")
 
-# Save
-with open('data/processed/threats_from_cisa.json', 'w') as f:
-    json.dump(threats, f, indent=2)
+# Written one record at a time as they are built
+sample_threat = None
+with RecordWriter(save_path, indent=2) as writer:
+    for threat in iter_threats(rows):
+        writer.write(threat)
+        if sample_threat is None:
+            sample_threat = threat
 
-print("✅ Saved to: data/processed/threats_from_cisa.json")
+print(f"✅ Created {writer.count} threat intelligence records")
+print(f"✅ Saved to: {save_path}")
 
-print("\n👀 Sample threat:")
-print(json.dumps(threats[0], indent=2))
+if sample_threat is not None:
+    print("\n👀 Sample threat:")
+    print(json.dumps(sample_threat, indent=2))
 
 print("\n" + "=" * 50)
 print("PROCESSING COMPLETE!")
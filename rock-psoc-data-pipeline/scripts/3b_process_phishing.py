@@ -3,79 +3,56 @@ Process Feature-Engineered Phishing URLs dataset into threat intelligence record
 Script: 3b_process_phishing.py
 
 Extracts features from raw phishing URLs and creates processed dataset for ML training
+
+Usage:
+    python scripts/3b_process_phishing.py
+    python scripts/3b_process_phishing.py --format jsonl   # JSON Lines outputs
+    python scripts/3b_process_phishing.py --workers 0             # extract features on all cores
+    python scripts/3b_process_phishing.py --workers 32 --chunk-size 100000 --benchmark
+    python scripts/3b_process_phishing.py --no-cache              # ignore data/cache/phishing_url_features.sqlite
 """
 
+import argparse
 import pandas as pd
-import json
-import re
+import numpy as np
 from datetime import datetime, timedelta
 import random
 import os
+import time
+from raw_store import load_phishing
+from phishing_features import (extract_url_features_batch, extract_url_features_parallel, features_frame,
+                               DEFAULT_CHUNK_SIZE, FEATURE_NAMES, FEATURE_VERSION)
+from feature_cache import FeatureCache
+from feature_matrix import save_feature_matrix, remove_feature_matrix
+from record_io import RecordWriter, write_frame, output_path
+
+parser = argparse.ArgumentParser(description="Process the phishing URL dataset")
+parser.add_argument('--format', choices=['json', 'jsonl'], default='json',
+                    help="Output format: indented JSON array or JSON Lines (default: json)")
+parser.add_argument('--workers', type=int, default=1,
+                    help="Processes for URL feature extraction, 0 = all cores (default: 1)")
+parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                    help=f"URLs per worker task (default: {DEFAULT_CHUNK_SIZE})")
+parser.add_argument('--benchmark', action='store_true',
+                    help="Also time single-process extraction and report the speedup (implies --no-cache)")
+parser.add_argument('--no-cache', action='store_true',
+                    help="Extract every URL instead of reusing cached feature vectors")
+args = parser.parse_args()
+
+PROCESSED_PATH = output_path('data/processed/processed_phishing_urls.json', args.format)
+THREATS_PATH = output_path('data/processed/threats_from_phishing_urls.json', args.format)
+MATRIX_ROOT = 'data/processed/phishing_features'  # .npy matrix + _labels.npy + .json sidecar
 
 print("=" * 50)
 print("PROCESSING PHISHING URLS DATASET")
 print("=" * 50)
 
-# ============================================
-# FEATURE EXTRACTION FUNCTIONS
-# ============================================
-
-def extract_url_features(url):
-    """Extract meaningful features from a URL for phishing detection"""
-    
-    features = {}
-    
-    # Basic metrics
-    features['url_length'] = len(url)
-    features['num_dots'] = url.count('.')
-    features['num_hyphens'] = url.count('-')
-    features['num_underscores'] = url.count('_')
-    features['num_slashes'] = url.count('/')
-    features['num_question_marks'] = url.count('?')
-    features['num_equals'] = url.count('=')
-    features['num_at'] = url.count('@')
-    features['num_ampersand'] = url.count('&')
-    features['num_hash'] = url.count('#')
-    features['num_percent'] = url.count('%')
-    
-    # Character analysis
-    features['num_digits'] = sum(c.isdigit() for c in url)
-    features['num_letters'] = sum(c.isalpha() for c in url)
-    features['digit_ratio'] = features['num_digits'] / len(url) if len(url) > 0 else 0
-    
-    # Protocol and security
-    features['has_https'] = int(url.startswith('https://'))
-    features['has_http'] = int(url.startswith('http://'))
-    
-    # IP address in URL (suspicious)
-    features['has_ip'] = int(bool(re.search(r'\d+\.\d+\.\d+\.\d+', url)))
-    
-    # Parse URL components
-    try:
-        from urllib.parse import urlparse
-        parsed = urlparse(url)
-        features['domain_length'] = len(parsed.netloc)
-        features['path_length'] = len(parsed.path)
-        features['num_subdomains'] = parsed.netloc.count('.') - 1 if '.' in parsed.netloc else 0
-        features['has_port'] = int(':' in parsed.netloc and not parsed.netloc.startswith('['))
-    except:
-        features['domain_length'] = 0
-        features['path_length'] = 0
-        features['num_subdomains'] = 0
-        features['has_port'] = 0
-    
-    # Suspicious patterns
-    features['has_double_slash_in_path'] = int('//' in url[8:])  # After protocol
-    features['has_shortened_url'] = int(any(shortener in url for shortener in ['bit.ly', 'tinyurl', 'goo.gl', 't.co']))
-    
-    return features
-
 # ============================================
 # LOAD AND ANALYZE DATA
 # ============================================
 
 print("\nReading Phishing URLs data...")
-df = pd.read_csv('data/raw/phishing_urls.csv')
+df = load_phishing()
 
 print(f"✅ Loaded {len(df)} records")
 print(f"📊 Dataset has {len(df.columns)} columns")
@@ -112,21 +89,45 @@ for possible_label in ['phishing', 'label', 'class', 'target']:
 if needs_feature_extraction and 'url' in df.columns:
     print("\n🔧 Extracting features from URLs...")
     
-    features_list = []
-    for idx, row in df.iterrows():
-        if idx % 1000 == 0:
-            print(f"   Processed {idx}/{len(df)} URLs...")
-        
-        try:
-            features = extract_url_features(row['url'])
-            if label_column:
-                features['label'] = row[label_column]
-            features_list.append(features)
-        except Exception as e:
-            continue
-    
-    # Create new DataFrame with extracted features
-    processed_df = pd.DataFrame(features_list)
+    # Whole column at once (sharded across --workers processes);
+    # rows without a usable URL are dropped
+    workers = args.workers or os.cpu_count()
+    started = time.perf_counter()
+    if args.no_cache or args.benchmark:
+        # The benchmark times the extraction itself: no cache lookups, every URL
+        processed_df = extract_url_features_parallel(df['url'], workers=workers, chunk_size=args.chunk_size)
+        extracted = len(processed_df)
+    else:
+        # Only URLs not seen in earlier runs are extracted
+        urls = df['url'][df['url'].map(lambda url: isinstance(url, str))]
+        with FeatureCache() as cache:
+            matrix = cache.extract_batch(
+                urls.tolist(),
+                extractor=lambda missing: extract_url_features_parallel(
+                    missing, workers=workers, chunk_size=args.chunk_size
+                ).to_numpy(dtype=np.float64)
+            )
+            print(f"   Feature cache: {cache.hits:,} cached, {cache.misses:,} new URLs")
+            extracted = cache.misses
+        processed_df = features_frame(matrix, index=urls.index)
+    elapsed = time.perf_counter() - started
+    if args.no_cache or args.benchmark:
+        print(f"   {extracted / max(elapsed, 1e-9):,.0f} URLs/s with {workers} worker(s) ({elapsed:.2f}s)")
+    else:
+        # Includes the cache lookups, so no per-URL extraction rate
+        print(f"   Extracted {extracted:,} new URLs with {workers} worker(s) ({elapsed:.2f}s with the cache)")
+
+    if args.benchmark:
+        started = time.perf_counter()
+        extract_url_features_batch(df['url'])
+        single = time.perf_counter() - started
+        print(f"   Single process: {extracted / max(single, 1e-9):,.0f} URLs/s ({single:.2f}s) "
+              f"-> speedup {single / max(elapsed, 1e-9):.1f}x")
+
+    if label_column:
+        processed_df['label'] = df.loc[processed_df.index, label_column]
+    processed_df = processed_df.reset_index(drop=True)
+    print(f"   Processed {len(processed_df)}/{len(df)} URLs")
     print(f"\n✅ Extracted {len(processed_df.columns)} features")
     
 else:
@@ -147,21 +148,33 @@ print("\n💾 Saving processed data for ML training...")
 # Ensure output directory exists
 os.makedirs('data/processed', exist_ok=True)
 
-# Save as JSON for ML training
-processed_df.to_json('data/processed/processed_phishing_urls.json', orient='records', indent=2)
+# Save as JSON / JSON Lines for ML training
+write_frame(PROCESSED_PATH, processed_df)
 
-print(f"✅ Saved {len(processed_df)} records to: data/processed/processed_phishing_urls.json")
+print(f"✅ Saved {len(processed_df)} records to: {PROCESSED_PATH}")
 print(f"   Features: {len(processed_df.columns)}")
 
+# Binary copy for training: float32 matrix + labels, opened memory-mapped
+feature_df = processed_df.drop(columns=['label'], errors='ignore')
+numeric = (len(feature_df.select_dtypes(exclude='number').columns) == 0
+           and 'label' in processed_df.columns
+           and pd.api.types.is_numeric_dtype(processed_df['label']))
+if numeric:
+    save_feature_matrix(MATRIX_ROOT, feature_df, processed_df['label'].to_numpy(), metadata={
+        'feature_version': FEATURE_VERSION if list(feature_df.columns) == FEATURE_NAMES else None,
+    })
+    print(f"✅ Saved feature matrix: {MATRIX_ROOT}.npy ({feature_df.shape[0]} x {feature_df.shape[1]}, float32)")
+else:
+    # Training falls back to the JSON records
+    remove_feature_matrix(MATRIX_ROOT)
+    print("   ⚠️  No label or non-numeric features - skipped the binary feature matrix")
+
 # ============================================
 # CREATE THREAT INTELLIGENCE RECORDS
 # ============================================
 
 print("\n🔍 Creating threat intelligence records...")
 
-# Identify suspicious URLs for threat database
-threats = []
-
 # Take sample for threat intelligence (actual phishing URLs or high suspicion scores)
 if 'label' in processed_df.columns:
     # Get confirmed phishing URLs
@@ -179,88 +192,97 @@ if 'label' in processed_df.columns:
 else:
     sample = processed_df.sample(n=min(150, len(processed_df)), random_state=42)
 
+
 # Create threat records
-for idx, row in sample.iterrows():
-    try:
-        # Calculate suspicion score based on available features
-        suspicion_score = 0
-        indicators = []
+def iter_threats(sample):
+    """Threat record per suspicious URL row, built as the output is written"""
+    for idx, row in sample.iterrows():
+        try:
+            # Calculate suspicion score based on available features
+            suspicion_score = 0
+            indicators = []
         
-        # Check common phishing indicators
-        if 'url_length' in row.index and row['url_length'] > 75:
-            suspicion_score += 1
-            indicators.append(f"Long URL ({int(row['url_length'])} chars)")
+            # Check common phishing indicators
+            if 'url_length' in row.index and row['url_length'] > 75:
+                suspicion_score += 1
+                indicators.append(f"Long URL ({int(row['url_length'])} chars)")
         
-        if 'num_dots' in row.index and row['num_dots'] > 4:
-            suspicion_score += 2
-            indicators.append(f"Excessive dots ({int(row['num_dots'])})")
+            if 'num_dots' in row.index and row['num_dots'] > 4:
+                suspicion_score += 2
+                indicators.append(f"Excessive dots ({int(row['num_dots'])})")
         
-        if 'has_ip' in row.index and row['has_ip'] == 1:
-            suspicion_score += 3
-            indicators.append("Uses IP address instead of domain")
+            if 'has_ip' in row.index and row['has_ip'] == 1:
+                suspicion_score += 3
+                indicators.append("Uses IP address instead of domain")
         
-        if 'has_https' in row.index and row['has_https'] == 0:
-            suspicion_score += 2
-            indicators.append("No HTTPS encryption")
+            if 'has_https' in row.index and row['has_https'] == 0:
+                suspicion_score += 2
+                indicators.append("No HTTPS encryption")
         
-        if 'has_shortened_url' in row.index and row['has_shortened_url'] == 1:
-            suspicion_score += 2
-            indicators.append("URL shortener detected")
+            if 'has_shortened_url' in row.index and row['has_shortened_url'] == 1:
+                suspicion_score += 2
+                indicators.append("URL shortener detected")
         
-        if 'num_hyphens' in row.index and row['num_hyphens'] > 3:
-            suspicion_score += 1
-            indicators.append(f"Multiple hyphens ({int(row['num_hyphens'])})")
+            if 'num_hyphens' in row.index and row['num_hyphens'] > 3:
+                suspicion_score += 1
+                indicators.append(f"Multiple hyphens ({int(row['num_hyphens'])})")
         
-        # Check feature-engineered columns if present
-        if 'domain_in_ip' in row.index and row['domain_in_ip'] == 1:
-            suspicion_score += 3
-            indicators.append("Domain uses IP address")
+            # Check feature-engineered columns if present
+            if 'domain_in_ip' in row.index and row['domain_in_ip'] == 1:
+                suspicion_score += 3
+                indicators.append("Domain uses IP address")
         
-        if 'tls_ssl_certificate' in row.index and row['tls_ssl_certificate'] == -1:
-            suspicion_score += 3
-            indicators.append("Invalid TLS/SSL certificate")
+            if 'tls_ssl_certificate' in row.index and row['tls_ssl_certificate'] == -1:
+                suspicion_score += 3
+                indicators.append("Invalid TLS/SSL certificate")
         
-        # Skip if no indicators
-        if suspicion_score == 0:
-            continue
+            # Skip if no indicators
+            if suspicion_score == 0:
+                continue
         
-        # Determine severity
-        if suspicion_score >= 6:
-            severity = 'critical'
-        elif suspicion_score >= 4:
-            severity = 'high'
-        elif suspicion_score >= 2:
-            severity = 'medium'
-        else:
-            severity = 'low'
+            # Determine severity
+            if suspicion_score >= 6:
+                severity = 'critical'
+            elif suspicion_score >= 4:
+                severity = 'high'
+            elif suspicion_score >= 2:
+                severity = 'medium'
+            else:
+                severity = 'low'
         
-        relevance_score = round(min(0.95, 0.3 + (suspicion_score * 0.12)), 2)
+            relevance_score = round(min(0.95, 0.3 + (suspicion_score * 0.12)), 2)
         
-        threat = {
-            'threat_type': 'Suspicious URL Pattern',
-            'title': f"Phishing URL Detection: {severity.upper()}",
-            'description': f"Feature analysis detected suspicious URL characteristics. {' '.join(indicators[:2])}",
-            'source': 'Phishing URL Dataset Analysis',
-            'severity': severity,
-            'relevance_score': relevance_score,
-            'indicators': {
-                'suspicion_score': int(suspicion_score),
-                'detected_indicators': indicators[:5],
-                'detection_date': (datetime.now() - timedelta(days=random.randint(0, 30))).isoformat()
-            },
-            'created_at': (datetime.now() - timedelta(days=random.randint(0, 30))).isoformat()
-        }
+            threat = {
+                'threat_type': 'Suspicious URL Pattern',
+                'title': f"Phishing URL Detection: {severity.upper()}",
+                'description': f"Feature analysis detected suspicious URL characteristics. {' '.join(indicators[:2])}",
+                'source': 'Phishing URL Dataset Analysis',
+                'severity': severity,
+                'relevance_score': relevance_score,
+                'indicators': {
+                    'suspicion_score': int(suspicion_score),
+                    'detected_indicators': indicators[:5],
+                    'detection_date': (datetime.now() - timedelta(days=random.randint(0, 30))).isoformat()
+                },
+                'created_at': (datetime.now() - timedelta(days=random.randint(0, 30))).isoformat()
+            }
         
-        threats.append(threat)
-    except Exception as e:
-        continue
+        except Exception as e:
+            continue
+
+        yield threat
 
-# Save threat intelligence
-with open('data/processed/threats_from_phishing_urls.json', 'w') as f:
-    json.dump(threats, f, indent=2)
 
-print(f"✅ Created {len(threats)} threat intelligence records")
-print("✅ Saved to: data/processed/threats_from_phishing_urls.json")
+# Written one record at a time as they are built
+severity_counts = {}
+with RecordWriter(THREATS_PATH, indent=2) as writer:
+    for threat in iter_threats(sample):
+        writer.write(threat)
+        severity_counts[threat['severity']] = severity_counts.get(threat['severity'], 0) + 1
+num_threats = writer.count
+
+print(f"✅ Created {num_threats} threat intelligence records")
+print(f"✅ Saved to: {THREATS_PATH}")
 
 # ============================================
 # SUMMARY STATISTICS
@@ -279,14 +301,9 @@ if 'label' in processed_df.columns:
     for label, count in processed_df['label'].value_counts().items():
         print(f"      {label}: {count}")
 
-if threats:
+if num_threats:
     print(f"\n🎯 Threat Intelligence:")
-    print(f"   Total threats: {len(threats)}")
-    
-    severity_counts = {}
-    for threat in threats:
-        sev = threat['severity']
-        severity_counts[sev] = severity_counts.get(sev, 0) + 1
+    print(f"   Total threats: {num_threats}")
     
     print(f"   Severity breakdown:")
     for severity in ['critical', 'high', 'medium', 'low']:
@@ -3,12 +3,28 @@ Upload processed data to Supabase database
 Maps data to actual table schemas
 Updated to include phishing threats
 Script: 4_upload_to_supabase_UPDATED.py
+
+Records are streamed from the processed files (.jsonl when it is newer)
+and mapped and inserted one batch at a time, so memory stays at one batch
+however large the files are.
+
+Usage:
+    python scripts/4_upload_to_supabase.py
+    python scripts/4_upload_to_supabase.py --cisa-delta   # only CVEs new/changed since the last KEV sync
 """
 
-import json
+import argparse
+import os
 from datetime import datetime, timezone
+from itertools import islice
 from uuid import uuid4
 from config import supabase
+from record_io import resolve_input, iter_records
+
+parser = argparse.ArgumentParser(description="Upload processed threat data to Supabase")
+parser.add_argument('--cisa-delta', action='store_true',
+                    help="Upload only threats_from_cisa_delta.json (run 3_process_cisa.py --delta first)")
+args = parser.parse_args()
 
 print("=" * 60)
 print("UPLOADING TO SUPABASE (UPDATED)")
@@ -31,183 +47,195 @@ def normalize_severity(severity):
 
 batch_size = 100
 
-# ============================================================
-# UPLOAD PREDICTIONS (NSL-KDD)
-# ============================================================
-print("\n1. Loading predictions (NSL-KDD)...")
-with open('data/processed/predictions_from_nsl_kdd.json', 'r') as f:
-    predictions = json.load(f)
 
-print(f"📊 Loaded {len(predictions)} predictions")
+def upload_records(records, map_record, label, before_insert=None):
+    """
+    Map and insert `records` in batches of `batch_size` while they are
+    streamed, so at most one batch is held in memory. Records that fail
+    to map are skipped. Returns the number of records mapped.
+    """
+    records = iter(records)
+    mapped_count = 0
+    batch_num = 0
 
-# Map predictions to the predictions table schema
-print("\n   Mapping prediction data to table schema...")
-mapped_predictions = []
+    while True:
+        chunk = list(islice(records, batch_size))
+        if not chunk:
+            break
 
-for pred in predictions:
-    try:
-        # Extract indicators (which is already a dict)
-        indicators = pred.get('indicators', {})
-        
-        mapped_pred = {
-            'id': str(uuid4()),
-            'organization_id': org_id,
-            'title': pred.get('threat_type', 'Unknown Threat'),
-            'description': pred.get('description', ''),
-            'severity': normalize_severity(pred.get('severity', 'medium')),
-            'probability': float(pred.get('probability', 0.5)),
-            'confidence': float(pred.get('confidence_score', 0.5)),
-            'impact': f"Attack Type: {pred.get('threat_type', 'Unknown')}",
-            'timeframe': pred.get('predicted_timeframe', 'Unknown'),
-            'affected_systems': [indicators.get('service', 'unknown')] if indicators else ['unknown'],
-            'status': 'detected',
-            'source': pred.get('source', 'NSL-KDD'),
-            'created_at': pred.get('created_at', datetime.now(timezone.utc).isoformat()),
-            'updated_at': datetime.now(timezone.utc).isoformat(),
-            'confidence_score': float(pred.get('confidence_score', 0.5)),
-            'indicators': indicators,  # Already a dict, will be stored as JSONB
-            'predicted_timeframe': pred.get('predicted_timeframe', '')
-        }
-        mapped_predictions.append(mapped_pred)
-    except Exception as e:
-        print(f"   ⚠️  Skipping prediction due to error: {e}")
-        continue
+        batch = []
+        for record in chunk:
+            try:
+                batch.append(map_record(record))
+            except Exception as e:
+                print(f"   ⚠️  Skipping {label[:-1]} due to error: {e}")
+        if not batch:
+            continue
 
-print(f"   ✅ Mapped {len(mapped_predictions)} predictions")
+        mapped_count += len(batch)
+        batch_num += 1
+        if before_insert is not None:
+            before_insert(batch)
 
-# Upload predictions in batches
-print("\n2. Uploading predictions...")
+        try:
+            result = supabase.table('predictions').insert(batch).execute()
+            print(f"   ✅ Uploaded batch {batch_num} ({len(batch)} {label})")
+        except Exception as e:
+            print(f"   ❌ Error uploading batch {batch_num}: {str(e)}")
+
+    return mapped_count
+
+
+def map_prediction(pred):
+    """NSL-KDD prediction -> predictions table row"""
+    # Extract indicators (which is already a dict)
+    indicators = pred.get('indicators', {})
+
+    return {
+        'id': str(uuid4()),
+        'organization_id': org_id,
+        'title': pred.get('threat_type', 'Unknown Threat'),
+        'description': pred.get('description', ''),
+        'severity': normalize_severity(pred.get('severity', 'medium')),
+        'probability': float(pred.get('probability', 0.5)),
+        'confidence': float(pred.get('confidence_score', 0.5)),
+        'impact': f"Attack Type: {pred.get('threat_type', 'Unknown')}",
+        'timeframe': pred.get('predicted_timeframe', 'Unknown'),
+        'affected_systems': [indicators.get('service', 'unknown')] if indicators else ['unknown'],
+        'status': 'detected',
+        'source': pred.get('source', 'NSL-KDD'),
+        'created_at': pred.get('created_at', datetime.now(timezone.utc).isoformat()),
+        'updated_at': datetime.now(timezone.utc).isoformat(),
+        'confidence_score': float(pred.get('confidence_score', 0.5)),
+        'indicators': indicators,  # Already a dict, will be stored as JSONB
+        'predicted_timeframe': pred.get('predicted_timeframe', '')
+    }
+
+
+def map_cisa_threat(threat):
+    """CISA KEV threat -> predictions table row"""
+    # Extract indicators (which is already a dict)
+    indicators = threat.get('indicators', {})
+
+    return {
+        'id': str(uuid4()),
+        'organization_id': org_id,
+        'title': threat.get('title', 'Unknown Threat'),
+        'description': threat.get('description', ''),
+        'severity': normalize_severity(threat.get('severity', 'medium')),
+        'probability': float(threat.get('relevance_score', 0.5)),
+        'confidence': float(threat.get('relevance_score', 0.5)),
+        'impact': f"Threat Type: {threat.get('threat_type', 'Unknown')}",
+        'timeframe': threat.get('due_date', 'Unknown') if threat.get('indicators', {}).get('due_date') else 'Unknown',
+        'affected_systems': [threat.get('indicators', {}).get('product', 'unknown')] if threat.get('indicators') else ['unknown'],
+        'status': 'active',
+        'source': threat.get('source', 'CISA'),
+        'created_at': threat.get('created_at', datetime.now(timezone.utc).isoformat()),
+        'updated_at': datetime.now(timezone.utc).isoformat(),
+        'confidence_score': float(threat.get('relevance_score', 0.5)),
+        'indicators': indicators,  # Already a dict, will be stored as JSONB
+        'predicted_timeframe': threat.get('indicators', {}).get('due_date', '')
+    }
+
+
+def map_phishing_threat(threat):
+    """Phishing detection -> predictions table row"""
+    # Extract indicators (which is already a dict)
+    indicators = threat.get('indicators', {})
+
+    return {
+        'id': str(uuid4()),
+        'organization_id': org_id,
+        'title': threat.get('title', 'Unknown Phishing'),
+        'description': threat.get('description', ''),
+        'severity': normalize_severity(threat.get('severity', 'high')),
+        'probability': threat.get('relevance_score', 0.7),
+        'confidence': threat.get('relevance_score', 0.7),
+        'impact': threat.get('threat_type', 'Phishing Attack'),
+        'timeframe': 'Immediate',
+        'affected_systems': ['Users', 'Email'],
+        'status': 'detected',
+        'source': threat.get('source', 'Phishing Dataset'),
+        'created_at': threat.get('created_at', datetime.now(timezone.utc).isoformat()),
+        'updated_at': datetime.now(timezone.utc).isoformat(),
+        'confidence_score': threat.get('relevance_score', 0.7),
+        'indicators': indicators,  # Already a dict, will be stored as JSONB
+        'predicted_timeframe': 'Immediate'
+    }
 
-for i in range(0, len(mapped_predictions), batch_size):
-    batch = mapped_predictions[i:i+batch_size]
-    batch_num = i // batch_size + 1
-    total_batches = (len(mapped_predictions) + batch_size - 1) // batch_size
-    
-    try:
-        result = supabase.table('predictions').insert(batch).execute()
-        print(f"   ✅ Uploaded batch {batch_num}/{total_batches} ({len(batch)} predictions)")
-    except Exception as e:
-        print(f"   ❌ Error uploading batch {batch_num}: {str(e)}")
+
+# ============================================================
+# UPLOAD PREDICTIONS (NSL-KDD)
+# ============================================================
+print("\n1. Loading predictions (NSL-KDD)...")
+if args.cisa_delta:
+    print("   Skipped - CISA delta upload only")
+    predictions = []
+else:
+    # Records are streamed one at a time (.jsonl is used when it is newer)
+    predictions_path = resolve_input('data/processed/predictions_from_nsl_kdd.json')
+    predictions = iter_records(predictions_path)
+    print(f"📊 Streaming predictions from {predictions_path}")
+
+# Map to the predictions table schema and upload, one batch at a time
+print("\n2. Mapping and uploading predictions...")
+predictions_count = upload_records(predictions, map_prediction, 'predictions')
+print(f"   ✅ Mapped {predictions_count} predictions")
 
 # ============================================================
 # UPLOAD THREATS (CISA)
 # ============================================================
 print("\n3. Loading threat intelligence (CISA)...")
-with open('data/processed/threats_from_cisa.json', 'r') as f:
-    cisa_threats = json.load(f)
+cisa_path = resolve_input('data/processed/threats_from_cisa_delta.json' if args.cisa_delta
+                          else 'data/processed/threats_from_cisa.json')
+cisa_threats = iter_records(cisa_path)
 
-print(f"📊 Loaded {len(cisa_threats)} CISA threats")
+print(f"📊 Streaming CISA threats from {cisa_path}")
 
-# Map threats to the predictions table schema
-print("\n   Mapping CISA threat data to table schema...")
-mapped_cisa_threats = []
+replaced_cves = []
 
-for threat in cisa_threats:
+
+def replace_previous_rows(batch):
+    """Delete earlier rows for the batch's CVEs so re-synced entries are not duplicated"""
+    delta_cves = [t['indicators']['cve_id'] for t in batch]
     try:
-        # Extract indicators (which is already a dict)
-        indicators = threat.get('indicators', {})
-        
-        mapped_threat = {
-            'id': str(uuid4()),
-            'organization_id': org_id,
-            'title': threat.get('title', 'Unknown Threat'),
-            'description': threat.get('description', ''),
-            'severity': normalize_severity(threat.get('severity', 'medium')),
-            'probability': float(threat.get('relevance_score', 0.5)),
-            'confidence': float(threat.get('relevance_score', 0.5)),
-            'impact': f"Threat Type: {threat.get('threat_type', 'Unknown')}",
-            'timeframe': threat.get('due_date', 'Unknown') if threat.get('indicators', {}).get('due_date') else 'Unknown',
-            'affected_systems': [threat.get('indicators', {}).get('product', 'unknown')] if threat.get('indicators') else ['unknown'],
-            'status': 'active',
-            'source': threat.get('source', 'CISA'),
-            'created_at': threat.get('created_at', datetime.now(timezone.utc).isoformat()),
-            'updated_at': datetime.now(timezone.utc).isoformat(),
-            'confidence_score': float(threat.get('relevance_score', 0.5)),
-            'indicators': indicators,  # Already a dict, will be stored as JSONB
-            'predicted_timeframe': threat.get('indicators', {}).get('due_date', '')
-        }
-        mapped_cisa_threats.append(mapped_threat)
+        supabase.table('predictions').delete() \
+            .eq('organization_id', org_id) \
+            .in_('indicators->>cve_id', delta_cves) \
+            .execute()
     except Exception as e:
-        print(f"   ⚠️  Skipping CISA threat due to error: {e}")
-        continue
-
-print(f"   ✅ Mapped {len(mapped_cisa_threats)} CISA threats")
+        print(f"   ⚠️  Could not remove previous rows for changed CVEs: {str(e)}")
+    replaced_cves.extend(delta_cves)
 
-# Upload CISA threats in batches
-print("\n4. Uploading CISA threats...")
 
-for i in range(0, len(mapped_cisa_threats), batch_size):
-    batch = mapped_cisa_threats[i:i+batch_size]
-    batch_num = i // batch_size + 1
-    total_batches = (len(mapped_cisa_threats) + batch_size - 1) // batch_size
-    
-    try:
-        result = supabase.table('predictions').insert(batch).execute()
-        print(f"   ✅ Uploaded batch {batch_num}/{total_batches} ({len(batch)} CISA threats)")
-    except Exception as e:
-        print(f"   ❌ Error uploading batch {batch_num}: {str(e)}")
+print("\n4. Mapping and uploading CISA threats...")
+cisa_count = upload_records(cisa_threats, map_cisa_threat, 'CISA threats',
+                            before_insert=replace_previous_rows if args.cisa_delta else None)
+print(f"   ✅ Mapped {cisa_count} CISA threats")
+if args.cisa_delta:
+    print(f"   🔄 Replaced {len(replaced_cves)} CVEs from the last sync")
 
 # ============================================================
 # UPLOAD THREATS (PHISHING)
 # ============================================================
 print("\n5. Loading phishing detections...")
-try:
-    with open('data/processed/threats_from_phishing_urls.json', 'r') as f:
-        phishing_threats = json.load(f)
-    print(f"📊 Loaded {len(phishing_threats)} phishing detections")
-except FileNotFoundError:
-    print("⚠️  Phishing threats file not found. Skipping phishing upload.")
-    phishing_threats = []
-
-if phishing_threats:
-    # Map threats to the predictions table schema
-    print("\n   Mapping phishing threat data to table schema...")
-    mapped_phishing_threats = []
-
-    for threat in phishing_threats:
-        try:
-            # Extract indicators (which is already a dict)
-            indicators = threat.get('indicators', {})
-            
-            mapped_threat = {
-                'id': str(uuid4()),
-                'organization_id': org_id,
-                'title': threat.get('title', 'Unknown Phishing'),
-                'description': threat.get('description', ''),
-                'severity': normalize_severity(threat.get('severity', 'high')),
-                'probability': threat.get('relevance_score', 0.7),
-                'confidence': threat.get('relevance_score', 0.7),
-                'impact': threat.get('threat_type', 'Phishing Attack'),
-                'timeframe': 'Immediate',
-                'affected_systems': ['Users', 'Email'],
-                'status': 'detected',
-                'source': threat.get('source', 'Phishing Dataset'),
-                'created_at': threat.get('created_at', datetime.now(timezone.utc).isoformat()),
-                'updated_at': datetime.now(timezone.utc).isoformat(),
-                'confidence_score': threat.get('relevance_score', 0.7),
-                'indicators': indicators,  # Already a dict, will be stored as JSONB
-                'predicted_timeframe': 'Immediate'
-            }
-            mapped_phishing_threats.append(mapped_threat)
-        except Exception as e:
-            print(f"   ⚠️  Skipping phishing threat due to error: {e}")
-            continue
-
-    print(f"   ✅ Mapped {len(mapped_phishing_threats)} phishing threats")
+phishing_threats = None
+if args.cisa_delta:
+    print("   Skipped - CISA delta upload only")
+else:
+    phishing_path = resolve_input('data/processed/threats_from_phishing_urls.json')
+    if os.path.exists(phishing_path):
+        phishing_threats = iter_records(phishing_path)
+        print(f"📊 Streaming phishing detections from {phishing_path}")
+    else:
+        print("⚠️  Phishing threats file not found. Skipping phishing upload.")
 
-    # Upload phishing threats in batches
-    print("\n6. Uploading phishing detections...")
+phishing_count = 0
 
-    for i in range(0, len(mapped_phishing_threats), batch_size):
-        batch = mapped_phishing_threats[i:i+batch_size]
-        batch_num = i // batch_size + 1
-        total_batches = (len(mapped_phishing_threats) + batch_size - 1) // batch_size
-        
-        try:
-            result = supabase.table('predictions').insert(batch).execute()
-            print(f"   ✅ Uploaded batch {batch_num}/{total_batches} ({len(batch)} phishing threats)")
-        except Exception as e:
-            print(f"   ❌ Error uploading batch {batch_num}: {str(e)}")
+if phishing_threats is not None:
+    print("\n6. Mapping and uploading phishing detections...")
+    phishing_count = upload_records(phishing_threats, map_phishing_threat, 'phishing threats')
+    print(f"   ✅ Mapped {phishing_count} phishing threats")
 
 # ============================================================
 # SUMMARY
@@ -216,12 +244,12 @@ print("\n" + "=" * 60)
 print("UPLOAD COMPLETE!")
 print("=" * 60)
 
-total_records = len(mapped_predictions) + len(mapped_cisa_threats) + len(mapped_phishing_threats)
+total_records = predictions_count + cisa_count + phishing_count
 
 print(f"\n✅ Upload Summary:")
-print(f"   NSL-KDD Predictions: {len(mapped_predictions)}")
-print(f"   CISA Threats: {len(mapped_cisa_threats)}")
-print(f"   Phishing Detections: {len(mapped_phishing_threats)}")
+print(f"   NSL-KDD Predictions: {predictions_count}")
+print(f"   CISA Threats: {cisa_count}")
+print(f"   Phishing Detections: {phishing_count}")
 print(f"   ─────────────────────────")
 print(f"   Total Records: {total_records}")
 
@@ -4,14 +4,33 @@ Script: 5_train_phishing_detection.py
 
 Tests 3 algorithms: Random Forest, XGBoost, and Neural Network
 Binary classification: Phishing vs Legitimate URLs
+
+Loads the binary feature matrix written by 3b_process_phishing.py
+(data/processed/phishing_features.npy, memory-mapped) when it is current,
+otherwise the processed JSON / JSON Lines records. The scaler is fitted
+chunk by chunk and the neural network streams its rows from the matrix
+(scaled per chunk), so a NN-only run never holds a copy of the matrix;
+Random Forest / XGBoost get the scaled rows in memory.
+
+Usage:
+    python scripts/5_train_phishing_detection.py
+    python scripts/5_train_phishing_detection.py --records   # always read the JSON records
+    python scripts/5_train_phishing_detection.py --cpu-budget 16   # cores shared by RF / XGBoost / NN
+    python scripts/5_train_phishing_detection.py --xgb-hist   # histogram XGBoost, early stopping on the validation split
+    python scripts/5_train_phishing_detection.py --search --search-budget 600   # tune RF / XGBoost, then train
+    python scripts/5_train_phishing_detection.py --tuned   # reuse the parameters found by the last --search
+    python scripts/5_train_phishing_detection.py --models rf   # Random Forest only (no TensorFlow / XGBoost import)
+
+TensorFlow and XGBoost are imported only when a selected model needs
+them; the import time and RSS are reported at startup.
 """
 
+import argparse
 import pandas as pd
 import json
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
-from xgboost import XGBClassifier
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import (
     classification_report,
@@ -22,54 +41,112 @@ from sklearn.metrics import (
     roc_auc_score,
     confusion_matrix
 )
-import tensorflow as tf
-from tensorflow import keras
-from tensorflow.keras import layers
 import joblib
 import os
 import warnings
+from record_io import resolve_input, iter_records, as_jsonl
+from feature_matrix import load_feature_matrix, is_current
+from phishing_features import FEATURE_NAMES, FEATURE_NAMES_PATH, FEATURE_VERSION
+from model_inputs import save_holdout
+from runtime_stats import import_modules, format_import_report
+from training_scheduler import TrainingJob, run_jobs, print_report, parse_models, frameworks_for
+from hyperparameter_search import search_models, save_tuned, load_tuned, DEFAULT_BUDGET_SECONDS
 warnings.filterwarnings('ignore')
 
+parser = argparse.ArgumentParser(description="Train phishing URL detection models")
+parser.add_argument('--records', action='store_true',
+                    help="Read the processed JSON records even if a binary feature matrix exists")
+parser.add_argument('--cpu-budget', type=int, default=None,
+                    help="Cores shared by the concurrently trained models; with more models than cores, "
+                         "the extra models wait in a queue (default: all)")
+parser.add_argument('--sequential', action='store_true',
+                    help="Train the models one after another (still within the CPU budget). "
+                         "Per-model CPU utilization is only measured in this mode; concurrent "
+                         "runs report it for the whole run")
+parser.add_argument('--xgb-hist', action='store_true',
+                    help="Histogram XGBoost on a quantized matrix with early stopping on the validation split")
+parser.add_argument('--search', action='store_true',
+                    help="Hyperband search for Random Forest / XGBoost parameters before training")
+parser.add_argument('--search-budget', type=float, default=DEFAULT_BUDGET_SECONDS,
+                    help=f"Wall-clock seconds for --search (default: {DEFAULT_BUDGET_SECONDS})")
+parser.add_argument('--search-workers', type=int, default=None,
+                    help="Parallel trials for --search (default: --cpu-budget or all cores)")
+parser.add_argument('--tuned', action='store_true',
+                    help="Train with the parameters saved by the last --search")
+parser.add_argument('--models', type=parse_models, default='rf,xgb,nn',
+                    help="Comma-separated models to train: rf, xgb, nn (default: all)")
+args = parser.parse_args()
+
+RECORDS_PATH = 'data/processed/processed_phishing_urls.json'
+MATRIX_ROOT = 'data/processed/phishing_features'
+SCALE_CHUNK_ROWS = 65_536
+
 print("=" * 70)
 print("PHISHING URL DETECTION MODEL TRAINING")
 print("=" * 70)
 
+# Heavy frameworks are loaded once, here, and only for the selected models
+import_seconds = import_modules(frameworks_for(args.models))
+print(f"   Models: {', '.join(args.models)} | imported {format_import_report(import_seconds)}")
+
 # ============================================
 # 1. LOAD PROCESSED DATA
 # ============================================
 print("\n[1/6] Loading processed phishing URL data...")
 
-try:
-    with open('data/processed/processed_phishing_urls.json', 'r') as f:
-        data = json.load(f)
-    
-    df = pd.DataFrame(data)
-    print(f"✅ Loaded {len(df)} URL records")
-    print(f"   Features: {len(df.columns)} columns")
-    
-except FileNotFoundError:
-    print("❌ Error: processed_phishing_urls.json not found!")
-    print("   Run '3b_process_phishing.py' first")
-    exit(1)
-
-# Identify label column
-label_cols = ['label', 'phishing', 'class', 'target']
-label_col = None
-for col in label_cols:
-    if col in df.columns:
-        label_col = col
-        break
-
-if label_col is None:
-    print("❌ Error: No label column found!")
-    print(f"   Expected one of: {label_cols}")
-    exit(1)
-
-print(f"   Label column: '{label_col}'")
-
-# Separate features and target
-X = df.drop([label_col], axis=1)
-y = df[label_col]
+if not args.records and is_current(MATRIX_ROOT, RECORDS_PATH, as_jsonl(RECORDS_PATH)):
+    # Binary handoff from 3b: memory-mapped float32 matrix, no parsing
+    matrix, labels, sidecar = load_feature_matrix(MATRIX_ROOT)
+    X_raw = matrix
+    X = pd.DataFrame(matrix, columns=sidecar['features'], copy=False)
+    y = pd.Series(labels, name='label')
+    print(f"✅ Loaded {len(X)} URL records from {MATRIX_ROOT}.npy (memory-mapped)")
+    print(f"   Features: {X.shape[1]} columns")
+
+else:
+    try:
+        # Reads the .jsonl output instead when it is the newer one
+        records_path = resolve_input(RECORDS_PATH)
+        df = pd.DataFrame.from_records(iter_records(records_path))
+        print(f"✅ Loaded {len(df)} URL records")
+        print(f"   Features: {len(df.columns)} columns")
+
+    except FileNotFoundError:
+        print("❌ Error: processed_phishing_urls.json not found!")
+        print("   Run '3b_process_phishing.py' first")
+        exit(1)
+
+    # Identify label column
+    label_cols = ['label', 'phishing', 'class', 'target']
+    label_col = None
+    for col in label_cols:
+        if col in df.columns:
+            label_col = col
+            break
+
+    if label_col is None:
+        print("❌ Error: No label column found!")
+        print(f"   Expected one of: {label_cols}")
+        exit(1)
+
+    print(f"   Label column: '{label_col}'")
+
+    # Separate features and target
+    X = df.drop([label_col], axis=1)
+    y = df[label_col]
+
+    # Handle any remaining non-numeric columns
+    categorical_cols = X.select_dtypes(include=['object']).columns
+    if len(categorical_cols) > 0:
+        print(f"   Encoding {len(categorical_cols)} categorical features...")
+        from sklearn.preprocessing import LabelEncoder
+        for col in categorical_cols:
+            le_cat = LabelEncoder()
+            X[col] = le_cat.fit_transform(X[col].astype(str))
+
+    # Convert all to numeric
+    X = X.apply(pd.to_numeric, errors='coerce').fillna(0)
+    X_raw = X.to_numpy(dtype=np.float32)
 
 # Ensure binary labels (0 and 1)
 if y.nunique() > 2:
@@ -81,18 +158,6 @@ print(f"\n   Class distribution:")
 print(f"      Legitimate (0): {(y == 0).sum()}")
 print(f"      Phishing (1): {(y == 1).sum()}")
 
-# Handle any remaining non-numeric columns
-categorical_cols = X.select_dtypes(include=['object']).columns
-if len(categorical_cols) > 0:
-    print(f"   Encoding {len(categorical_cols)} categorical features...")
-    from sklearn.preprocessing import LabelEncoder
-    for col in categorical_cols:
-        le_cat = LabelEncoder()
-        X[col] = le_cat.fit_transform(X[col].astype(str))
-
-# Convert all to numeric
-X = X.apply(pd.to_numeric, errors='coerce').fillna(0)
-
 print(f"✅ Features: {X.shape[1]} numeric columns")
 
 # ============================================
@@ -100,8 +165,21 @@ print(f"✅ Features: {X.shape[1]} numeric columns")
 # ============================================
 print("\n[2/6] Scaling features...")
 
+# Fitted chunk by chunk: the raw rows stay where they are (memory-mapped
+# or in the records frame) and are scaled when a model reads them
+feature_names = list(X.columns)
+y = y.to_numpy()
+
 scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
+for start in range(0, len(X_raw), SCALE_CHUNK_ROWS):
+    scaler.partial_fit(pd.DataFrame(np.nan_to_num(X_raw[start:start + SCALE_CHUNK_ROWS]), columns=feature_names))
+
+
+def scale(rows):
+    """Scaled float32 copy of raw feature rows (missing values count as 0)"""
+    scaled = scaler.transform(pd.DataFrame(np.nan_to_num(rows), columns=feature_names))
+    return scaled.astype(np.float32, copy=False)
+
 
 print(f"✅ Features scaled using StandardScaler")
 
@@ -111,7 +189,7 @@ print(f"✅ Features scaled using StandardScaler")
 print("\n[3/6] Splitting data...")
 
 # Check if we can stratify (need at least 2 samples per class)
-min_class_count = y.value_counts().min()
+min_class_count = pd.Series(y).value_counts().min()
 can_stratify = min_class_count >= 2
 
 if can_stratify:
@@ -121,230 +199,348 @@ else:
     print(f"   ⚠️  Cannot stratify (min class has {min_class_count} samples)")
     stratify_param = None
 
-X_train, X_test, y_train, y_test = train_test_split(
-    X_scaled, y,
+# Row indices only; the rows themselves are read (and scaled) below
+train_idx, test_idx = train_test_split(
+    np.arange(len(y)),
     test_size=0.2,
     random_state=42,
     stratify=stratify_param
 )
+# Sorted, so a memory-mapped matrix is read front to back
+train_idx, test_idx = np.sort(train_idx), np.sort(test_idx)
+y_train, y_test = y[train_idx], y[test_idx]
 
 # Check for validation split
 min_train_count = pd.Series(y_train).value_counts().min()
 can_stratify_val = min_train_count >= 2
 
 # Additional validation split for neural network
-X_train_nn, X_val_nn, y_train_nn, y_val_nn = train_test_split(
-    X_train, y_train,
+fit_idx, val_idx = train_test_split(
+    train_idx,
     test_size=0.2,
     random_state=42,
     stratify=y_train if can_stratify_val else None
 )
+fit_idx, val_idx = np.sort(fit_idx), np.sort(val_idx)
+y_train_nn, y_val_nn = y[fit_idx], y[val_idx]
+
+# Scaled copies only for the tree models (and their evaluation); the
+# neural network streams its rows from X_raw
+X_train = X_test = X_train_nn = X_val_nn = None
+if 'rf' in args.models or 'xgb' in args.models:
+    X_train, X_test = scale(X_raw[train_idx]), scale(X_raw[test_idx])
+    if args.search or (args.xgb_hist and 'xgb' in args.models):
+        X_train_nn, X_val_nn = scale(X_raw[fit_idx]), scale(X_raw[val_idx])
 
 print(f"✅ Split complete")
-print(f"   Training: {X_train.shape[0]} samples")
-print(f"   Testing: {X_test.shape[0]} samples")
-print(f"   Validation (NN): {X_val_nn.shape[0]} samples")
+print(f"   Training: {len(train_idx)} samples")
+print(f"   Testing: {len(test_idx)} samples")
+print(f"   Validation (NN): {len(val_idx)} samples")
 
 # ============================================
 # 4. TRAIN MODELS
 # ============================================
-results = {}
-
-# ============================================
-# MODEL 1: RANDOM FOREST
-# ============================================
-print("\n" + "=" * 70)
-print("MODEL 1: RANDOM FOREST")
-print("=" * 70)
-
-rf_model = RandomForestClassifier(
-    n_estimators=200,
-    max_depth=15,
-    min_samples_split=5,
-    min_samples_leaf=2,
-    random_state=42,
-    n_jobs=-1,
-    class_weight='balanced',  # Handle any class imbalance
-    verbose=0
-)
-
-print("Training Random Forest (200 trees)...")
-rf_model.fit(X_train, y_train)
-
-print("Evaluating...")
-rf_pred = rf_model.predict(X_test)
-rf_pred_proba = rf_model.predict_proba(X_test)[:, 1]
-
-rf_accuracy = accuracy_score(y_test, rf_pred)
-rf_precision = precision_score(y_test, rf_pred, zero_division=0)
-rf_recall = recall_score(y_test, rf_pred, zero_division=0)
-rf_f1 = f1_score(y_test, rf_pred, zero_division=0)
-rf_auc = roc_auc_score(y_test, rf_pred_proba)
-
-results['Random Forest'] = {
-    'accuracy': rf_accuracy,
-    'precision': rf_precision,
-    'recall': rf_recall,
-    'f1_score': rf_f1,
-    'auc_roc': rf_auc
-}
-
-print(f"\n✅ Random Forest Results:")
-print(f"   Accuracy:  {rf_accuracy:.4f}")
-print(f"   Precision: {rf_precision:.4f}")
-print(f"   Recall:    {rf_recall:.4f}")
-print(f"   F1-Score:  {rf_f1:.4f}")
-print(f"   AUC-ROC:   {rf_auc:.4f}")
-
-# Feature importance
-feature_importance = pd.DataFrame({
-    'feature': X.columns,
-    'importance': rf_model.feature_importances_
-}).sort_values('importance', ascending=False)
-
-print(f"\n   Top 5 Important Features:")
-for idx, row in feature_importance.head(5).iterrows():
-    print(f"      {row['feature']}: {row['importance']:.4f}")
-
-# ============================================
-# MODEL 2: XGBOOST
-# ============================================
-print("\n" + "=" * 70)
-print("MODEL 2: XGBOOST")
-print("=" * 70)
+# The three models are fitted concurrently, each limited to its share of
+# --cpu-budget threads (see training_scheduler.py), then evaluated below
 
 # Calculate scale_pos_weight for imbalanced data
 scale_pos_weight = (y_train == 0).sum() / (y_train == 1).sum()
 
-xgb_model = XGBClassifier(
-    n_estimators=200,
-    max_depth=8,
-    learning_rate=0.1,
-    subsample=0.8,
-    colsample_bytree=0.8,
-    scale_pos_weight=scale_pos_weight,
-    random_state=42,
-    eval_metric='logloss',
-    use_label_encoder=False,
-    verbosity=0
-)
+# Optional hyperparameter search (scored by validation AUC)
+SEARCH_LOG = 'models/evaluation/phishing_detection_search_trials.jsonl'
+TUNED_PARAMS_PATH = 'models/evaluation/phishing_detection_tuned_params.json'
+
+search_families = {label: family for label, family in {'Random Forest': 'rf', 'XGBoost': 'xgb'}.items()
+                   if family in args.models}
+
+tuned = {}
+if args.search and search_families:
+    print("\n" + "=" * 70)
+    print(f"HYPERPARAMETER SEARCH ({args.search_budget:.0f}s budget)")
+    print("=" * 70)
+    tuned = search_models(
+        search_families,
+        X_train_nn, y_train_nn, X_val_nn, y_val_nn,
+        task='binary',
+        budget_seconds=args.search_budget,
+        workers=args.search_workers or args.cpu_budget,
+        fixed_params={'xgb': {'scale_pos_weight': scale_pos_weight}},
+        log_path=SEARCH_LOG
+    )
+    # Keep earlier results for models not searched this time (--models)
+    save_tuned(TUNED_PARAMS_PATH, {**load_tuned(TUNED_PARAMS_PATH), **tuned})
+    print(f"✅ Saved: {TUNED_PARAMS_PATH} (trial log: {SEARCH_LOG})")
+elif args.tuned:
+    tuned = load_tuned(TUNED_PARAMS_PATH)
+    print(f"✅ Using tuned parameters for: {', '.join(tuned) or 'none found'}")
+
+
+def fit_random_forest(threads):
+    params = {
+        'n_estimators': 200,
+        'max_depth': 15,
+        'min_samples_split': 5,
+        'min_samples_leaf': 2,
+        **tuned.get('Random Forest', {})
+    }
+    model = RandomForestClassifier(
+        **params,
+        random_state=42,
+        n_jobs=threads,
+        class_weight='balanced',  # Handle any class imbalance
+        verbose=0
+    )
+    model.fit(X_train, y_train)
+    return model
+
+
+def fit_xgboost(threads):
+    params = {
+        'max_depth': 8,
+        'learning_rate': 0.1,
+        'subsample': 0.8,
+        'colsample_bytree': 0.8,
+        **tuned.get('XGBoost', {})
+    }
 
-print("Training XGBoost (200 boosting rounds)...")
-xgb_model.fit(X_train, y_train, verbose=False)
-
-print("Evaluating...")
-xgb_pred = xgb_model.predict(X_test)
-xgb_pred_proba = xgb_model.predict_proba(X_test)[:, 1]
-
-xgb_accuracy = accuracy_score(y_test, xgb_pred)
-xgb_precision = precision_score(y_test, xgb_pred, zero_division=0)
-xgb_recall = recall_score(y_test, xgb_pred, zero_division=0)
-xgb_f1 = f1_score(y_test, xgb_pred, zero_division=0)
-xgb_auc = roc_auc_score(y_test, xgb_pred_proba)
-
-results['XGBoost'] = {
-    'accuracy': xgb_accuracy,
-    'precision': xgb_precision,
-    'recall': xgb_recall,
-    'f1_score': xgb_f1,
-    'auc_roc': xgb_auc
-}
+    from xgboost import XGBClassifier
+    from xgb_training import QuantizedSplit, hist_params, DEFAULT_MAX_ROUNDS
+
+    if args.xgb_hist:
+        # Quantized once; stops when validation logloss stops improving
+        rounds = params.pop('n_estimators', DEFAULT_MAX_ROUNDS)
+        split = QuantizedSplit(X_train_nn, X_val_nn, threads=threads)
+        params = hist_params('binary:logistic', scale_pos_weight=scale_pos_weight,
+                             eval_metric='logloss', **params)
+        return split.train(params, y_train_nn, y_val_nn, num_boost_round=rounds, threads=threads)
+
+    model = XGBClassifier(
+        **{'n_estimators': 200, **params},
+        scale_pos_weight=scale_pos_weight,
+        random_state=42,
+        eval_metric='logloss',
+        use_label_encoder=False,
+        n_jobs=threads,
+        verbosity=0
+    )
+    model.fit(X_train, y_train, verbose=False)
+    return model
+
+
+def fit_neural_network(threads):
+    import tensorflow as tf
+    from tensorflow import keras
+    from tensorflow.keras import layers
+    from nn_input import array_dataset
+
+    # Build architecture
+    model = keras.Sequential([
+        layers.Dense(64, activation='relu', input_shape=(X_raw.shape[1],)),
+        layers.BatchNormalization(),
+        layers.Dropout(0.3),
+
+        layers.Dense(32, activation='relu'),
+        layers.BatchNormalization(),
+        layers.Dropout(0.2),
+
+        layers.Dense(16, activation='relu'),
+        layers.Dropout(0.2),
+
+        layers.Dense(1, activation='sigmoid')
+    ], name='PhishingDetectionNN')
+
+    model.compile(
+        optimizer=keras.optimizers.Adam(learning_rate=0.001),
+        loss='binary_crossentropy',
+        metrics=['accuracy', tf.keras.metrics.AUC(name='auc')]
+    )
+
+    # Callbacks
+    early_stop = keras.callbacks.EarlyStopping(
+        monitor='val_loss',
+        patience=15,
+        restore_best_weights=True,
+        verbose=0
+    )
+
+    reduce_lr = keras.callbacks.ReduceLROnPlateau(
+        monitor='val_loss',
+        factor=0.5,
+        patience=5,
+        min_lr=0.00001,
+        verbose=0
+    )
+
+    # Rows streamed from X_raw and scaled per chunk; binary labels stay a
+    # float vector (no one-hot copies)
+    history = model.fit(
+        array_dataset(X_raw, y, 128, rows=fit_idx, transform=scale, shuffle=True,
+                      label_dtype=np.float32, threads=threads),
+        validation_data=array_dataset(X_raw, y, 128, rows=val_idx, transform=scale, cache='',
+                                      label_dtype=np.float32, threads=threads),
+        epochs=100,
+        callbacks=[early_stop, reduce_lr],
+        verbose=0
+    )
+    return model, history
 
-print(f"\n✅ XGBoost Results:")
-print(f"   Accuracy:  {xgb_accuracy:.4f}")
-print(f"   Precision: {xgb_precision:.4f}")
-print(f"   Recall:    {xgb_recall:.4f}")
-print(f"   F1-Score:  {xgb_f1:.4f}")
-print(f"   AUC-ROC:   {xgb_auc:.4f}")
 
-# ============================================
-# MODEL 3: NEURAL NETWORK
-# ============================================
 print("\n" + "=" * 70)
-print("MODEL 3: NEURAL NETWORK")
+print("TRAINING MODELS")
 print("=" * 70)
+descriptions = {
+    'rf': "Random Forest (200 trees)",
+    'xgb': "XGBoost (hist, early stopping)" if args.xgb_hist else "XGBoost (200 boosting rounds)",
+    'nn': "Neural Network",
+}
+print(", ".join(descriptions[model] for model in args.models))
+if tuned:
+    print(f"   Tuned parameters for: {', '.join(tuned)}")
+
+jobs = {
+    'rf': TrainingJob('Random Forest', fit_random_forest, weight=2),
+    'xgb': TrainingJob('XGBoost', fit_xgboost, weight=2),
+    'nn': TrainingJob('Neural Network', fit_neural_network, weight=1, uses_tensorflow=True),
+}
+trained, schedule = run_jobs([jobs[model] for model in args.models],
+                             cpu_budget=args.cpu_budget, parallel=not args.sequential)
+print_report(schedule)
 
-# Build architecture
-nn_model = keras.Sequential([
-    layers.Dense(64, activation='relu', input_shape=(X_train.shape[1],)),
-    layers.BatchNormalization(),
-    layers.Dropout(0.3),
-    
-    layers.Dense(32, activation='relu'),
-    layers.BatchNormalization(),
-    layers.Dropout(0.2),
-    
-    layers.Dense(16, activation='relu'),
-    layers.Dropout(0.2),
-    
-    layers.Dense(1, activation='sigmoid')
-], name='PhishingDetectionNN')
-
-nn_model.compile(
-    optimizer=keras.optimizers.Adam(learning_rate=0.001),
-    loss='binary_crossentropy',
-    metrics=['accuracy', tf.keras.metrics.AUC(name='auc')]
-)
-
-print(f"\n🧠 Neural Network Architecture:")
-print(f"   Input: {X_train.shape[1]} features")
-print(f"   Hidden Layers: 64 → 32 → 16 neurons")
-print(f"   Output: 1 neuron (sigmoid)")
-print(f"   Total Parameters: {nn_model.count_params():,}")
-
-# Callbacks
-early_stop = keras.callbacks.EarlyStopping(
-    monitor='val_loss',
-    patience=15,
-    restore_best_weights=True,
-    verbose=0
-)
-
-reduce_lr = keras.callbacks.ReduceLROnPlateau(
-    monitor='val_loss',
-    factor=0.5,
-    patience=5,
-    min_lr=0.00001,
-    verbose=0
-)
-
-print("\nTraining Neural Network...")
-history = nn_model.fit(
-    X_train_nn, y_train_nn,
-    validation_data=(X_val_nn, y_val_nn),
-    epochs=100,
-    batch_size=128,
-    callbacks=[early_stop, reduce_lr],
-    verbose=0
-)
+results = {}
+predictions = {}
+
+if 'rf' in args.models:
+    # ============================================
+    # MODEL 1: RANDOM FOREST
+    # ============================================
+    print("\n" + "=" * 70)
+    print("MODEL 1: RANDOM FOREST")
+    print("=" * 70)
+
+    rf_model = trained['Random Forest']
+
+    print("Evaluating...")
+    rf_pred = rf_model.predict(X_test)
+    rf_pred_proba = rf_model.predict_proba(X_test)[:, 1]
+
+    rf_accuracy = accuracy_score(y_test, rf_pred)
+    rf_precision = precision_score(y_test, rf_pred, zero_division=0)
+    rf_recall = recall_score(y_test, rf_pred, zero_division=0)
+    rf_f1 = f1_score(y_test, rf_pred, zero_division=0)
+    rf_auc = roc_auc_score(y_test, rf_pred_proba)
+
+    predictions['Random Forest'] = rf_pred
+    results['Random Forest'] = {
+        'accuracy': rf_accuracy,
+        'precision': rf_precision,
+        'recall': rf_recall,
+        'f1_score': rf_f1,
+        'auc_roc': rf_auc
+    }
 
-print(f"✅ Training completed in {len(history.history['loss'])} epochs")
-
-# Evaluate
-print("Evaluating...")
-nn_pred_proba = nn_model.predict(X_test, verbose=0).flatten()
-nn_pred = (nn_pred_proba > 0.5).astype(int)
-
-nn_accuracy = accuracy_score(y_test, nn_pred)
-nn_precision = precision_score(y_test, nn_pred, zero_division=0)
-nn_recall = recall_score(y_test, nn_pred, zero_division=0)
-nn_f1 = f1_score(y_test, nn_pred, zero_division=0)
-nn_auc = roc_auc_score(y_test, nn_pred_proba)
-
-results['Neural Network'] = {
-    'accuracy': nn_accuracy,
-    'precision': nn_precision,
-    'recall': nn_recall,
-    'f1_score': nn_f1,
-    'auc_roc': nn_auc
-}
+    print(f"\n✅ Random Forest Results:")
+    print(f"   Accuracy:  {rf_accuracy:.4f}")
+    print(f"   Precision: {rf_precision:.4f}")
+    print(f"   Recall:    {rf_recall:.4f}")
+    print(f"   F1-Score:  {rf_f1:.4f}")
+    print(f"   AUC-ROC:   {rf_auc:.4f}")
+
+    # Feature importance
+    feature_importance = pd.DataFrame({
+        'feature': X.columns,
+        'importance': rf_model.feature_importances_
+    }).sort_values('importance', ascending=False)
+
+    print(f"\n   Top 5 Important Features:")
+    for idx, row in feature_importance.head(5).iterrows():
+        print(f"      {row['feature']}: {row['importance']:.4f}")
+
+if 'xgb' in args.models:
+    # ============================================
+    # MODEL 2: XGBOOST
+    # ============================================
+    print("\n" + "=" * 70)
+    print("MODEL 2: XGBOOST")
+    print("=" * 70)
+
+    xgb_model = trained['XGBoost']
+
+    print("Evaluating...")
+    xgb_pred = xgb_model.predict(X_test)
+    xgb_pred_proba = xgb_model.predict_proba(X_test)[:, 1]
+
+    xgb_accuracy = accuracy_score(y_test, xgb_pred)
+    xgb_precision = precision_score(y_test, xgb_pred, zero_division=0)
+    xgb_recall = recall_score(y_test, xgb_pred, zero_division=0)
+    xgb_f1 = f1_score(y_test, xgb_pred, zero_division=0)
+    xgb_auc = roc_auc_score(y_test, xgb_pred_proba)
+
+    predictions['XGBoost'] = xgb_pred
+    results['XGBoost'] = {
+        'accuracy': xgb_accuracy,
+        'precision': xgb_precision,
+        'recall': xgb_recall,
+        'f1_score': xgb_f1,
+        'auc_roc': xgb_auc
+    }
+    if args.xgb_hist:
+        results['XGBoost']['boosting_rounds'] = xgb_model.n_rounds
+        print(f"   Early stopping kept {xgb_model.n_rounds} boosting rounds")
+
+    print(f"\n✅ XGBoost Results:")
+    print(f"   Accuracy:  {xgb_accuracy:.4f}")
+    print(f"   Precision: {xgb_precision:.4f}")
+    print(f"   Recall:    {xgb_recall:.4f}")
+    print(f"   F1-Score:  {xgb_f1:.4f}")
+    print(f"   AUC-ROC:   {xgb_auc:.4f}")
+
+if 'nn' in args.models:
+    # ============================================
+    # MODEL 3: NEURAL NETWORK
+    # ============================================
+    print("\n" + "=" * 70)
+    print("MODEL 3: NEURAL NETWORK")
+    print("=" * 70)
+
+    from nn_input import array_dataset
+
+    nn_model, history = trained['Neural Network']
+
+    print(f"\n🧠 Neural Network Architecture:")
+    print(f"   Input: {X_raw.shape[1]} features")
+    print(f"   Hidden Layers: 64 → 32 → 16 neurons")
+    print(f"   Output: 1 neuron (sigmoid)")
+    print(f"   Total Parameters: {nn_model.count_params():,}")
+
+    print(f"✅ Training completed in {len(history.history['loss'])} epochs")
+
+    # Evaluate
+    print("Evaluating...")
+    nn_pred_proba = nn_model.predict(
+        array_dataset(X_raw, y, 1024, rows=test_idx, transform=scale), verbose=0).flatten()
+    nn_pred = (nn_pred_proba > 0.5).astype(int)
+
+    nn_accuracy = accuracy_score(y_test, nn_pred)
+    nn_precision = precision_score(y_test, nn_pred, zero_division=0)
+    nn_recall = recall_score(y_test, nn_pred, zero_division=0)
+    nn_f1 = f1_score(y_test, nn_pred, zero_division=0)
+    nn_auc = roc_auc_score(y_test, nn_pred_proba)
+
+    predictions['Neural Network'] = nn_pred
+    results['Neural Network'] = {
+        'accuracy': nn_accuracy,
+        'precision': nn_precision,
+        'recall': nn_recall,
+        'f1_score': nn_f1,
+        'auc_roc': nn_auc
+    }
 
-print(f"\n✅ Neural Network Results:")
-print(f"   Accuracy:  {nn_accuracy:.4f}")
-print(f"   Precision: {nn_precision:.4f}")
-print(f"   Recall:    {nn_recall:.4f}")
-print(f"   F1-Score:  {nn_f1:.4f}")
-print(f"   AUC-ROC:   {nn_auc:.4f}")
+    print(f"\n✅ Neural Network Results:")
+    print(f"   Accuracy:  {nn_accuracy:.4f}")
+    print(f"   Precision: {nn_precision:.4f}")
+    print(f"   Recall:    {nn_recall:.4f}")
+    print(f"   F1-Score:  {nn_f1:.4f}")
+    print(f"   AUC-ROC:   {nn_auc:.4f}")
 
 # ============================================
 # 5. COMPARE MODELS
@@ -373,15 +569,18 @@ os.makedirs('models/saved_models/phishing_detection', exist_ok=True)
 os.makedirs('models/preprocessors', exist_ok=True)
 os.makedirs('models/evaluation', exist_ok=True)
 
-# Save all models
-joblib.dump(rf_model, 'models/saved_models/phishing_detection/rf_model.pkl')
-print("✅ Saved: rf_model.pkl")
+# Save all trained models
+if 'rf' in args.models:
+    joblib.dump(rf_model, 'models/saved_models/phishing_detection/rf_model.pkl')
+    print("✅ Saved: rf_model.pkl")
 
-joblib.dump(xgb_model, 'models/saved_models/phishing_detection/xgb_model.pkl')
-print("✅ Saved: xgb_model.pkl")
+if 'xgb' in args.models:
+    joblib.dump(xgb_model, 'models/saved_models/phishing_detection/xgb_model.pkl')
+    print("✅ Saved: xgb_model.pkl")
 
-nn_model.save('models/saved_models/phishing_detection/nn_model.h5')
-print("✅ Saved: nn_model.h5")
+if 'nn' in args.models:
+    nn_model.save('models/saved_models/phishing_detection/nn_model.h5')
+    print("✅ Saved: nn_model.h5")
 
 # Save best model
 if best_model_name == 'Neural Network':
@@ -398,16 +597,25 @@ else:
 joblib.dump(scaler, 'models/preprocessors/phishing_scaler.pkl')
 print("✅ Saved: preprocessor (scaler)")
 
-# Save feature names
-with open('models/preprocessors/phishing_feature_names.json', 'w') as f:
+# Save feature names (the order phishing_features.extract_batch produces
+# when the data came from raw URLs)
+with open(FEATURE_NAMES_PATH, 'w') as f:
     json.dump(list(X.columns), f)
 
+# Held-out rows, for checking the saved models on real data
+save_holdout('phishing_detection', test_idx, len(X_raw))
+print("✅ Saved: held-out rows")
+
 # Save evaluation metrics
 evaluation_data = {
     'models': results,
     'best_model': best_model_name,
-    'training_samples': len(X_train),
-    'test_samples': len(X_test),
+    'feature_version': FEATURE_VERSION if list(X.columns) == FEATURE_NAMES else None,
+    'training_schedule': schedule,
+    'import_seconds': import_seconds,
+    'tuned_params': tuned,
+    'training_samples': len(train_idx),
+    'test_samples': len(test_idx),
     'class_distribution': {
         'legitimate': int((y == 0).sum()),
         'phishing': int((y == 1).sum())
@@ -420,14 +628,7 @@ with open('models/evaluation/phishing_detection_metrics.json', 'w') as f:
 print("✅ Saved: evaluation metrics")
 
 # Save confusion matrix
-if best_model_name == 'Random Forest':
-    best_pred = rf_pred
-elif best_model_name == 'XGBoost':
-    best_pred = xgb_pred
-else:
-    best_pred = nn_pred
-
-cm = confusion_matrix(y_test, best_pred)
+cm = confusion_matrix(y_test, predictions[best_model_name])
 cm_data = {
     'confusion_matrix': cm.tolist(),
     'class_names': ['Legitimate', 'Phishing']
@@ -447,13 +648,12 @@ print("=" * 70)
 
 print(f"\n📊 Summary:")
 print(f"   Dataset: Phishing URL Detection")
-print(f"   Samples: {len(df)}")
+print(f"   Samples: {len(X)}")
 print(f"   Features: {X.shape[1]}")
 print(f"   Task: Binary Classification")
-print(f"\n   Models Trained: 3")
-print(f"      ✓ Random Forest")
-print(f"      ✓ XGBoost")
-print(f"      ✓ Neural Network")
+print(f"\n   Models Trained: {len(results)}")
+for model_name in results:
+    print(f"      ✓ {model_name}")
 print(f"\n   🏆 Best Model: {best_model_name} (AUC: {best_auc:.4f})")
 
 print(f"\n📁 Saved to:")
@@ -4,14 +4,36 @@ Script: 6_train_vulnerability_scoring.py
 
 Tests 3 algorithms: Random Forest, XGBoost, and Neural Network
 Two tasks: Regression (risk score 0-100) and Classification (Low/Med/High severity)
+
+The risk score is the closed-form formula in risk_scoring.py, and
+10_score_vulnerabilities.py scores the catalog with it directly - that is
+the vulnerability score the pipeline uses. Both targets here are derived
+from that formula, so these models are an optional layer: they learn to
+reproduce it, and are kept as a benchmark
+(10_score_vulnerabilities.py --compare-model) and a starting point for
+models trained on other labels.
+
+Usage:
+    python scripts/6_train_vulnerability_scoring.py
+    python scripts/6_train_vulnerability_scoring.py --delta   # retrain only if the last KEV sync changed something
+    python scripts/6_train_vulnerability_scoring.py --cpu-budget 16   # cores shared by all six models
+    python scripts/6_train_vulnerability_scoring.py --xgb-hist   # histogram XGBoost, one quantized matrix for both tasks
+    python scripts/6_train_vulnerability_scoring.py --search --search-budget 600   # tune RF / XGBoost for both tasks
+    python scripts/6_train_vulnerability_scoring.py --tuned   # reuse the parameters found by the last --search
+    python scripts/6_train_vulnerability_scoring.py --models rf,xgb   # no neural networks (TensorFlow is never imported)
+    python scripts/6_train_vulnerability_scoring.py --text-features   # + hashed TF-IDF of the KEV text (sparse, RF / XGBoost)
+    python scripts/6_train_vulnerability_scoring.py --category-encoding target   # vendor / product as smoothed mean risk
+
+TensorFlow and XGBoost are imported only when a selected model needs
+them; the import time and RSS are reported at startup.
 """
 
+import argparse
 import pandas as pd
 import json
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
-from xgboost import XGBRegressor, XGBClassifier
 from sklearn.preprocessing import LabelEncoder, StandardScaler
 from sklearn.metrics import (
     mean_squared_error,
@@ -24,25 +46,83 @@ from sklearn.metrics import (
     classification_report,
     confusion_matrix
 )
-import tensorflow as tf
-from tensorflow import keras
-from tensorflow.keras import layers
 import joblib
 import os
 import warnings
+from raw_store import load_cisa_kev, load_cisa_kev_delta
+from runtime_stats import import_modules, format_import_report
+from training_scheduler import TrainingJob, run_jobs, print_report, parse_models, frameworks_for
+from hyperparameter_search import search_models, save_tuned, load_tuned, DEFAULT_BUDGET_SECONDS
+from text_features import KevTextVectorizer, kev_text, stack_features, DEFAULT_TEXT_BUCKETS, TEXT_COLUMNS
+from vocabulary_store import VocabularyStore, ENCODINGS, VOCABULARY_PATH, KEV_CATEGORY_COLUMNS
+from risk_scoring import kev_features, risk_score, severity_labels, SEVERITY_LABELS
+from model_inputs import save_holdout
 warnings.filterwarnings('ignore')
 
+parser = argparse.ArgumentParser(description="Train vulnerability risk scoring models")
+parser.add_argument('--delta', action='store_true',
+                    help="Skip retraining when the last CISA KEV sync found no new/changed CVEs")
+parser.add_argument('--cpu-budget', type=int, default=None,
+                    help="Cores shared by the concurrently trained models; with more models than cores, "
+                         "the extra models wait in a queue (default: all)")
+parser.add_argument('--sequential', action='store_true',
+                    help="Train the models one after another (still within the CPU budget). "
+                         "Per-model CPU utilization is only measured in this mode; concurrent "
+                         "runs report it for the whole run")
+parser.add_argument('--xgb-hist', action='store_true',
+                    help="Histogram XGBoost on a quantized matrix shared by both tasks, with early stopping")
+parser.add_argument('--search', action='store_true',
+                    help="Hyperband search for Random Forest / XGBoost parameters (both tasks) before training")
+parser.add_argument('--search-budget', type=float, default=DEFAULT_BUDGET_SECONDS,
+                    help=f"Wall-clock seconds for --search, shared by both tasks (default: {DEFAULT_BUDGET_SECONDS})")
+parser.add_argument('--search-workers', type=int, default=None,
+                    help="Parallel trials for --search (default: --cpu-budget or all cores)")
+parser.add_argument('--tuned', action='store_true',
+                    help="Train with the parameters saved by the last --search")
+parser.add_argument('--text-features', action='store_true',
+                    help="Add hashed TF-IDF features of the vulnerability names and descriptions "
+                         "(sparse; used by Random Forest / XGBoost, not the neural networks)")
+parser.add_argument('--text-buckets', type=int, default=DEFAULT_TEXT_BUCKETS,
+                    help=f"Hash buckets for --text-features (default: {DEFAULT_TEXT_BUCKETS})")
+parser.add_argument('--category-encoding', choices=ENCODINGS, default='code',
+                    help="Vendor / product features: stable vocabulary code, frequency, or "
+                         "smoothed mean risk score of the training rows (default: code)")
+parser.add_argument('--models', type=parse_models, default='rf,xgb,nn',
+                    help="Comma-separated models to train for both tasks: rf, xgb, nn (default: all)")
+args = parser.parse_args()
+
 print("=" * 70)
 print("VULNERABILITY RISK SCORING MODEL TRAINING (CISA KEV)")
 print("=" * 70)
 
+# Heavy frameworks are loaded once, here, and only for the selected models
+import_seconds = import_modules(frameworks_for(args.models))
+print(f"   Models: {', '.join(args.models)} | imported {format_import_report(import_seconds)}")
+
 # ============================================
 # 1. LOAD AND PREPARE CISA DATA
 # ============================================
 print("\n[1/7] Loading CISA KEV data...")
 
+if args.delta:
+    try:
+        delta = load_cisa_kev_delta(columns=['cveID'])
+    except FileNotFoundError as e:
+        print(f"❌ Error: {e}")
+        exit(1)
+
+    if len(delta) == 0:
+        print("✅ No new or changed CVEs since the last sync - models are up to date")
+        exit(0)
+
+    print(f"   🔄 {len(delta)} new/changed CVEs since the last sync "
+          f"({(delta['change'] == 'new').sum()} new) - retraining")
+
 try:
-    df = pd.read_csv('data/raw/cisa_kev.csv')
+    df = load_cisa_kev(columns=[
+        'cveID', 'vendorProject', 'product', 'vulnerabilityName', 'dateAdded',
+        'shortDescription', 'dueDate', 'knownRansomwareCampaignUse'
+    ])
     print(f"✅ Loaded {len(df)} vulnerability records")
     print(f"   Columns: {list(df.columns)}")
     
@@ -60,51 +140,27 @@ print("\n[2/7] Engineering features from CISA data...")
 # cveID, vendorProject, product, vulnerabilityName, dateAdded, 
 # shortDescription, requiredAction, dueDate, knownRansomwareCampaignUse
 
-# Create temporal features
-if 'dateAdded' in df.columns:
-    df['dateAdded'] = pd.to_datetime(df['dateAdded'], errors='coerce')
-    df['days_since_added'] = (pd.Timestamp.now() - df['dateAdded']).dt.days
-    df['month_added'] = df['dateAdded'].dt.month
-    df['year_added'] = df['dateAdded'].dt.year
-    print("   ✅ Created temporal features")
-
-if 'dueDate' in df.columns:
-    df['dueDate'] = pd.to_datetime(df['dueDate'], errors='coerce')
-    df['has_due_date'] = df['dueDate'].notna().astype(int)
-    df['days_until_due'] = (df['dueDate'] - pd.Timestamp.now()).dt.days
-    df['days_until_due'] = df['days_until_due'].fillna(999)  # No due date = far future
-    print("   ✅ Created due date features")
-
-# Text-based features
-if 'shortDescription' in df.columns:
-    df['description_length'] = df['shortDescription'].apply(lambda x: len(str(x)) if pd.notna(x) else 0)
-    df['description_words'] = df['shortDescription'].apply(lambda x: len(str(x).split()) if pd.notna(x) else 0)
-    print("   ✅ Created description features")
-
-if 'vulnerabilityName' in df.columns:
-    df['vuln_name_length'] = df['vulnerabilityName'].apply(lambda x: len(str(x)) if pd.notna(x) else 0)
-
-# Ransomware indicator
-if 'knownRansomwareCampaignUse' in df.columns:
-    df['is_ransomware'] = df['knownRansomwareCampaignUse'].apply(
-        lambda x: 1 if str(x).lower() == 'known' else 0
-    )
-    print("   ✅ Created ransomware indicator")
-
-# Encode categorical variables
-categorical_features = {}
-
-if 'vendorProject' in df.columns:
-    vendor_encoder = LabelEncoder()
-    df['vendor_encoded'] = vendor_encoder.fit_transform(df['vendorProject'].astype(str))
-    categorical_features['vendor'] = vendor_encoder
-    print(f"   ✅ Encoded vendors: {len(vendor_encoder.classes_)} unique")
-
-if 'product' in df.columns:
-    product_encoder = LabelEncoder()
-    df['product_encoded'] = product_encoder.fit_transform(df['product'].astype(str))
-    categorical_features['product'] = product_encoder
-    print(f"   ✅ Encoded products: {len(product_encoder.classes_)} unique")
+# Temporal, due date, description and ransomware features (risk_scoring.py,
+# shared with 10_score_vulnerabilities.py)
+kev_feature_frame = kev_features(df)
+for col in kev_feature_frame.columns:
+    df[col] = kev_feature_frame[col]
+print(f"   ✅ Created {len(kev_feature_frame.columns)} features: {', '.join(kev_feature_frame.columns)}")
+
+# Encode categorical variables with the persistent vocabularies: vendors
+# and products keep their codes from earlier runs, new ones are appended
+# and anything unknown at inference falls into the unseen bucket (code 0)
+categorical_columns = {name: col for name, col in KEV_CATEGORY_COLUMNS.items() if col in df.columns}
+vocabularies = VocabularyStore.load(VOCABULARY_PATH)
+new_categories = {}
+
+for name, col in categorical_columns.items():
+    new_categories[name] = vocabularies[name].update(df[col])
+    # Target encoding needs the risk score and the training rows (step 3)
+    if args.category_encoding != 'target':
+        df[f'{name}_encoded'] = vocabularies[name].transform(df[col], args.category_encoding)
+    print(f"   ✅ Encoded {name}s ({args.category_encoding}): {df[col].nunique()} unique, "
+          f"{new_categories[name]} new, {len(vocabularies[name])} in the vocabulary")
 
 # ============================================
 # 3. CREATE TARGET VARIABLES
@@ -112,52 +168,16 @@ if 'product' in df.columns:
 print("\n[3/7] Creating target variables...")
 
 # TARGET 1: RISK SCORE (Regression - 0 to 100)
-# Create synthetic risk score based on urgency and characteristics
-risk_components = []
-
-# Component 1: Urgency (40 points max)
-if 'has_due_date' in df.columns:
-    urgency_score = df['has_due_date'] * 20
-    days_score = np.clip(30 - (df['days_until_due'] / 10), 0, 20)
-    risk_components.append(urgency_score + days_score)
-else:
-    risk_components.append(pd.Series([20] * len(df)))
-
-# Component 2: Recency (30 points max)
-if 'days_since_added' in df.columns:
-    recency_score = np.clip(30 - (df['days_since_added'] / 20), 0, 30)
-    risk_components.append(recency_score)
-else:
-    risk_components.append(pd.Series([15] * len(df)))
-
-# Component 3: Ransomware (20 points)
-if 'is_ransomware' in df.columns:
-    risk_components.append(df['is_ransomware'] * 20)
-else:
-    risk_components.append(pd.Series([0] * len(df)))
-
-# Component 4: Complexity (10 points)
-if 'description_length' in df.columns:
-    complexity_score = np.clip(df['description_length'] / 50, 0, 10)
-    risk_components.append(complexity_score)
-else:
-    risk_components.append(pd.Series([5] * len(df)))
-
-# Sum and normalize to 0-100
-df['risk_score'] = sum(risk_components)
-df['risk_score'] = np.clip(df['risk_score'], 0, 100)
+# The closed-form score from urgency (40), recency (30), ransomware (20)
+# and complexity (10) points - see risk_scoring.py
+df['risk_score'] = risk_score(df)
 
 print(f"   ✅ Created risk_score (regression target)")
 print(f"      Range: {df['risk_score'].min():.1f} - {df['risk_score'].max():.1f}")
 print(f"      Mean: {df['risk_score'].mean():.1f}")
 
 # TARGET 2: SEVERITY LEVEL (Classification - Low/Medium/High)
-df['severity'] = pd.cut(
-    df['risk_score'],
-    bins=[0, 33, 66, 100],
-    labels=['Low', 'Medium', 'High'],
-    include_lowest=True
-)
+df['severity'] = pd.Categorical(severity_labels(df['risk_score']), categories=SEVERITY_LABELS)
 
 severity_encoder = LabelEncoder()
 df['severity_encoded'] = severity_encoder.fit_transform(df['severity'])
@@ -167,6 +187,46 @@ print(f"      Distribution:")
 for sev, count in df['severity'].value_counts().sort_index().items():
     print(f"         {sev}: {count}")
 
+y_regression = df['risk_score'].to_numpy()
+y_classification = df['severity_encoded'].to_numpy()
+
+# Train / test rows, chosen here so that target-encoded categories only
+# learn from the training rows. One split serves both tasks: the
+# regression and classification models train and are tested on the same
+# rows, and --xgb-hist quantizes the training matrix once for both
+# XGBoost models
+min_class_count = pd.Series(y_classification).value_counts().min()
+if min_class_count >= 2:
+    stratify = y_classification
+else:
+    print(f"   ⚠️  Cannot stratify (min class has {min_class_count} samples)")
+    stratify = None
+
+train_idx, test_idx = train_test_split(
+    np.arange(len(df)),
+    test_size=0.2,
+    random_state=42,
+    stratify=stratify
+)
+
+# Validation split for the neural networks (and XGBoost early stopping)
+min_train_count = pd.Series(y_classification[train_idx]).value_counts().min()
+fit_idx, val_idx = train_test_split(
+    train_idx,
+    test_size=0.2,
+    random_state=42,
+    stratify=y_classification[train_idx] if min_train_count >= 2 else None
+)
+
+if args.category_encoding == 'target':
+    for name, col in categorical_columns.items():
+        vocabulary = vocabularies[name].fit_target(df[col].iloc[train_idx], y_regression[train_idx])
+        encoded = vocabulary.transform(df[col], 'target')
+        # Leave-one-out for the training rows, so they do not see their own risk score
+        encoded[train_idx] = vocabulary.transform(df[col].iloc[train_idx], 'target', exclude=y_regression[train_idx])
+        df[f'{name}_encoded'] = encoded
+    print(f"   ✅ Target-encoded {', '.join(categorical_columns)} from {len(train_idx)} training rows")
+
 # ============================================
 # 4. SELECT FEATURES
 # ============================================
@@ -193,8 +253,6 @@ for feat in feature_cols:
 
 # Prepare feature matrix
 X = df[feature_cols].fillna(0)
-y_regression = df['risk_score']
-y_classification = df['severity_encoded']
 
 # Scale features
 scaler = StandardScaler()
@@ -202,314 +260,447 @@ X_scaled = scaler.fit_transform(X)
 
 print(f"\n   ✅ Features scaled")
 
+# Optional text features: the tree models get [scaled numeric | TF-IDF]
+# as one sparse CSR matrix, the neural networks keep the dense numeric
+# features. The kept buckets and IDF weights come from the training rows
+# only, so the test CVEs' words do not leak into them
+X_tree = X_scaled
+text_vectorizer = None
+if args.text_features:
+    text_vectorizer = KevTextVectorizer(n_buckets=args.text_buckets).fit(kev_text(df.iloc[train_idx]))
+    X_text = text_vectorizer.transform(kev_text(df))
+    X_tree = stack_features(X_scaled, X_text)
+    print(f"   ✅ Text features: {text_vectorizer.n_features:,} of {args.text_buckets:,} hash buckets in use, "
+          f"{X_text.nnz / max(1, X_text.shape[0]):.0f} non-zeros per CVE "
+          f"({X_tree.data.nbytes / 1024 ** 2:.1f} MB sparse)")
+
 # ============================================
-# PART A: REGRESSION MODELS (Risk Score)
+# SPLIT DATA
 # ============================================
-print("\n" + "=" * 70)
-print("PART A: REGRESSION - PREDICTING RISK SCORE (0-100)")
-print("=" * 70)
-
-# Split data for regression
-X_train_reg, X_test_reg, y_train_reg, y_test_reg = train_test_split(
-    X_scaled, y_regression,
-    test_size=0.2,
-    random_state=42
-)
-
-X_train_nn_reg, X_val_nn_reg, y_train_nn_reg, y_val_nn_reg = train_test_split(
-    X_train_reg, y_train_reg,
-    test_size=0.2,
-    random_state=42
-)
-
-print(f"\n   Training samples: {len(X_train_reg)}")
-print(f"   Test samples: {len(X_test_reg)}")
-
-regression_results = {}
-
-# --- RANDOM FOREST REGRESSOR ---
-print("\n" + "-" * 70)
-print("Model 1: Random Forest Regressor")
-print("-" * 70)
-
-rf_reg = RandomForestRegressor(
-    n_estimators=100,
-    max_depth=15,
-    min_samples_split=5,
-    random_state=42,
-    n_jobs=-1
-)
-
-print("Training...")
-rf_reg.fit(X_train_reg, y_train_reg)
-
-rf_pred_reg = rf_reg.predict(X_test_reg)
-rf_mse = mean_squared_error(y_test_reg, rf_pred_reg)
-rf_mae = mean_absolute_error(y_test_reg, rf_pred_reg)
-rf_r2 = r2_score(y_test_reg, rf_pred_reg)
-
-regression_results['Random Forest'] = {
-    'mse': rf_mse,
-    'rmse': np.sqrt(rf_mse),
-    'mae': rf_mae,
-    'r2': rf_r2
-}
-
-print(f"✅ Results:")
-print(f"   MSE:  {rf_mse:.4f}")
-print(f"   RMSE: {np.sqrt(rf_mse):.4f}")
-print(f"   MAE:  {rf_mae:.4f}")
-print(f"   R²:   {rf_r2:.4f}")
-
-# --- XGBOOST REGRESSOR ---
-print("\n" + "-" * 70)
-print("Model 2: XGBoost Regressor")
-print("-" * 70)
-
-xgb_reg = XGBRegressor(
-    n_estimators=100,
-    max_depth=8,
-    learning_rate=0.1,
-    random_state=42,
-    verbosity=0
-)
-
-print("Training...")
-xgb_reg.fit(X_train_reg, y_train_reg)
-
-xgb_pred_reg = xgb_reg.predict(X_test_reg)
-xgb_mse = mean_squared_error(y_test_reg, xgb_pred_reg)
-xgb_mae = mean_absolute_error(y_test_reg, xgb_pred_reg)
-xgb_r2 = r2_score(y_test_reg, xgb_pred_reg)
-
-regression_results['XGBoost'] = {
-    'mse': xgb_mse,
-    'rmse': np.sqrt(xgb_mse),
-    'mae': xgb_mae,
-    'r2': xgb_r2
-}
-
-print(f"✅ Results:")
-print(f"   MSE:  {xgb_mse:.4f}")
-print(f"   RMSE: {np.sqrt(xgb_mse):.4f}")
-print(f"   MAE:  {xgb_mae:.4f}")
-print(f"   R²:   {xgb_r2:.4f}")
-
-# --- NEURAL NETWORK REGRESSOR ---
-print("\n" + "-" * 70)
-print("Model 3: Neural Network Regressor")
-print("-" * 70)
-
-nn_reg = keras.Sequential([
-    layers.Dense(64, activation='relu', input_shape=(X_train_reg.shape[1],)),
-    layers.BatchNormalization(),
-    layers.Dropout(0.2),
-    
-    layers.Dense(32, activation='relu'),
-    layers.BatchNormalization(),
-    layers.Dropout(0.2),
-    
-    layers.Dense(16, activation='relu'),
-    
-    layers.Dense(1, activation='linear')  # Linear for regression
-], name='VulnerabilityRiskNN')
-
-nn_reg.compile(
-    optimizer=keras.optimizers.Adam(learning_rate=0.001),
-    loss='mse',
-    metrics=['mae']
-)
-
-print(f"Architecture: {X_train_reg.shape[1]} → 64 → 32 → 16 → 1")
+print("\nSplitting data...")
 
-early_stop = keras.callbacks.EarlyStopping(
-    monitor='val_loss',
-    patience=15,
-    restore_best_weights=True,
-    verbose=0
-)
+# Rows chosen in step 3
+# Tree models (X_tree, sparse with --text-features)
+X_train_reg, X_test_reg = X_tree[train_idx], X_tree[test_idx]
+X_fit_reg, X_val_reg = X_tree[fit_idx], X_tree[val_idx]
+y_train_reg, y_test_reg = y_regression[train_idx], y_regression[test_idx]
+y_train_nn_reg, y_val_nn_reg = y_regression[fit_idx], y_regression[val_idx]
 
-print("Training...")
-history_reg = nn_reg.fit(
-    X_train_nn_reg, y_train_nn_reg,
-    validation_data=(X_val_nn_reg, y_val_nn_reg),
-    epochs=100,
-    batch_size=64,
-    callbacks=[early_stop],
-    verbose=0
-)
+X_train_clf, X_test_clf = X_train_reg, X_test_reg
+X_fit_clf, X_val_clf = X_fit_reg, X_val_reg
+y_train_clf, y_test_clf = y_classification[train_idx], y_classification[test_idx]
+y_train_nn_clf, y_val_nn_clf = y_classification[fit_idx], y_classification[val_idx]
 
-nn_pred_reg = nn_reg.predict(X_test_reg, verbose=0).flatten()
-nn_mse = mean_squared_error(y_test_reg, nn_pred_reg)
-nn_mae = mean_absolute_error(y_test_reg, nn_pred_reg)
-nn_r2 = r2_score(y_test_reg, nn_pred_reg)
+# Neural networks (dense numeric features)
+X_train_nn_reg, X_val_nn_reg = X_scaled[fit_idx], X_scaled[val_idx]
+X_train_nn_clf, X_val_nn_clf = X_train_nn_reg, X_val_nn_reg
+X_test_nn = X_scaled[test_idx]
 
-regression_results['Neural Network'] = {
-    'mse': nn_mse,
-    'rmse': np.sqrt(nn_mse),
-    'mae': nn_mae,
-    'r2': nn_r2
-}
+print(f"   Training samples: {len(train_idx)}, test samples: {len(test_idx)}")
 
-print(f"✅ Results:")
-print(f"   MSE:  {nn_mse:.4f}")
-print(f"   RMSE: {np.sqrt(nn_mse):.4f}")
-print(f"   MAE:  {nn_mae:.4f}")
-print(f"   R²:   {nn_r2:.4f}")
+num_classes = len(severity_encoder.classes_)
 
 # ============================================
-# PART B: CLASSIFICATION MODELS (Severity)
+# TRAIN MODELS
 # ============================================
-print("\n" + "=" * 70)
-print("PART B: CLASSIFICATION - PREDICTING SEVERITY (Low/Med/High)")
-print("=" * 70)
-
-# Split data for classification
-# Check if we can stratify
-min_class_count_clf = pd.Series(y_classification).value_counts().min()
-can_stratify_clf = min_class_count_clf >= 2
+# All selected models (up to six) are fitted concurrently, each limited to its share of
+# --cpu-budget threads (see training_scheduler.py), then evaluated below
+
+xgb_split = None
+if 'xgb' in args.models and (args.xgb_hist or args.search):
+    from xgb_training import QuantizedSplit
+
+    # Quantized once and reused by the regressor, the classifier and every search trial
+    xgb_split = QuantizedSplit(X_fit_reg, X_val_reg, threads=args.cpu_budget)
+    print(f"   ✅ Quantized XGBoost training matrix ({xgb_split.max_bin} bins)")
+
+# Optional hyperparameter search (regression by validation MAE,
+# classification by weighted F1), half of the budget each
+SEARCH_LOG = 'models/evaluation/vulnerability_scoring_search_trials.jsonl'
+TUNED_PARAMS_PATH = 'models/evaluation/vulnerability_scoring_tuned_params.json'
+
+search_families = {'Random Forest': 'rf', 'XGBoost': 'xgb'}
+search_families = {label: family for label, family in search_families.items() if family in args.models}
+
+tuned = {}
+if args.search and search_families:
+    print("\n" + "=" * 70)
+    print(f"HYPERPARAMETER SEARCH ({args.search_budget:.0f}s budget)")
+    print("=" * 70)
+    search_workers = args.search_workers or args.cpu_budget
+    tuned.update(search_models(
+        {f'{label} Regressor': family for label, family in search_families.items()},
+        X_fit_reg, y_train_nn_reg, X_val_reg, y_val_nn_reg,
+        task='regression',
+        budget_seconds=args.search_budget / 2,
+        workers=search_workers,
+        split=xgb_split,
+        log_path=SEARCH_LOG
+    ))
+    tuned.update(search_models(
+        {f'{label} Classifier': family for label, family in search_families.items()},
+        X_fit_clf, y_train_nn_clf, X_val_clf, y_val_nn_clf,
+        task='multiclass',
+        num_class=num_classes,
+        budget_seconds=args.search_budget / 2,
+        workers=search_workers,
+        split=xgb_split,
+        log_path=SEARCH_LOG
+    ))
+    # Keep earlier results for models not searched this time (--models)
+    save_tuned(TUNED_PARAMS_PATH, {**load_tuned(TUNED_PARAMS_PATH), **tuned})
+    print(f"✅ Saved: {TUNED_PARAMS_PATH} (trial log: {SEARCH_LOG})")
+elif args.tuned:
+    tuned = load_tuned(TUNED_PARAMS_PATH)
+    print(f"✅ Using tuned parameters for: {', '.join(tuned) or 'none found'}")
+
+
+def fit_rf_regressor(threads):
+    params = {
+        'n_estimators': 100,
+        'max_depth': 15,
+        'min_samples_split': 5,
+        **tuned.get('Random Forest Regressor', {})
+    }
+    model = RandomForestRegressor(
+        **params,
+        random_state=42,
+        n_jobs=threads
+    )
+    model.fit(X_train_reg, y_train_reg)
+    return model
+
+
+def fit_xgb_regressor(threads):
+    from xgboost import XGBRegressor
+    from xgb_training import hist_params, DEFAULT_MAX_ROUNDS
+
+    params = {
+        'max_depth': 8,
+        'learning_rate': 0.1,
+        **tuned.get('XGBoost Regressor', {})
+    }
+
+    if args.xgb_hist:
+        rounds = params.pop('n_estimators', DEFAULT_MAX_ROUNDS)
+        params = hist_params('reg:squarederror', eval_metric='mae', **params)
+        return xgb_split.train(params, y_train_nn_reg, y_val_nn_reg, num_boost_round=rounds, threads=threads)
+
+    model = XGBRegressor(
+        **{'n_estimators': 100, **params},
+        random_state=42,
+        n_jobs=threads,
+        verbosity=0
+    )
+    model.fit(X_train_reg, y_train_reg)
+    return model
 
-if can_stratify_clf:
-    stratify_clf = y_classification
-else:
-    print(f"   ⚠️  Cannot stratify (min class has {min_class_count_clf} samples)")
-    stratify_clf = None
 
-X_train_clf, X_test_clf, y_train_clf, y_test_clf = train_test_split(
-    X_scaled, y_classification,
-    test_size=0.2,
-    random_state=42,
-    stratify=stratify_clf
-)
+def early_stopping():
+    from tensorflow import keras
+    return keras.callbacks.EarlyStopping(
+        monitor='val_loss',
+        patience=15,
+        restore_best_weights=True,
+        verbose=0
+    )
 
-# Check for validation split
-min_train_count_clf = pd.Series(y_train_clf).value_counts().min()
-can_stratify_val_clf = min_train_count_clf >= 2
 
-X_train_nn_clf, X_val_nn_clf, y_train_nn_clf, y_val_nn_clf = train_test_split(
-    X_train_clf, y_train_clf,
-    test_size=0.2,
-    random_state=42,
-    stratify=y_train_clf if can_stratify_val_clf else None
-)
+def fit_nn_regressor(threads):
+    from tensorflow import keras
+    from tensorflow.keras import layers
+    from nn_input import array_dataset
 
-print(f"\n   Training samples: {len(X_train_clf)}")
-print(f"   Test samples: {len(X_test_clf)}")
+    model = keras.Sequential([
+        layers.Dense(64, activation='relu', input_shape=(X_train_nn_reg.shape[1],)),
+        layers.BatchNormalization(),
+        layers.Dropout(0.2),
 
-classification_results = {}
+        layers.Dense(32, activation='relu'),
+        layers.BatchNormalization(),
+        layers.Dropout(0.2),
 
-# --- RANDOM FOREST CLASSIFIER ---
-print("\n" + "-" * 70)
-print("Model 1: Random Forest Classifier")
-print("-" * 70)
+        layers.Dense(16, activation='relu'),
 
-rf_clf = RandomForestClassifier(
-    n_estimators=100,
-    max_depth=15,
-    random_state=42,
-    n_jobs=-1,
-    class_weight='balanced'
-)
+        layers.Dense(1, activation='linear')  # Linear for regression
+    ], name='VulnerabilityRiskNN')
 
-print("Training...")
-rf_clf.fit(X_train_clf, y_train_clf)
+    model.compile(
+        optimizer=keras.optimizers.Adam(learning_rate=0.001),
+        loss='mse',
+        metrics=['mae']
+    )
 
-rf_pred_clf = rf_clf.predict(X_test_clf)
-rf_accuracy = accuracy_score(y_test_clf, rf_pred_clf)
-rf_f1 = f1_score(y_test_clf, rf_pred_clf, average='weighted')
+    model.fit(
+        array_dataset(X_train_nn_reg, y_train_nn_reg, 64, shuffle=True, label_dtype=np.float32,
+                      threads=threads),
+        validation_data=array_dataset(X_val_nn_reg, y_val_nn_reg, 64, cache='', label_dtype=np.float32,
+                                      threads=threads),
+        epochs=100,
+        callbacks=[early_stopping()],
+        verbose=0
+    )
+    return model
+
+
+def fit_rf_classifier(threads):
+    params = {
+        'n_estimators': 100,
+        'max_depth': 15,
+        **tuned.get('Random Forest Classifier', {})
+    }
+    model = RandomForestClassifier(
+        **params,
+        random_state=42,
+        n_jobs=threads,
+        class_weight='balanced'
+    )
+    model.fit(X_train_clf, y_train_clf)
+    return model
+
+
+def fit_xgb_classifier(threads):
+    from xgboost import XGBClassifier
+    from xgb_training import hist_params, DEFAULT_MAX_ROUNDS
+
+    params = {
+        'max_depth': 8,
+        'learning_rate': 0.1,
+        **tuned.get('XGBoost Classifier', {})
+    }
+
+    if args.xgb_hist:
+        rounds = params.pop('n_estimators', DEFAULT_MAX_ROUNDS)
+        params = hist_params('multi:softprob', num_class=num_classes, eval_metric='mlogloss', **params)
+        return xgb_split.train(params, y_train_nn_clf, y_val_nn_clf, num_boost_round=rounds, threads=threads)
+
+    model = XGBClassifier(
+        **{'n_estimators': 100, **params},
+        random_state=42,
+        eval_metric='mlogloss',
+        n_jobs=threads,
+        verbosity=0
+    )
+    model.fit(X_train_clf, y_train_clf)
+    return model
 
-classification_results['Random Forest'] = {
-    'accuracy': rf_accuracy,
-    'f1_score': rf_f1
-}
 
-print(f"✅ Results:")
-print(f"   Accuracy: {rf_accuracy:.4f}")
-print(f"   F1-Score: {rf_f1:.4f}")
+def fit_nn_classifier(threads):
+    from tensorflow import keras
+    from tensorflow.keras import layers
+    from nn_input import array_dataset
 
-# --- XGBOOST CLASSIFIER ---
-print("\n" + "-" * 70)
-print("Model 2: XGBoost Classifier")
-print("-" * 70)
+    model = keras.Sequential([
+        layers.Dense(64, activation='relu', input_shape=(X_train_nn_clf.shape[1],)),
+        layers.BatchNormalization(),
+        layers.Dropout(0.3),
 
-xgb_clf = XGBClassifier(
-    n_estimators=100,
-    max_depth=8,
-    learning_rate=0.1,
-    random_state=42,
-    eval_metric='mlogloss',
-    verbosity=0
-)
+        layers.Dense(32, activation='relu'),
+        layers.BatchNormalization(),
+        layers.Dropout(0.2),
 
-print("Training...")
-xgb_clf.fit(X_train_clf, y_train_clf)
+        layers.Dense(num_classes, activation='softmax')
+    ], name='VulnerabilitySeverityNN')
 
-xgb_pred_clf = xgb_clf.predict(X_test_clf)
-xgb_accuracy = accuracy_score(y_test_clf, xgb_pred_clf)
-xgb_f1 = f1_score(y_test_clf, xgb_pred_clf, average='weighted')
+    model.compile(
+        optimizer=keras.optimizers.Adam(learning_rate=0.001),
+        loss='sparse_categorical_crossentropy',  # integer labels, no one-hot copies
+        metrics=['accuracy']
+    )
 
-classification_results['XGBoost'] = {
-    'accuracy': xgb_accuracy,
-    'f1_score': xgb_f1
-}
+    model.fit(
+        array_dataset(X_train_nn_clf, y_train_nn_clf, 64, shuffle=True, threads=threads),
+        validation_data=array_dataset(X_val_nn_clf, y_val_nn_clf, 64, cache='', threads=threads),
+        epochs=100,
+        callbacks=[early_stopping()],
+        verbose=0
+    )
+    return model
 
-print(f"✅ Results:")
-print(f"   Accuracy: {xgb_accuracy:.4f}")
-print(f"   F1-Score: {xgb_f1:.4f}")
 
-# --- NEURAL NETWORK CLASSIFIER ---
-print("\n" + "-" * 70)
-print("Model 3: Neural Network Classifier")
-print("-" * 70)
+print("\n" + "=" * 70)
+print("TRAINING MODELS")
+print("=" * 70)
 
-num_classes = len(severity_encoder.classes_)
-y_train_cat = keras.utils.to_categorical(y_train_nn_clf, num_classes)
-y_val_cat = keras.utils.to_categorical(y_val_nn_clf, num_classes)
-y_test_cat = keras.utils.to_categorical(y_test_clf, num_classes)
-
-nn_clf = keras.Sequential([
-    layers.Dense(64, activation='relu', input_shape=(X_train_clf.shape[1],)),
-    layers.BatchNormalization(),
-    layers.Dropout(0.3),
-    
-    layers.Dense(32, activation='relu'),
-    layers.BatchNormalization(),
-    layers.Dropout(0.2),
-    
-    layers.Dense(num_classes, activation='softmax')
-], name='VulnerabilitySeverityNN')
+jobs = {
+    'rf': [TrainingJob('Random Forest Regressor', fit_rf_regressor, weight=2),
+           TrainingJob('Random Forest Classifier', fit_rf_classifier, weight=2)],
+    'xgb': [TrainingJob('XGBoost Regressor', fit_xgb_regressor, weight=2),
+            TrainingJob('XGBoost Classifier', fit_xgb_classifier, weight=2)],
+    'nn': [TrainingJob('Neural Network Regressor', fit_nn_regressor, weight=1, uses_tensorflow=True),
+           TrainingJob('Neural Network Classifier', fit_nn_classifier, weight=1, uses_tensorflow=True)],
+}
+trained, schedule = run_jobs([job for model in args.models for job in jobs[model]],
+                             cpu_budget=args.cpu_budget, parallel=not args.sequential)
+print_report(schedule)
 
-nn_clf.compile(
-    optimizer=keras.optimizers.Adam(learning_rate=0.001),
-    loss='categorical_crossentropy',
-    metrics=['accuracy']
-)
+# ============================================
+# PART A: REGRESSION MODELS (Risk Score)
+# ============================================
+print("\n" + "=" * 70)
+print("PART A: REGRESSION - PREDICTING RISK SCORE (0-100)")
+print("=" * 70)
 
-print(f"Architecture: {X_train_clf.shape[1]} → 64 → 32 → {num_classes}")
+regression_results = {}
 
-print("Training...")
-history_clf = nn_clf.fit(
-    X_train_nn_clf, y_train_cat,
-    validation_data=(X_val_nn_clf, y_val_cat),
-    epochs=100,
-    batch_size=64,
-    callbacks=[early_stop],
-    verbose=0
-)
+if 'rf' in args.models:
+    # --- RANDOM FOREST REGRESSOR ---
+    print("\n" + "-" * 70)
+    print("Model 1: Random Forest Regressor")
+    print("-" * 70)
+
+    rf_reg = trained['Random Forest Regressor']
+
+    rf_pred_reg = rf_reg.predict(X_test_reg)
+    rf_mse = mean_squared_error(y_test_reg, rf_pred_reg)
+    rf_mae = mean_absolute_error(y_test_reg, rf_pred_reg)
+    rf_r2 = r2_score(y_test_reg, rf_pred_reg)
+
+    regression_results['Random Forest'] = {
+        'mse': rf_mse,
+        'rmse': np.sqrt(rf_mse),
+        'mae': rf_mae,
+        'r2': rf_r2
+    }
+
+    print(f"✅ Results:")
+    print(f"   MSE:  {rf_mse:.4f}")
+    print(f"   RMSE: {np.sqrt(rf_mse):.4f}")
+    print(f"   MAE:  {rf_mae:.4f}")
+    print(f"   R²:   {rf_r2:.4f}")
+
+if 'xgb' in args.models:
+    # --- XGBOOST REGRESSOR ---
+    print("\n" + "-" * 70)
+    print("Model 2: XGBoost Regressor")
+    print("-" * 70)
+
+    xgb_reg = trained['XGBoost Regressor']
+
+    xgb_pred_reg = xgb_reg.predict(X_test_reg)
+    xgb_mse = mean_squared_error(y_test_reg, xgb_pred_reg)
+    xgb_mae = mean_absolute_error(y_test_reg, xgb_pred_reg)
+    xgb_r2 = r2_score(y_test_reg, xgb_pred_reg)
+
+    regression_results['XGBoost'] = {
+        'mse': xgb_mse,
+        'rmse': np.sqrt(xgb_mse),
+        'mae': xgb_mae,
+        'r2': xgb_r2
+    }
+    if args.xgb_hist:
+        regression_results['XGBoost']['boosting_rounds'] = xgb_reg.n_rounds
+        print(f"   Early stopping kept {xgb_reg.n_rounds} boosting rounds")
+
+    print(f"✅ Results:")
+    print(f"   MSE:  {xgb_mse:.4f}")
+    print(f"   RMSE: {np.sqrt(xgb_mse):.4f}")
+    print(f"   MAE:  {xgb_mae:.4f}")
+    print(f"   R²:   {xgb_r2:.4f}")
+
+if 'nn' in args.models:
+    # --- NEURAL NETWORK REGRESSOR ---
+    print("\n" + "-" * 70)
+    print("Model 3: Neural Network Regressor")
+    print("-" * 70)
+
+    nn_reg = trained['Neural Network Regressor']
+    print(f"Architecture: {X_train_nn_reg.shape[1]} → 64 → 32 → 16 → 1")
+
+    nn_pred_reg = nn_reg.predict(X_test_nn, verbose=0).flatten()
+    nn_mse = mean_squared_error(y_test_reg, nn_pred_reg)
+    nn_mae = mean_absolute_error(y_test_reg, nn_pred_reg)
+    nn_r2 = r2_score(y_test_reg, nn_pred_reg)
+
+    regression_results['Neural Network'] = {
+        'mse': nn_mse,
+        'rmse': np.sqrt(nn_mse),
+        'mae': nn_mae,
+        'r2': nn_r2
+    }
+
+    print(f"✅ Results:")
+    print(f"   MSE:  {nn_mse:.4f}")
+    print(f"   RMSE: {np.sqrt(nn_mse):.4f}")
+    print(f"   MAE:  {nn_mae:.4f}")
+    print(f"   R²:   {nn_r2:.4f}")
 
-nn_pred_probs = nn_clf.predict(X_test_clf, verbose=0)
-nn_pred_clf = np.argmax(nn_pred_probs, axis=1)
-nn_accuracy = accuracy_score(y_test_clf, nn_pred_clf)
-nn_f1 = f1_score(y_test_clf, nn_pred_clf, average='weighted')
+# ============================================
+# PART B: CLASSIFICATION MODELS (Severity)
+# ============================================
+print("\n" + "=" * 70)
+print("PART B: CLASSIFICATION - PREDICTING SEVERITY (Low/Med/High)")
+print("=" * 70)
 
-classification_results['Neural Network'] = {
-    'accuracy': nn_accuracy,
-    'f1_score': nn_f1
-}
+classification_results = {}
 
-print(f"✅ Results:")
-print(f"   Accuracy: {nn_accuracy:.4f}")
-print(f"   F1-Score: {nn_f1:.4f}")
+if 'rf' in args.models:
+    # --- RANDOM FOREST CLASSIFIER ---
+    print("\n" + "-" * 70)
+    print("Model 1: Random Forest Classifier")
+    print("-" * 70)
+
+    rf_clf = trained['Random Forest Classifier']
+
+    rf_pred_clf = rf_clf.predict(X_test_clf)
+    rf_accuracy = accuracy_score(y_test_clf, rf_pred_clf)
+    rf_f1 = f1_score(y_test_clf, rf_pred_clf, average='weighted')
+
+    classification_results['Random Forest'] = {
+        'accuracy': rf_accuracy,
+        'f1_score': rf_f1
+    }
+
+    print(f"✅ Results:")
+    print(f"   Accuracy: {rf_accuracy:.4f}")
+    print(f"   F1-Score: {rf_f1:.4f}")
+
+if 'xgb' in args.models:
+    # --- XGBOOST CLASSIFIER ---
+    print("\n" + "-" * 70)
+    print("Model 2: XGBoost Classifier")
+    print("-" * 70)
+
+    xgb_clf = trained['XGBoost Classifier']
+
+    xgb_pred_clf = xgb_clf.predict(X_test_clf)
+    xgb_accuracy = accuracy_score(y_test_clf, xgb_pred_clf)
+    xgb_f1 = f1_score(y_test_clf, xgb_pred_clf, average='weighted')
+
+    classification_results['XGBoost'] = {
+        'accuracy': xgb_accuracy,
+        'f1_score': xgb_f1
+    }
+    if args.xgb_hist:
+        classification_results['XGBoost']['boosting_rounds'] = xgb_clf.n_rounds
+        print(f"   Early stopping kept {xgb_clf.n_rounds} boosting rounds")
+
+    print(f"✅ Results:")
+    print(f"   Accuracy: {xgb_accuracy:.4f}")
+    print(f"   F1-Score: {xgb_f1:.4f}")
+
+if 'nn' in args.models:
+    # --- NEURAL NETWORK CLASSIFIER ---
+    print("\n" + "-" * 70)
+    print("Model 3: Neural Network Classifier")
+    print("-" * 70)
+
+    nn_clf = trained['Neural Network Classifier']
+    print(f"Architecture: {X_train_nn_clf.shape[1]} → 64 → 32 → {num_classes}")
+
+    nn_pred_probs = nn_clf.predict(X_test_nn, verbose=0)
+    nn_pred_clf = np.argmax(nn_pred_probs, axis=1)
+    nn_accuracy = accuracy_score(y_test_clf, nn_pred_clf)
+    nn_f1 = f1_score(y_test_clf, nn_pred_clf, average='weighted')
+
+    classification_results['Neural Network'] = {
+        'accuracy': nn_accuracy,
+        'f1_score': nn_f1
+    }
+
+    print(f"✅ Results:")
+    print(f"   Accuracy: {nn_accuracy:.4f}")
+    print(f"   F1-Score: {nn_f1:.4f}")
 
 # ============================================
 # 5. COMPARE RESULTS
@@ -539,24 +730,26 @@ os.makedirs('models/saved_models/vulnerability_scoring', exist_ok=True)
 os.makedirs('models/preprocessors', exist_ok=True)
 os.makedirs('models/evaluation', exist_ok=True)
 
-# Save regression models
-joblib.dump(rf_reg, 'models/saved_models/vulnerability_scoring/rf_regressor.pkl')
-joblib.dump(xgb_reg, 'models/saved_models/vulnerability_scoring/xgb_regressor.pkl')
-nn_reg.save('models/saved_models/vulnerability_scoring/nn_regressor.h5')
-print("✅ Saved regression models")
-
-# Save classification models
-joblib.dump(rf_clf, 'models/saved_models/vulnerability_scoring/rf_classifier.pkl')
-joblib.dump(xgb_clf, 'models/saved_models/vulnerability_scoring/xgb_classifier.pkl')
-nn_clf.save('models/saved_models/vulnerability_scoring/nn_classifier.h5')
-print("✅ Saved classification models")
+# Save the trained regression and classification models
+if 'rf' in args.models:
+    joblib.dump(rf_reg, 'models/saved_models/vulnerability_scoring/rf_regressor.pkl')
+    joblib.dump(rf_clf, 'models/saved_models/vulnerability_scoring/rf_classifier.pkl')
+if 'xgb' in args.models:
+    joblib.dump(xgb_reg, 'models/saved_models/vulnerability_scoring/xgb_regressor.pkl')
+    joblib.dump(xgb_clf, 'models/saved_models/vulnerability_scoring/xgb_classifier.pkl')
+if 'nn' in args.models:
+    nn_reg.save('models/saved_models/vulnerability_scoring/nn_regressor.h5')
+    nn_clf.save('models/saved_models/vulnerability_scoring/nn_classifier.h5')
+print(f"✅ Saved regression and classification models ({', '.join(args.models)})")
 
 # Save preprocessors
 joblib.dump(scaler, 'models/preprocessors/vulnerability_scaler.pkl')
 joblib.dump(severity_encoder, 'models/preprocessors/severity_encoder.pkl')
 
-for name, encoder in categorical_features.items():
-    joblib.dump(encoder, f'models/preprocessors/{name}_encoder.pkl')
+vocabularies.save()
+
+if text_vectorizer is not None:
+    joblib.dump(text_vectorizer, 'models/preprocessors/vulnerability_text_vectorizer.pkl')
 
 print("✅ Saved preprocessors")
 
@@ -564,6 +757,10 @@ print("✅ Saved preprocessors")
 with open('models/preprocessors/vulnerability_feature_names.json', 'w') as f:
     json.dump(feature_cols, f)
 
+# Held-out CVEs, for checking the saved models on real data
+save_holdout('vulnerability_scoring', df['cveID'].iloc[test_idx].astype(str).to_numpy(), len(df))
+print("✅ Saved: held-out rows")
+
 # Save metrics
 evaluation_data = {
     'regression': regression_results,
@@ -571,7 +768,22 @@ evaluation_data = {
     'best_regression_model': best_reg_model,
     'best_classification_model': best_clf_model,
     'num_features': len(feature_cols),
-    'severity_classes': list(severity_encoder.classes_)
+    'text_features': {
+        'columns': [col for col in TEXT_COLUMNS if col in df.columns],
+        'hash_buckets': args.text_buckets,
+        'num_features': text_vectorizer.n_features,
+        'nnz_per_row': X_text.nnz / max(1, X_text.shape[0]),
+    } if text_vectorizer is not None else None,
+    'category_encoding': {
+        'encoding': args.category_encoding,
+        'vocabulary_path': VOCABULARY_PATH,
+        'vocabulary_sizes': {name: len(vocabularies[name]) for name in categorical_columns},
+        'new_categories': new_categories,
+    },
+    'severity_classes': list(severity_encoder.classes_),
+    'training_schedule': schedule,
+    'import_seconds': import_seconds,
+    'tuned_params': tuned
 }
 
 with open('models/evaluation/vulnerability_scoring_metrics.json', 'w') as f:
@@ -589,16 +801,19 @@ print("=" * 70)
 print(f"\n📊 Summary:")
 print(f"   Dataset: CISA Known Exploited Vulnerabilities")
 print(f"   Samples: {len(df)}")
-print(f"   Features: {len(feature_cols)}")
+print(f"   Features: {len(feature_cols)}"
+      + (f" + {text_vectorizer.n_features:,} text (RF / XGBoost)" if text_vectorizer is not None else ""))
 print(f"\n   Tasks:")
 print(f"      1. Regression (Risk Score 0-100)")
 print(f"         🏆 Best: {best_reg_model} (MAE: {regression_results[best_reg_model]['mae']:.4f})")
 print(f"      2. Classification (Low/Med/High)")
 print(f"         🏆 Best: {best_clf_model} (F1: {classification_results[best_clf_model]['f1_score']:.4f})")
 
-print(f"\n   Models Trained: 6 total")
-print(f"      ✓ 3 Regression models")
-print(f"      ✓ 3 Classification models")
+print(f"\n   Models Trained: {len(regression_results) + len(classification_results)} total")
+print(f"      ✓ {len(regression_results)} Regression models")
+print(f"      ✓ {len(classification_results)} Classification models")
+print(f"\n   ℹ️  Both targets come from the risk formula (risk_scoring.py): score the catalog")
+print(f"      with 10_score_vulnerabilities.py; these models are optional and only learn the formula")
 
 print(f"\n📁 Saved to:")
 print(f"   models/saved_models/vulnerability_scoring/")
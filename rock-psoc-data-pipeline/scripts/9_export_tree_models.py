@@ -0,0 +1,214 @@
+"""
+Export the trained tree ensembles for low-latency scoring
+Script: 9_export_tree_models.py
+
+Compiles every saved Random Forest / XGBoost model under
+models/saved_models/<task>/ into flat NumPy arrays (see tree_export.py)
+saved next to it as <name>_compiled.npz. Each export is checked against
+the original model before it is written, and the per-event latency of
+both is measured:
+
+    compiled = CompiledEnsemble.load('models/saved_models/phishing_detection/rf_model_compiled.npz')
+    compiled.predict_one(features)   # no sklearn / xgboost import needed
+
+Parity is checked on the rows each training script held out, rebuilt
+from the raw data with the saved preprocessors (model_inputs.py) - the
+real feature distribution, including its zeros, ties and category codes.
+Standard-normal rows are checked as well, to reach splits the real rows
+do not. Models trained on a sparse matrix (vulnerability_scoring with
+--text-features, per its metrics) are compiled with XGBoost's
+missing-value routing for absent entries; their held-out rows stay
+sparse, and half of the entries of their random rows are absent.
+
+Usage:
+    python scripts/9_export_tree_models.py
+    python scripts/9_export_tree_models.py --tasks phishing_detection   # one task only
+    python scripts/9_export_tree_models.py --parity-rows 50000 --latency-events 2000
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+import warnings
+import joblib
+import numpy as np
+import scipy.sparse as sp
+from tree_export import compile_model, check_parity, measure_latency
+from model_inputs import holdout_features, metrics
+warnings.filterwarnings('ignore')
+
+MODELS_ROOT = 'models/saved_models'
+REPORT_PATH = 'models/evaluation/tree_export_report.json'
+
+parser = argparse.ArgumentParser(description="Compile saved tree ensembles into NumPy array evaluators")
+parser.add_argument('--tasks', nargs='+', default=None,
+                    help="Task directories under models/saved_models/ (default: all)")
+parser.add_argument('--parity-rows', type=int, default=10_000,
+                    help="Random rows, and at most as many held-out rows, compared between "
+                         "the original and compiled models (default: 10000)")
+parser.add_argument('--latency-events', type=int, default=500,
+                    help="Single events scored to measure latency (default: 500)")
+args = parser.parse_args()
+
+
+def trained_on_sparse(task):
+    """Whether the task's tree models were trained on a sparse matrix (text features)"""
+    try:
+        return bool(metrics(task).get('text_features'))
+    except FileNotFoundError:
+        return False
+
+
+def load_holdout_rows(task):
+    """Up to --parity-rows of the task's held-out rows, or the reason there are none"""
+    try:
+        X = holdout_features(task)
+    except (FileNotFoundError, ValueError) as e:
+        return None, str(e)
+    return X[:args.parity_rows], None
+
+
+print("=" * 70)
+print("TREE MODEL EXPORT")
+print("=" * 70)
+
+# ============================================
+# 1. FIND SAVED TREE MODELS
+# ============================================
+print("\n[1/3] Finding saved models...")
+
+tasks = args.tasks
+if tasks is None and os.path.isdir(MODELS_ROOT):
+    tasks = sorted(name for name in os.listdir(MODELS_ROOT) if os.path.isdir(os.path.join(MODELS_ROOT, name)))
+
+model_paths = []
+for task in tasks or []:
+    # best_model.pkl is a copy of one of the others
+    model_paths += [path for path in sorted(glob.glob(os.path.join(MODELS_ROOT, task, '*.pkl')))
+                    if os.path.basename(path) != 'best_model.pkl']
+
+if not model_paths:
+    print(f"❌ Error: no saved .pkl models found in {MODELS_ROOT}/")
+    print("   Run the training scripts (4-6) first")
+    exit(1)
+
+print(f"✅ Found {len(model_paths)} model file(s) in {', '.join(tasks)}")
+
+# ============================================
+# 2. COMPILE AND CHECK PARITY
+# ============================================
+print("\n[2/3] Compiling and checking parity...")
+
+rng = np.random.default_rng(42)
+report = {}
+failed = []
+holdout_rows = {}
+
+for path in model_paths:
+    name = os.path.relpath(path, MODELS_ROOT)
+    task = os.path.basename(os.path.dirname(path))
+    sparse_input = trained_on_sparse(task)
+    if task not in holdout_rows:
+        holdout_rows[task] = load_holdout_rows(task)
+    X_holdout, holdout_error = holdout_rows[task]
+    model = joblib.load(path)
+    n_model_features = getattr(model, 'n_features_in_', None)
+    if X_holdout is not None and n_model_features not in (None, X_holdout.shape[1]):
+        X_holdout, holdout_error = None, (f"the rebuilt rows have {X_holdout.shape[1]} features, "
+                                          f"the model {n_model_features}")
+
+    try:
+        started = time.perf_counter()
+        compiled = compile_model(model, sparse_input=sparse_input)
+        compile_seconds = time.perf_counter() - started
+    except (TypeError, ValueError) as e:
+        print(f"\n   ⏭️  {name}: skipped ({e})")
+        continue
+
+    n_features = compiled.feature.max() + 1
+    if hasattr(model, 'n_features_in_'):
+        n_features = model.n_features_in_
+    elif hasattr(model, 'booster'):
+        n_features = model.booster.num_features()
+    X = rng.standard_normal((args.parity_rows, n_features)).astype(np.float32)
+    X_parity = X
+    if sparse_input:
+        # The original model reads the absent entries as missing values
+        X[rng.random(X.shape) < 0.5] = 0
+        X_parity = sp.csr_matrix(X)
+
+    parity = {'random': check_parity(model, compiled, X_parity)}
+    if X_holdout is not None:
+        parity['holdout'] = check_parity(model, compiled, X_holdout)
+    else:
+        parity['holdout_error'] = holdout_error
+    parity['passed'] = (X_holdout is not None and parity['holdout']['passed']
+                        and parity['random']['passed'])
+
+    # Per-event latency: one row at a time, as a streaming detector scores
+    original_score = model.predict_proba if compiled.is_classifier else model.predict
+    compiled_score = compiled.predict_proba if compiled.is_classifier else compiled.predict
+    original_us = measure_latency(lambda x: original_score(x[None, :]), X, repeats=args.latency_events)
+    compiled_us = measure_latency(compiled.predict_one, X, repeats=args.latency_events)
+
+    # Batch throughput over all parity rows
+    started = time.perf_counter()
+    original_score(X)
+    original_batch = time.perf_counter() - started
+    started = time.perf_counter()
+    compiled_score(X)
+    compiled_batch = time.perf_counter() - started
+
+    export_path = os.path.splitext(path)[0] + '_compiled.npz'
+    report[name] = {
+        'source': compiled.source,
+        'export_path': export_path,
+        'trees': compiled.n_trees,
+        'nodes': compiled.n_nodes,
+        'max_depth': compiled.max_depth,
+        'zero_is_missing': compiled.zero_is_missing,
+        'compile_seconds': compile_seconds,
+        'parity': parity,
+        'event_latency_us': {'original': original_us, 'compiled': compiled_us},
+        'batch_rows_per_second': {'original': len(X) / original_batch, 'compiled': len(X) / compiled_batch},
+    }
+
+    status = "✅" if parity['passed'] else "❌"
+    print(f"\n   {status} {name} ({compiled.source}: {compiled.n_trees} trees, depth {compiled.max_depth})")
+    for label, key in (('held-out', 'holdout'), ('random', 'random')):
+        if key in parity:
+            check = parity[key]
+            print(f"      Parity ({label}): max |diff| {check['max_abs_diff']:.2e} over {check['rows']:,} rows"
+                  + (f", labels agree {check['label_agreement']:.2%}" if 'label_agreement' in check else ""))
+    if X_holdout is None:
+        print(f"      ⚠️  No held-out rows to check: {holdout_error}")
+    print(f"      Per event: {original_us:,.0f} µs → {compiled_us:,.0f} µs ({original_us / compiled_us:,.0f}x)")
+    print(f"      Batch: {len(X) / original_batch:,.0f} → {len(X) / compiled_batch:,.0f} rows/s")
+
+    if parity['passed']:
+        compiled.save(export_path)
+        print(f"      Saved: {export_path}")
+    else:
+        failed.append(name)
+        print(f"      ⚠️  Not saved: " + ("compiled predictions differ from the original model"
+                                          if X_holdout is not None else "retrain the task to check it on real rows"))
+
+# ============================================
+# 3. SAVE REPORT
+# ============================================
+print("\n[3/3] Saving export report...")
+
+os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+with open(REPORT_PATH, 'w') as f:
+    json.dump(report, f, indent=4)
+print(f"✅ Saved: {REPORT_PATH}")
+
+print("\n" + "=" * 70)
+print("EXPORT COMPLETE!" if not failed else "EXPORT FINISHED WITH PARITY FAILURES")
+print("=" * 70)
+print(f"\n   Exported: {len(report) - len(failed)} model(s)")
+if failed:
+    print(f"   Parity failures: {', '.join(failed)}")
+    exit(1)
@@ -0,0 +1,226 @@
+"""
+Streaming, cache-aware HTTP downloads for the dataset pipeline
+Module: downloader.py
+
+Files are streamed to disk in chunks instead of being held in memory,
+interrupted downloads are resumed with HTTP Range requests, and feeds that
+have not changed since the last run are skipped using the ETag /
+Last-Modified validators recorded in a local manifest.
+
+`fetch_all` runs several independent downloads concurrently on a thread
+pool, bounded by a global worker limit and a per-source time budget.
+
+Works against any HTTP server, so it can be exercised with a local
+stand-in (e.g. `python -m http.server`) instead of the real feeds.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import requests
+
+DEFAULT_MANIFEST = 'data/raw/.download_manifest.json'
+CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+# The manifest is shared by concurrent downloads - serialize its updates
+_manifest_lock = threading.Lock()
+
+
+def load_manifest(path=DEFAULT_MANIFEST):
+    """Load the download manifest (url -> validators), or an empty one"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_manifest(manifest, path=DEFAULT_MANIFEST):
+    """Atomically write the download manifest"""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _update_manifest(url, entry, path):
+    """Merge a single entry into the on-disk manifest"""
+    with _manifest_lock:
+        manifest = load_manifest(path)
+        manifest[url] = entry
+        save_manifest(manifest, path)
+
+
+def _validators(response):
+    return {
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+    }
+
+
+def _matches(entry, response):
+    """True if the response carries the same validators as the manifest entry"""
+    current = _validators(response)
+    if entry.get('etag') and current['etag']:
+        return entry['etag'] == current['etag']
+    if entry.get('last_modified') and current['last_modified']:
+        return entry['last_modified'] == current['last_modified']
+    return False
+
+
+def download_file(url, dest, manifest_path=DEFAULT_MANIFEST, chunk_size=CHUNK_SIZE,
+                  timeout=60, max_seconds=None, session=None):
+    """
+    Download `url` to `dest`, streaming in chunks.
+
+    `timeout` applies to each connect/read; `max_seconds` bounds the whole
+    transfer and raises TimeoutError (the partial file is kept for resume).
+    A partial file the server reports as already complete (416 on resume)
+    is moved into place; one it cannot be resumed from is refetched.
+
+    Returns a dict with:
+        status: 'cached' (local copy is current), 'downloaded' or 'resumed'
+        path:   destination path
+        bytes:  number of bytes transferred in this call
+    """
+    dest = Path(dest)
+    part_path = Path(f"{dest}.part")
+    dest.parent.mkdir(parents=True, exist_ok=True)
+
+    http = session or requests
+    entry = load_manifest(manifest_path).get(url, {})
+    started = time.monotonic()
+
+    headers = {}
+    resume_from = 0
+
+    if entry.get('complete') and dest.exists():
+        # Conditional request - the server answers 304 if nothing changed
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+    elif part_path.exists() and (entry.get('etag') or entry.get('last_modified')):
+        # Resume a partial download, but only if the remote file is unchanged
+        resume_from = part_path.stat().st_size
+        headers['Range'] = f"bytes={resume_from}-"
+        headers['If-Range'] = entry.get('etag') or entry['last_modified']
+
+    with http.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 304:
+            return {'status': 'cached', 'path': str(dest), 'bytes': 0}
+
+        if response.status_code == 416 and 'Range' in headers:
+            # Nothing left after resume_from: the .part already holds the
+            # whole file (the run stopped between its last write and the
+            # rename). Anything else about it is suspect - start over
+            total = response.headers.get('Content-Range', '').rpartition('/')[2]
+            if total.isdigit() and int(total) == resume_from:
+                return _complete(url, dest, part_path, {
+                    'dest': str(dest), 'complete': False,
+                    'etag': entry.get('etag'), 'last_modified': entry.get('last_modified'),
+                }, manifest_path, status='resumed', transferred=0)
+            part_path.unlink()
+            remaining = None if max_seconds is None else max(0.0, max_seconds - (time.monotonic() - started))
+            return download_file(url, dest, manifest_path=manifest_path, chunk_size=chunk_size,
+                                 timeout=timeout, max_seconds=remaining, session=session)
+
+        response.raise_for_status()
+
+        # Some servers ignore conditional headers - compare validators ourselves
+        if entry.get('complete') and dest.exists() and 'Range' not in headers \
+                and _matches(entry, response):
+            return {'status': 'cached', 'path': str(dest), 'bytes': 0}
+
+        resumed = response.status_code == 206
+        if not resumed:
+            resume_from = 0
+
+        # Record validators before streaming so an interrupted run can resume
+        new_entry = {
+            'dest': str(dest),
+            'complete': False,
+            **(_validators(response) if not resumed else
+               {'etag': entry.get('etag'), 'last_modified': entry.get('last_modified')}),
+        }
+        _update_manifest(url, new_entry, manifest_path)
+
+        transferred = 0
+        with open(part_path, 'ab' if resumed else 'wb') as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                # Checked before writing, so a budget that runs out on the
+                # last chunk never leaves a complete .part behind
+                if max_seconds is not None and time.monotonic() - started > max_seconds:
+                    raise TimeoutError(f"{url} exceeded {max_seconds}s "
+                                       f"({transferred:,} bytes kept for resume)")
+                if chunk:
+                    f.write(chunk)
+                    transferred += len(chunk)
+
+    return _complete(url, dest, part_path, new_entry, manifest_path,
+                     status='resumed' if resumed else 'downloaded', transferred=transferred)
+
+
+def _complete(url, dest, part_path, entry, manifest_path, status, transferred):
+    """Move the finished .part into place and mark the manifest entry complete"""
+    os.replace(part_path, dest)
+
+    entry['complete'] = True
+    entry['size'] = dest.stat().st_size
+    _update_manifest(url, entry, manifest_path)
+
+    return {
+        'status': status,
+        'path': str(dest),
+        'bytes': transferred,
+    }
+
+
+def _timed_download(source, manifest_path, timeout):
+    started = time.perf_counter()
+    try:
+        result = download_file(source['url'], source['dest'],
+                               manifest_path=manifest_path, max_seconds=timeout)
+        result['error'] = None
+    except Exception as e:
+        result = {'status': 'failed', 'path': source['dest'], 'bytes': 0, 'error': e}
+    result['name'] = source['name']
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+def fetch_all(sources, max_workers=4, timeout=None, manifest_path=DEFAULT_MANIFEST):
+    """
+    Download several sources concurrently.
+
+    `sources` is a list of dicts with 'name', 'url' and 'dest' keys.
+    `max_workers` caps the number of simultaneous downloads and `timeout`
+    is the per-source time budget in seconds. Returns one result dict per
+    source (in the order given) with 'status', 'bytes', 'seconds' and
+    'error' - a failed source never aborts the others.
+    """
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {
+            pool.submit(_timed_download, source, manifest_path, timeout): source['name']
+            for source in sources
+        }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+
+    return [results[source['name']] for source in sources]
+
+
+def print_timing_summary(results, wall_seconds):
+    """Print a per-source timing table for a batch of downloads"""
+    print(f"\n⏱️  Download timing:")
+    for result in results:
+        mb = result['bytes'] / (1024 * 1024)
+        print(f"   {result['name']:<12} {result['status']:<10} "
+              f"{result['seconds']:7.2f}s  {mb:8.2f} MB")
+    print(f"   {'Total wall':<12} {'':<10} {wall_seconds:7.2f}s")
@@ -0,0 +1,156 @@
+"""
+Persistent cache of phishing URL feature vectors
+Module: feature_cache.py
+
+URLs recur across phishing feeds and re-ingests, so extracted feature
+vectors are kept in a small SQLite file keyed by the SHA-1 of the URL and
+the phishing_features FEATURE_VERSION, with an in-memory LRU in front.
+Rows from other feature versions are dropped when the cache is opened.
+
+    cache = FeatureCache()
+    matrix = cache.extract_batch(urls)   # only unseen URLs are extracted
+    vector = cache.extract_one(url)      # online scoring
+"""
+
+import hashlib
+import os
+import sqlite3
+from collections import OrderedDict
+
+import numpy as np
+
+from phishing_features import FEATURE_NAMES, FEATURE_VERSION, extract_batch, extract_one
+
+CACHE_PATH = 'data/cache/phishing_url_features.sqlite'
+
+# SQLite's default limit on bound parameters per statement is 999
+QUERY_BATCH = 900
+
+
+def url_key(url):
+    """Stable 20-byte key for a URL"""
+    return hashlib.sha1(url.encode('utf-8', 'surrogatepass')).digest()
+
+
+class FeatureCache:
+    """SQLite-backed URL -> feature vector cache with an in-memory LRU"""
+
+    def __init__(self, path=CACHE_PATH, memory_size=100_000, version=FEATURE_VERSION):
+        self.path = path
+        self.memory_size = memory_size
+        self.version = version
+        self._memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS url_features ("
+            "url_hash BLOB NOT NULL, version INTEGER NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (url_hash, version))"
+        )
+        self._db.execute("DELETE FROM url_features WHERE version != ?", (version,))
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __len__(self):
+        return self._db.execute(
+            "SELECT COUNT(*) FROM url_features WHERE version = ?", (self.version,)
+        ).fetchone()[0]
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def lookup(self, keys):
+        """Cached vectors for the given keys, as a dict (missing keys are absent)"""
+        found = {}
+        pending = []
+        for key in keys:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                found[key] = vector
+            else:
+                pending.append(key)
+
+        for start in range(0, len(pending), QUERY_BATCH):
+            batch = pending[start:start + QUERY_BATCH]
+            placeholders = ','.join('?' * len(batch))
+            rows = self._db.execute(
+                f"SELECT url_hash, vector FROM url_features "
+                f"WHERE version = ? AND url_hash IN ({placeholders})",
+                (self.version, *batch)
+            )
+            for key, blob in rows:
+                vector = np.frombuffer(blob, dtype=np.float64)
+                found[key] = vector
+                self._remember(key, vector)
+
+        return found
+
+    def store(self, keys, matrix):
+        """Save one feature vector per key"""
+        self._db.executemany(
+            "INSERT OR REPLACE INTO url_features (url_hash, version, vector) VALUES (?, ?, ?)",
+            ((key, self.version, row.tobytes()) for key, row in zip(keys, matrix))
+        )
+        self._db.commit()
+        # Copies, so the LRU doesn't pin a whole batch matrix in memory
+        tail = max(len(keys) - self.memory_size, 0)
+        for key, row in zip(keys[tail:], matrix[tail:]):
+            self._remember(key, row.copy())
+
+    def extract_batch(self, urls, extractor=extract_batch):
+        """
+        Same result as phishing_features.extract_batch(urls), but only URLs
+        not already cached are passed to `extractor` (which must return one
+        row per URL in FEATURE_NAMES order).
+        """
+        values = [url if isinstance(url, str) else '' for url in urls]
+        keys = [url_key(url) for url in values]
+
+        unique = dict(zip(keys, values))
+        found = self.lookup(unique)
+        missing = [key for key in unique if key not in found]
+
+        self.hits += len(unique) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            extracted = np.asarray(extractor([unique[key] for key in missing]), dtype=np.float64)
+            self.store(missing, extracted)
+            found.update(zip(missing, extracted))
+
+        if not unique:
+            return np.empty((0, len(FEATURE_NAMES)), dtype=np.float64)
+
+        position = {key: i for i, key in enumerate(unique)}
+        unique_matrix = np.stack([found[key] for key in unique])
+        rows = np.fromiter((position[key] for key in keys), dtype=np.int64, count=len(keys))
+        return unique_matrix[rows]
+
+    def extract_one(self, url):
+        """Cached phishing_features.extract_one(url)"""
+        key = url_key(url)
+        found = self.lookup([key])
+        if key in found:
+            self.hits += 1
+            return found[key]
+
+        self.misses += 1
+        vector = extract_one(url)
+        self.store([key], vector[np.newaxis, :])
+        return vector
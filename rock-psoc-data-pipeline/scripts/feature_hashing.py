@@ -0,0 +1,77 @@
+"""
+Deterministic feature hashing for string indicators
+Module: feature_hashing.py
+
+Python's built-in hash() of a string is salted per process (PYTHONHASHSEED),
+so `hash(value) % 1000` gives a different bucket in training and at
+inference. HashingEncoder hashes whole columns with pandas' keyed SipHash
+(pd.util.hash_array with a fixed key), which is vectorized and returns
+the same bucket for the same string in every process. The fitted encoder
+is saved with the other preprocessors and reused for scoring.
+"""
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_BUCKETS = 1000
+DEFAULT_HASH_KEY = '0123456789123456'  # 16 characters, pandas' default key
+
+
+class HashingEncoder:
+    """
+    Maps string values to one of `n_buckets` integer buckets.
+
+        encoder = HashingEncoder(n_buckets=1000).fit(X, columns)
+        X = encoder.transform(X)
+        joblib.dump(encoder, 'models/preprocessors/intrusion_hashing_encoder.pkl')
+
+    Only string entries are hashed; numbers pass through unchanged and
+    missing values stay missing.
+    """
+
+    def __init__(self, n_buckets=DEFAULT_BUCKETS, hash_key=DEFAULT_HASH_KEY):
+        self.n_buckets = n_buckets
+        self.hash_key = hash_key
+        self.columns = []
+
+    def fit(self, df, columns):
+        self.columns = list(columns)
+        return self
+
+    def hash_values(self, values):
+        """Bucket for each string in `values` (array-like of str)"""
+        values = np.asarray(values, dtype=object)
+        if len(values) == 0:
+            return np.empty(0, dtype=np.int64)
+        hashed = pd.util.hash_array(values, hash_key=self.hash_key, categorize=True)
+        return (hashed % np.uint64(self.n_buckets)).astype(np.int64)
+
+    def transform_column(self, series):
+        values = series.to_numpy(dtype=object)
+        is_str = np.fromiter((isinstance(v, str) for v in values), dtype=bool, count=len(values))
+        if not is_str.any():
+            return series
+
+        encoded = values.copy()
+        encoded[is_str] = self.hash_values(values[is_str])
+        return pd.Series(encoded, index=series.index, name=series.name).infer_objects()
+
+    def transform(self, df):
+        """Copy of `df` with every fitted column that is present hashed"""
+        df = df.copy()
+        for col in self.columns:
+            if col in df.columns:
+                df[col] = self.transform_column(df[col])
+        return df
+
+    def fit_transform(self, df, columns):
+        return self.fit(df, columns).transform(df)
+
+    def transform_record(self, features):
+        """Hash the fitted keys of a single feature dict (for online scoring)"""
+        features = dict(features)
+        for col in self.columns:
+            value = features.get(col)
+            if isinstance(value, str):
+                features[col] = int(self.hash_values([value])[0])
+        return features
@@ -0,0 +1,81 @@
+"""
+Binary feature-matrix handoff between processing and training
+Module: feature_matrix.py
+
+A processed dataset is saved as three files next to each other:
+
+    <root>.npy          float32 feature matrix (rows x features)
+    <root>_labels.npy   label vector
+    <root>.json         sidecar: feature names, row count, extra metadata
+
+Training opens the matrix with np.load(mmap_mode='r'), so nothing is
+parsed or copied at startup; pages are read as the model touches them.
+"""
+
+import json
+import os
+
+import numpy as np
+
+
+def matrix_paths(root):
+    """(matrix, labels, sidecar) paths for a dataset root"""
+    return f"{root}.npy", f"{root}_labels.npy", f"{root}.json"
+
+
+def _save_array(path, array):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def save_feature_matrix(root, features, labels, metadata=None):
+    """
+    Save a numeric feature DataFrame and its labels under `root`.
+
+    The sidecar is written last, so a reader that finds it can rely on
+    both arrays being complete.
+    """
+    matrix_path, labels_path, sidecar_path = matrix_paths(root)
+
+    _save_array(matrix_path, features.to_numpy(dtype=np.float32))
+    _save_array(labels_path, np.asarray(labels))
+
+    sidecar = {
+        'features': [str(name) for name in features.columns],
+        'rows': int(len(features)),
+        **(metadata or {}),
+    }
+    tmp_path = f"{sidecar_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(sidecar, f, indent=2)
+    os.replace(tmp_path, sidecar_path)
+
+
+def load_feature_matrix(root, mmap=True):
+    """(matrix, labels, sidecar) for `root`; the matrix is memory-mapped by default"""
+    matrix_path, labels_path, sidecar_path = matrix_paths(root)
+
+    with open(sidecar_path, 'r') as f:
+        sidecar = json.load(f)
+
+    matrix = np.load(matrix_path, mmap_mode='r' if mmap else None)
+    labels = np.load(labels_path)
+    return matrix, labels, sidecar
+
+
+def is_current(root, *sources):
+    """True if the matrix exists and is at least as new as every existing source file"""
+    sidecar_path = matrix_paths(root)[2]
+    if not os.path.exists(sidecar_path):
+        return False
+    saved = os.path.getmtime(sidecar_path)
+    return all(saved >= os.path.getmtime(path) for path in sources if os.path.exists(path))
+
+
+def remove_feature_matrix(root):
+    """Delete a saved matrix so it can't be mistaken for current data"""
+    for path in matrix_paths(root):
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,298 @@
+"""
+Parallel hyperparameter search (Hyperband / successive halving)
+Module: hyperparameter_search.py
+
+Shared by the training scripts' --search mode. Random Forest and XGBoost
+configurations are sampled from SEARCH_SPACES and raced with successive
+halving: every configuration is trained with a small budget (trees or
+boosting rounds), the best 1/eta are retrained with eta times the budget,
+and so on. Hyperband runs several such brackets, from many cheap trials
+to a few full-size ones.
+
+Trials run in a process pool, one single-threaded fit per core. The
+training/validation matrices - and, for XGBoost, the quantized
+QuantileDMatrix - are prepared once in the parent and inherited by the
+forked workers, so trials never re-read or re-quantize the data.
+Brackets are repeated with fresh configurations until `budget_seconds`
+is used up (trials already running finish), and every trial is appended
+to a JSON Lines log.
+
+    tuned = search_models({'Random Forest': 'rf', 'XGBoost': 'xgb'},
+                          X_fit, y_fit, X_val, y_val, task='multiclass',
+                          num_class=5, budget_seconds=600,
+                          log_path='models/evaluation/intrusion_search_trials.jsonl')
+    RandomForestClassifier(**tuned['Random Forest'])   # includes n_estimators
+"""
+
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError, as_completed
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.metrics import f1_score, mean_absolute_error, roc_auc_score
+
+DEFAULT_BUDGET_SECONDS = 600
+DEFAULT_ETA = 3
+
+SEARCH_SPACES = {
+    'rf': {
+        'max_depth': [8, 12, 16, 20, 30, None],
+        'min_samples_split': [2, 5, 10],
+        'min_samples_leaf': [1, 2, 4],
+        'max_features': ['sqrt', 'log2', 0.5, 1.0],
+    },
+    'xgb': {
+        'max_depth': [3, 4, 6, 8, 10],
+        'learning_rate': [0.03, 0.05, 0.1, 0.2, 0.3],
+        'subsample': [0.6, 0.8, 1.0],
+        'colsample_bytree': [0.6, 0.8, 1.0],
+        'min_child_weight': [1, 3, 5, 10],
+    },
+}
+
+# Budget parameter, smallest and largest value per model family
+RESOURCES = {
+    'rf': ('n_estimators', 25, 400),
+    'xgb': ('n_estimators', 50, 1000),
+}
+
+OBJECTIVES = {
+    'binary': 'binary:logistic',
+    'multiclass': 'multi:softprob',
+    'regression': 'reg:squarederror',
+}
+
+DEFAULT_METRICS = {
+    'binary': 'roc_auc',
+    'multiclass': 'f1_weighted',
+    'regression': 'neg_mae',
+}
+
+# Higher is better for every metric
+SCORERS = {
+    'f1_weighted': lambda model, X, y: f1_score(y, model.predict(X), average='weighted', zero_division=0),
+    'roc_auc': lambda model, X, y: roc_auc_score(y, model.predict_proba(X)[:, 1]),
+    'neg_mae': lambda model, X, y: -mean_absolute_error(y, model.predict(X)),
+}
+
+# Set in the parent before the pool forks; workers read their copy
+_DATA = {}
+
+
+def _pool_context():
+    """Fork, or None: the training scripts run at module level (see phishing_features.py)"""
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return None
+
+
+def sample_configs(family, n, rng):
+    """`n` random configurations from the family's search space"""
+    space = SEARCH_SPACES[family]
+    return [{name: rng.choice(values) for name, values in space.items()} for _ in range(n)]
+
+
+def _fit(family, config, resource, threads):
+    data = _DATA
+    task = data['task']
+    resource_name = RESOURCES[family][0]
+    params = {**data['fixed'].get(family, {}), **config}
+
+    if family == 'rf':
+        if task == 'regression':
+            model = RandomForestRegressor(random_state=42, n_jobs=threads, **{resource_name: resource}, **params)
+        else:
+            model = RandomForestClassifier(random_state=42, n_jobs=threads, class_weight='balanced',
+                                           **{resource_name: resource}, **params)
+        model.fit(data['X_fit'], data['y_fit'])
+        return model
+
+    from xgb_training import hist_params
+    params = hist_params(OBJECTIVES[task], num_class=data['num_class'], **params)
+    return data['split'].train(params, data['y_fit'], data['y_val'], num_boost_round=resource, threads=threads)
+
+
+def _run_trial(trial):
+    """Worker: fit one configuration and score it on the validation split"""
+    started = time.perf_counter()
+    try:
+        model = _fit(trial['family'], trial['config'], trial['resource'], trial['threads'])
+        trial['score'] = float(SCORERS[_DATA['metric']](model, _DATA['X_val'], _DATA['y_val']))
+        if hasattr(model, 'n_rounds'):
+            trial['boosting_rounds'] = model.n_rounds
+    except Exception as e:
+        trial['score'] = None
+        trial['error'] = str(e)
+    trial['seconds'] = time.perf_counter() - started
+    return trial
+
+
+class _Search:
+    """One model family's Hyperband run over a shared pool"""
+
+    def __init__(self, family, executor, deadline, eta, threads, log_file, label, run, seed):
+        self.family = family
+        self.executor = executor
+        self.deadline = deadline
+        self.eta = eta
+        self.threads = threads
+        self.log_file = log_file
+        self.label = label
+        self.run = run
+        self.rng = random.Random(seed)
+        self.trials = []
+        self.out_of_time = False
+
+    def _run_rung(self, configs, resource, bracket, rung):
+        trials = [{
+            'run': self.run, 'model': self.label, 'family': self.family, 'bracket': bracket, 'rung': rung,
+            'resource': resource, 'config': config, 'threads': self.threads,
+        } for config in configs]
+
+        if self.executor is None:
+            results = []
+            for trial in trials:
+                if time.perf_counter() >= self.deadline:
+                    self.out_of_time = True
+                    break
+                results.append(_run_trial(trial))
+        else:
+            futures = [self.executor.submit(_run_trial, trial) for trial in trials]
+            results = []
+            try:
+                for future in as_completed(futures, timeout=max(0.0, self.deadline - time.perf_counter())):
+                    results.append(future.result())
+            except TimeoutError:
+                self.out_of_time = True
+                for future in futures:
+                    future.cancel()
+
+        for trial in results:
+            trial['trial'] = len(self.trials)
+            self.trials.append(trial)
+            if self.log_file is not None:
+                self.log_file.write(json.dumps(trial, default=str) + '\n')
+        if self.log_file is not None:
+            self.log_file.flush()
+        return [trial for trial in results if trial['score'] is not None]
+
+    def successive_halving(self, n_configs, resource, bracket):
+        """Race `n_configs` random configurations, starting at `resource`"""
+        max_resource = RESOURCES[self.family][2]
+        configs = sample_configs(self.family, n_configs, self.rng)
+        rung = 0
+        while configs and not self.out_of_time:
+            results = self._run_rung(configs, resource, bracket, rung)
+            if len(configs) == 1 or resource >= max_resource or not results:
+                break
+            results.sort(key=lambda trial: trial['score'], reverse=True)
+            configs = [trial['config'] for trial in results[:max(1, len(configs) // self.eta)]]
+            resource = min(max_resource, resource * self.eta)
+            rung += 1
+
+    def hyperband(self):
+        """Hyperband brackets, repeated with fresh configurations until the deadline"""
+        _, min_resource, max_resource = RESOURCES[self.family]
+        s_max = int(math.log(max_resource / min_resource, self.eta))
+        bracket = 0
+        while not self.out_of_time:
+            for s in range(s_max, -1, -1):
+                if self.out_of_time or time.perf_counter() >= self.deadline:
+                    self.out_of_time = True
+                    break
+                n_configs = math.ceil((s_max + 1) / (s + 1) * self.eta ** s)
+                resource = max(min_resource, int(max_resource * self.eta ** -s))
+                self.successive_halving(n_configs, resource, bracket)
+                bracket += 1
+
+    def best(self):
+        """Best scoring trial (the larger budget wins ties), or None"""
+        scored = [trial for trial in self.trials if trial['score'] is not None]
+        if not scored:
+            return None
+        return max(scored, key=lambda trial: (trial['score'], trial['resource']))
+
+
+def search_models(models, X_fit, y_fit, X_val, y_val, task, num_class=None, metric=None,
+                  budget_seconds=DEFAULT_BUDGET_SECONDS, workers=None, eta=DEFAULT_ETA,
+                  fixed_params=None, split=None, log_path=None, seed=42):
+    """
+    Hyperband search for each {label: family} in `models` ('rf' / 'xgb').
+
+    The time budget is split evenly between the families. Returns
+    {label: params} with the budget parameter (n_estimators) included;
+    labels whose search produced no scored trial are left out. Pass
+    `split` to reuse a QuantizedSplit of (X_fit, X_val) already built.
+    """
+    metric = metric or DEFAULT_METRICS[task]
+    workers = workers or os.cpu_count() or 1
+
+    _DATA.clear()
+    _DATA.update({
+        'X_fit': X_fit, 'y_fit': np.asarray(y_fit), 'X_val': X_val, 'y_val': np.asarray(y_val),
+        'task': task, 'num_class': num_class if task == 'multiclass' else None,
+        'metric': metric, 'fixed': fixed_params or {},
+    })
+    if 'xgb' in models.values():
+        # XGBoost is only imported when an XGBoost search runs. Quantized
+        # once here; forked workers inherit it
+        from xgb_training import QuantizedSplit
+        _DATA['split'] = split or QuantizedSplit(X_fit, X_val)
+
+    log_file = None
+    if log_path:
+        os.makedirs(os.path.dirname(log_path) or '.', exist_ok=True)
+        log_file = open(log_path, 'a')
+
+    context = _pool_context() if workers > 1 else None
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=context) if context else None
+
+    tuned = {}
+    run = time.strftime('%Y-%m-%dT%H:%M:%S')
+    deadline = time.perf_counter() + budget_seconds
+    try:
+        for i, (label, family) in enumerate(models.items()):
+            # Even share of what is left, so unused time rolls over
+            started = time.perf_counter()
+            share = (deadline - started) / (len(models) - i)
+            search = _Search(family, executor, started + share, eta, 1, log_file, label, run, seed)
+            search.hyperband()
+            elapsed = time.perf_counter() - started
+
+            best = search.best()
+            if best is None:
+                print(f"   ⚠️  {label}: no successful trials")
+                continue
+            # XGBoost trials stop early, so keep the rounds actually used
+            rounds = best.get('boosting_rounds', best['resource'])
+            tuned[label] = {**best['config'], RESOURCES[family][0]: rounds}
+            print(f"   ✅ {label}: {len(search.trials)} trials in {elapsed:.0f}s, "
+                  f"best {metric} {best['score']:.4f}")
+            print(f"      {tuned[label]}")
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if log_file is not None:
+            log_file.close()
+        _DATA.clear()
+
+    return tuned
+
+
+def save_tuned(path, tuned):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(tuned, f, indent=4)
+
+
+def load_tuned(path):
+    """Tuned parameters saved by an earlier --search run ({} if there are none)"""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,246 @@
+"""
+Out-of-core intrusion detection training over NSL-KDD format files
+Module: incremental_training.py
+
+Used by `4_train_intrusion_detection.py --incremental`. The raw traffic
+files are never loaded whole: every pass streams them from disk in chunks
+of --chunk-size rows, so the inputs can be far larger than memory (e.g.
+months of flow exports in NSL-KDD format).
+
+    pass 0    ChunkedDataset.scan(): category codes, label classes,
+              class counts and StandardScaler statistics
+    XGBoost   external-memory QuantileDMatrix built from a DataIter
+    SGD       partial_fit per chunk (the streaming stand-in for RF)
+    Keras     nn_input.batch_dataset over the chunk generator
+
+Every `holdout_every`-th row is held out for evaluation, so the split is
+deterministic without keeping an index in memory. SMOTE needs the whole
+matrix, so class imbalance is handled with balanced sample weights instead.
+"""
+
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDClassifier
+from sklearn.preprocessing import StandardScaler
+
+from nsl_kdd_predictions import ATTACK_TO_THREAT
+from raw_store import NSL_KDD_COLUMNS, iter_nsl_kdd_chunks
+
+CATEGORICAL_COLUMNS = ['protocol_type', 'service', 'flag']
+FEATURE_COLUMNS = [col for col in NSL_KDD_COLUMNS if col not in ('attack_type', 'difficulty')]
+DEFAULT_CHUNK_SIZE = 100_000
+
+
+def threat_labels(attack_type):
+    """NSL-KDD attack names -> threat categories ('Normal' for normal traffic)"""
+    attack = pd.Series(attack_type).astype(str)
+    threat = attack.map(ATTACK_TO_THREAT)
+    return np.where(attack == 'normal', 'Normal', threat.fillna('Unknown Threat'))
+
+
+class ChunkedDataset:
+    """
+    Re-iterable stream of prepared (X, y, weight) chunks from NSL-KDD CSVs.
+
+    Call scan() once before iterating: it fixes the category codes, the
+    label classes and the scaler, all in a single streaming pass.
+    """
+
+    def __init__(self, paths, chunksize=DEFAULT_CHUNK_SIZE, holdout_every=5):
+        self.paths = list(paths)
+        self.chunksize = chunksize
+        self.holdout_every = holdout_every
+        self.categories = {col: [] for col in CATEGORICAL_COLUMNS}
+        self.classes = []
+        self.class_counts = {}
+        self.scaler = StandardScaler()
+        self.rows = 0
+
+    def _raw_chunks(self):
+        for path in self.paths:
+            yield from iter_nsl_kdd_chunks(path, chunksize=self.chunksize)
+
+    def _encode(self, chunk):
+        """Float32 feature matrix for a raw chunk (unseen categories -> -1)"""
+        X = chunk[FEATURE_COLUMNS].copy()
+        for col in CATEGORICAL_COLUMNS:
+            X[col] = pd.Categorical(X[col], categories=self.categories[col]).codes
+        return X.to_numpy(dtype=np.float32)
+
+    def scan(self):
+        """Single pass that learns categories, classes and scaling statistics"""
+        for chunk in self._raw_chunks():
+            for col in CATEGORICAL_COLUMNS:
+                known = set(self.categories[col])
+                self.categories[col].extend(v for v in pd.unique(chunk[col].astype(str)) if v not in known)
+
+            for label, count in pd.Series(threat_labels(chunk['attack_type'])).value_counts().items():
+                self.class_counts[label] = self.class_counts.get(label, 0) + int(count)
+
+            self.scaler.partial_fit(self._encode(chunk))
+            self.rows += len(chunk)
+
+        self.classes = sorted(self.class_counts)
+        total = sum(self.class_counts.values())
+        # Balanced weights, as class_weight='balanced' would compute them
+        self.class_weights = np.array(
+            [total / (len(self.classes) * self.class_counts[c]) for c in self.classes],
+            dtype=np.float32
+        )
+        return self
+
+    def chunks(self):
+        """Yield (X_scaled, y, is_holdout) per chunk"""
+        offset = 0
+        class_index = {label: i for i, label in enumerate(self.classes)}
+        for chunk in self._raw_chunks():
+            X = self.scaler.transform(self._encode(chunk)).astype(np.float32)
+            y = pd.Series(threat_labels(chunk['attack_type'])).map(class_index).to_numpy(dtype=np.int32)
+            is_holdout = (np.arange(offset, offset + len(chunk)) % self.holdout_every) == 0
+            offset += len(chunk)
+            yield X, y, is_holdout
+
+    def train_chunks(self):
+        """Yield (X, y, sample_weight) for the training rows of each chunk"""
+        for X, y, is_holdout in self.chunks():
+            keep = ~is_holdout
+            if keep.any():
+                yield X[keep], y[keep], self.class_weights[y[keep]]
+
+    def holdout_chunks(self):
+        """Yield (X, y) for the held-out rows of each chunk"""
+        for X, y, is_holdout in self.chunks():
+            if is_holdout.any():
+                yield X[is_holdout], y[is_holdout]
+
+
+def evaluate(dataset, predict):
+    """(y_true, y_pred) over the holdout rows, predicting one chunk at a time"""
+    y_true, y_pred = [], []
+    for X, y in dataset.holdout_chunks():
+        y_true.append(y)
+        y_pred.append(np.asarray(predict(X)))
+    if not y_true:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32)
+    return np.concatenate(y_true), np.concatenate(y_pred)
+
+
+def train_sgd(dataset, epochs=3, random_state=42):
+    """Linear model (logistic loss) trained with partial_fit over the chunks"""
+    model = SGDClassifier(loss='log_loss', alpha=1e-5, random_state=random_state)
+    classes = np.arange(len(dataset.classes))
+
+    started = time.perf_counter()
+    rows = 0
+    for _ in range(epochs):
+        for X, y, weight in dataset.train_chunks():
+            model.partial_fit(X, y, classes=classes, sample_weight=weight)
+            rows += len(X)
+    return model, time.perf_counter() - started, rows
+
+
+def _xgb_chunk_iter(dataset, cache_dir):
+    """XGBoost DataIter over `dataset` (xgboost is only imported for --incremental XGBoost runs)"""
+    import xgboost as xgb
+
+    class _XGBChunkIter(xgb.DataIter):
+        """Feeds ChunkedDataset training chunks to XGBoost one at a time"""
+
+        def __init__(self, dataset, cache_dir):
+            self._dataset = dataset
+            self._chunks = None
+            super().__init__(cache_prefix=os.path.join(cache_dir, 'xgb'))
+
+        def next(self, input_data):
+            if self._chunks is None:
+                self._chunks = self._dataset.train_chunks()
+            try:
+                X, y, weight = next(self._chunks)
+            except StopIteration:
+                return False
+            input_data(data=X, label=y, weight=weight)
+            return True
+
+        def reset(self):
+            self._chunks = None
+
+    return _XGBChunkIter(dataset, cache_dir)
+
+
+def train_xgb(dataset, num_boost_round=200, params=None, cache_dir=None):
+    """
+    Histogram XGBoost over an external-memory DMatrix.
+
+    Quantized pages are cached on disk under `cache_dir` (a temporary
+    directory by default) instead of holding the matrix in RAM.
+    """
+    params = {
+        'objective': 'multi:softprob',
+        'num_class': len(dataset.classes),
+        'tree_method': 'hist',
+        'max_depth': 6,
+        'eta': 0.1,
+        'subsample': 0.8,
+        'colsample_bytree': 0.8,
+        'eval_metric': 'mlogloss',
+        'seed': 42,
+        'verbosity': 0,
+        **(params or {}),
+    }
+
+    import xgboost as xgb
+
+    with tempfile.TemporaryDirectory(dir=cache_dir) as tmp_dir:
+        started = time.perf_counter()
+        if hasattr(xgb, 'ExtMemQuantileDMatrix'):
+            dtrain = xgb.ExtMemQuantileDMatrix(_xgb_chunk_iter(dataset, tmp_dir))
+        else:  # xgboost < 3.0
+            dtrain = xgb.DMatrix(_xgb_chunk_iter(dataset, tmp_dir))
+        booster = xgb.train(params, dtrain, num_boost_round=num_boost_round)
+        fit_seconds = time.perf_counter() - started
+        rows = dtrain.num_row()
+
+    return booster, fit_seconds, rows
+
+
+def train_nn(dataset, epochs=5, batch_size=1024):
+    """Keras MLP fed batch by batch from the chunk stream"""
+    from tensorflow import keras
+    from tensorflow.keras import layers
+    from nn_input import batch_dataset
+
+    num_features = len(FEATURE_COLUMNS)
+    num_classes = len(dataset.classes)
+
+    rows = [0]
+
+    def batches():
+        for X, y, weight in dataset.train_chunks():
+            rows[0] += len(X)
+            for start in range(0, len(X), batch_size):
+                end = start + batch_size
+                yield X[start:end], y[start:end], weight[start:end]
+
+    stream = batch_dataset(batches, num_features, weighted=True)
+
+    model = keras.Sequential([
+        layers.Dense(64, activation='relu', input_shape=(num_features,)),
+        layers.Dropout(0.3),
+        layers.Dense(32, activation='relu'),
+        layers.Dropout(0.2),
+        layers.Dense(num_classes, activation='softmax')
+    ], name='IntrusionDetectionNNIncremental')
+
+    model.compile(
+        optimizer=keras.optimizers.Adam(learning_rate=0.001),
+        loss='sparse_categorical_crossentropy',
+        metrics=['accuracy']
+    )
+
+    started = time.perf_counter()
+    model.fit(stream, epochs=epochs, verbose=0)
+    return model, time.perf_counter() - started, rows[0]
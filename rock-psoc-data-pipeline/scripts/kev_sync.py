@@ -0,0 +1,122 @@
+"""
+Incremental sync of the CISA Known Exploited Vulnerabilities catalog
+Module: kev_sync.py
+
+Keeps the feed's catalogVersion / dateReleased metadata and a content hash
+per cveID in a small state file. Each sync compares the new catalog with
+that state and writes a delta of new and changed CVEs, so downstream
+stages only need to touch what was added since the last run:
+
+    3_process_cisa.py --delta           -> threats_from_cisa_delta.json
+    4_upload_to_supabase.py --cisa-delta
+    6_train_vulnerability_scoring.py --delta   (skips retraining if empty)
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from raw_store import save_cisa_kev, CISA_KEV_DELTA_CSV, CISA_KEV_DELTA_PARQUET
+
+STATE_PATH = 'data/raw/cisa_kev_state.json'
+
+
+def record_hash(record):
+    """Stable content hash of one KEV entry"""
+    canonical = json.dumps(record, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+
+def load_state(path=STATE_PATH):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_state(state, path=STATE_PATH):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def write_delta(records, changes):
+    """Write the delta CSV/Parquet (an empty delta still gets a header row)"""
+    df = pd.DataFrame(records)
+    df.insert(0, 'change', changes)
+    if len(df) > 0:
+        return save_cisa_kev(df, CISA_KEV_DELTA_CSV, CISA_KEV_DELTA_PARQUET)
+
+    df.to_csv(CISA_KEV_DELTA_CSV, index=False)
+    if os.path.exists(CISA_KEV_DELTA_PARQUET):
+        os.remove(CISA_KEV_DELTA_PARQUET)
+    return df
+
+
+def clear_delta():
+    """Nothing changed upstream - make sure a stale delta is not re-applied"""
+    return write_delta([], [])
+
+
+def sync_catalog(feed, state_path=STATE_PATH):
+    """
+    Compare a freshly downloaded KEV feed (the parsed JSON document) with
+    the stored state, write the delta and update the state.
+
+    Returns a summary dict with the catalog version and the new, changed
+    and removed cveIDs.
+    """
+    state = load_state(state_path)
+    version = feed.get('catalogVersion')
+    released = feed.get('dateReleased')
+
+    summary = {
+        'catalogVersion': version,
+        'previousVersion': state.get('catalogVersion'),
+        'dateReleased': released,
+        'new': [],
+        'changed': [],
+        'removed': [],
+    }
+
+    if state and version and version == state.get('catalogVersion'):
+        clear_delta()
+        return summary
+
+    old_hashes = state.get('records', {})
+    new_hashes = {}
+    delta_records = []
+    changes = []
+
+    for record in feed.get('vulnerabilities', []):
+        cve_id = record.get('cveID')
+        digest = record_hash(record)
+        new_hashes[cve_id] = digest
+
+        if cve_id not in old_hashes:
+            summary['new'].append(cve_id)
+            changes.append('new')
+            delta_records.append(record)
+        elif old_hashes[cve_id] != digest:
+            summary['changed'].append(cve_id)
+            changes.append('changed')
+            delta_records.append(record)
+
+    summary['removed'] = sorted(set(old_hashes) - set(new_hashes))
+
+    write_delta(delta_records, changes)
+
+    save_state({
+        'catalogVersion': version,
+        'dateReleased': released,
+        'count': len(new_hashes),
+        'synced_at': datetime.now(timezone.utc).isoformat(),
+        'records': new_hashes,
+    }, state_path)
+
+    return summary
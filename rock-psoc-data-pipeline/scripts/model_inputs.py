@@ -0,0 +1,250 @@
+"""
+Feature matrices of the saved models, rebuilt from their preprocessors
+Module: model_inputs.py
+
+Scripts that score the saved models outside their training script
+(9_export_tree_models.py, 10_score_vulnerabilities.py) need the exact
+features the models were trained on. These functions rebuild them from
+the raw or processed data with the saved preprocessors (scalers,
+encoders, vocabularies, feature names), the way the training scripts
+build them.
+
+The training scripts also save the rows they held out for testing
+(save_holdout): row positions in the rebuilt matrix, or CVE IDs for the
+KEV catalog. holdout_features(task) returns just those rows, so a model
+can be checked on real data it was not trained on:
+
+    X = holdout_features('phishing_detection')   # scaled, float32
+    check_parity(model, compiled, X)
+"""
+
+import json
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+from feature_matrix import load_feature_matrix, is_current
+from record_io import resolve_input, iter_records, as_jsonl
+from risk_scoring import kev_features
+from text_features import kev_text, stack_features
+from vocabulary_store import VocabularyStore, VOCABULARY_PATH, KEV_CATEGORY_COLUMNS
+
+PREPROCESSORS = 'models/preprocessors'
+EVALUATION = 'models/evaluation'
+INTRUSION_RECORDS_PATH = 'data/processed/predictions_from_nsl_kdd.json'
+PHISHING_RECORDS_PATH = 'data/processed/processed_phishing_urls.json'
+PHISHING_MATRIX_ROOT = 'data/processed/phishing_features'
+PHISHING_LABEL_COLUMNS = ['label', 'phishing', 'class', 'target']
+RAW_CATEGORICAL = ['protocol_type', 'service', 'flag']
+
+
+def _load_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def metrics(task):
+    """The task's saved evaluation metrics"""
+    return _load_json(os.path.join(EVALUATION, f'{task}_metrics.json'))
+
+
+# ============================================
+# HELD-OUT ROWS
+# ============================================
+
+def holdout_path(task):
+    return os.path.join(EVALUATION, f'{task}_holdout.npz')
+
+
+def save_holdout(task, rows, n_rows):
+    """Save the held-out rows (positions or IDs) of a matrix of `n_rows` rows"""
+    rows = np.asarray(rows)
+    if rows.dtype == object:
+        rows = rows.astype(str)  # loadable without pickle
+    os.makedirs(EVALUATION, exist_ok=True)
+    np.savez(holdout_path(task), rows=rows, n_rows=int(n_rows))
+
+
+def load_holdout(task):
+    """(rows, n_rows) saved by the task's training script"""
+    with np.load(holdout_path(task), allow_pickle=False) as data:
+        return data['rows'], int(data['n_rows'])
+
+
+def _check_rows(n_rows, expected_rows):
+    if expected_rows is not None and n_rows != expected_rows:
+        raise ValueError(f"the data has {n_rows:,} rows but the models were trained on "
+                         f"{expected_rows:,} - retrain to check them on real rows")
+
+
+# ============================================
+# INTRUSION DETECTION (4_train_intrusion_detection.py)
+# ============================================
+
+def intrusion_record_features(record):
+    """
+    Feature dict of one NSL-KDD threat record: severity, probability,
+    confidence and the numeric / string indicators (strings are hashed
+    later by the HashingEncoder), plus its 'attack_type' label.
+    """
+    indicators = record.get('indicators', {})
+    features = {
+        'severity': record.get('severity', 'medium'),
+        'probability': record.get('probability', 0.5),
+        'confidence_score': record.get('confidence_score', 0.5),
+    }
+    if isinstance(indicators, dict):
+        for key, value in indicators.items():
+            if isinstance(value, (int, float, str)):
+                features[f'ind_{key}'] = value
+    features['attack_type'] = record.get('threat_type', 'unknown')
+    return features
+
+
+def intrusion_record_frame(records_path):
+    """(frame, string columns, records read) for the threat records file"""
+    features_list = []
+    hashed_columns = set()
+    num_records = 0
+    for record in iter_records(records_path):
+        num_records += 1
+        try:
+            features = intrusion_record_features(record)
+        except Exception:
+            continue
+        hashed_columns.update(key for key, value in features.items()
+                              if key.startswith('ind_') and isinstance(value, str))
+        features_list.append(features)
+    return pd.DataFrame(features_list), hashed_columns, num_records
+
+
+def _check_columns(X, feature_names):
+    missing = [col for col in feature_names if col not in X.columns]
+    if missing:
+        raise ValueError(f"the data has no column(s) {missing[:5]} the models were trained on")
+
+
+def _label_encode_objects(X):
+    """Remaining string columns -> codes (LabelEncoder, as at training)"""
+    for col in X.select_dtypes(include=['object']).columns:
+        X[col] = LabelEncoder().fit_transform(X[col].astype(str))
+    return X
+
+
+def intrusion_features(rows=None, expected_rows=None):
+    """
+    Script 4's scaled feature matrix (or just `rows` of it), from the
+    processed records or, for models trained with --raw, the raw NSL-KDD
+    traffic. ValueError if the data no longer has `expected_rows` rows.
+    """
+    feature_names = _load_json(os.path.join(PREPROCESSORS, 'intrusion_feature_names.json'))
+    scaler = joblib.load(os.path.join(PREPROCESSORS, 'intrusion_scaler.pkl'))
+
+    if metrics('intrusion_detection').get('training_mode') == 'raw':
+        from raw_store import load_nsl_kdd_all
+        df = load_nsl_kdd_all()
+        categories = _load_json(os.path.join(PREPROCESSORS, 'intrusion_raw_categories.json'))
+        _check_rows(len(df), expected_rows)
+        if rows is not None:
+            df = df.iloc[rows]
+        X = df.drop(columns=['attack_type', 'difficulty'], errors='ignore')
+        for col in RAW_CATEGORICAL:
+            X[col] = pd.Categorical(X[col].astype(str), categories=categories[col]).codes
+        X = X.astype(np.float32)
+    else:
+        df, _, _ = intrusion_record_frame(resolve_input(INTRUSION_RECORDS_PATH))
+        hashing_encoder = joblib.load(os.path.join(PREPROCESSORS, 'intrusion_hashing_encoder.pkl'))
+        X = hashing_encoder.transform(df.drop(columns=['attack_type']))
+        # Label-encoded over every row, as at training, before selecting rows
+        X = _label_encode_objects(X)
+        X = X.apply(pd.to_numeric, errors='coerce').fillna(0)
+        _check_rows(len(X), expected_rows)
+        if rows is not None:
+            X = X.iloc[rows]
+
+    _check_columns(X, feature_names)
+    return scaler.transform(X[feature_names]).astype(np.float32)
+
+
+# ============================================
+# PHISHING DETECTION (5_train_phishing_detection.py)
+# ============================================
+
+def phishing_features(rows=None, expected_rows=None):
+    """
+    Script 5's scaled feature matrix (or just `rows` of it), from the
+    binary feature matrix when it is current, else the processed records.
+    ValueError if the data no longer has `expected_rows` rows.
+    """
+    feature_names = _load_json(os.path.join(PREPROCESSORS, 'phishing_feature_names.json'))
+    scaler = joblib.load(os.path.join(PREPROCESSORS, 'phishing_scaler.pkl'))
+
+    if is_current(PHISHING_MATRIX_ROOT, PHISHING_RECORDS_PATH, as_jsonl(PHISHING_RECORDS_PATH)):
+        matrix, _, sidecar = load_feature_matrix(PHISHING_MATRIX_ROOT)
+        _check_rows(len(matrix), expected_rows)
+        X = pd.DataFrame(matrix if rows is None else matrix[rows], columns=sidecar['features'])
+    else:
+        df = pd.DataFrame.from_records(iter_records(resolve_input(PHISHING_RECORDS_PATH)))
+        X = df.drop(columns=[col for col in PHISHING_LABEL_COLUMNS if col in df.columns][:1])
+        X = _label_encode_objects(X).apply(pd.to_numeric, errors='coerce').fillna(0)
+        _check_rows(len(X), expected_rows)
+        if rows is not None:
+            X = X.iloc[rows]
+
+    _check_columns(X, feature_names)
+    # float32 with missing values as 0, as script 5 scales its rows
+    X = np.nan_to_num(X[feature_names].to_numpy(dtype=np.float32))
+    return scaler.transform(pd.DataFrame(X, columns=feature_names)).astype(np.float32)
+
+
+# ============================================
+# VULNERABILITY SCORING (6_train_vulnerability_scoring.py)
+# ============================================
+
+def vulnerability_features(df):
+    """Script 6's (scaled) feature matrix for KEV rows `df`; sparse with --text-features"""
+    feature_cols = _load_json(os.path.join(PREPROCESSORS, 'vulnerability_feature_names.json'))
+    task_metrics = metrics('vulnerability_scoring')
+
+    features = kev_features(df)
+    encoding = (task_metrics.get('category_encoding') or {}).get('encoding', 'code')
+    vocabularies = VocabularyStore.load(VOCABULARY_PATH)
+    for name, col in KEV_CATEGORY_COLUMNS.items():
+        if col in df.columns and name in vocabularies:
+            features[f'{name}_encoded'] = vocabularies[name].transform(df[col], encoding)
+
+    scaler = joblib.load(os.path.join(PREPROCESSORS, 'vulnerability_scaler.pkl'))
+    X = scaler.transform(features.reindex(columns=feature_cols).fillna(0))
+    if task_metrics.get('text_features'):
+        vectorizer = joblib.load(os.path.join(PREPROCESSORS, 'vulnerability_text_vectorizer.pkl'))
+        X = stack_features(X, vectorizer.transform(kev_text(df)))
+    return X
+
+
+# ============================================
+# HELD-OUT FEATURES PER TASK
+# ============================================
+
+def holdout_features(task):
+    """
+    Scaled features of the rows `task`'s training script held out.
+    Raises FileNotFoundError when the data, preprocessors or held-out
+    rows are missing, ValueError when the data changed since training.
+    """
+    if task == 'vulnerability_scoring':
+        from raw_store import load_cisa_kev
+        cve_ids, _ = load_holdout(task)
+        df = load_cisa_kev()
+        df = df[df['cveID'].astype(str).isin(cve_ids)]
+        if len(df) == 0:
+            raise ValueError("none of the held-out CVEs are in the KEV catalog any more")
+        return vulnerability_features(df)
+
+    build = {'intrusion_detection': intrusion_features, 'phishing_detection': phishing_features}.get(task)
+    if build is None:
+        raise ValueError(f"no feature rebuild for task '{task}'")
+    rows, n_rows = load_holdout(task)
+    return build(np.sort(rows.astype(np.int64)), expected_rows=n_rows)
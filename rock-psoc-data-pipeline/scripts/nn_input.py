@@ -0,0 +1,106 @@
+"""
+tf.data input pipelines for the Keras models
+Module: nn_input.py
+
+The training scripts used to hand Keras whole NumPy arrays plus one-hot
+(to_categorical) copies of the labels. array_dataset streams (features,
+label) batches from any array instead - in memory, or memory-mapped from
+disk (feature_matrix.py) - converting one chunk at a time to float32 and
+keeping integer labels for sparse_categorical_crossentropy:
+
+    source chunks -> rows -> [cache] -> [shuffle] -> batch -> prefetch
+
+Nothing is copied up front. Without `cache` every epoch re-reads the
+source; cache='' keeps the converted rows in memory after the first
+epoch, cache='<path>' spills them to a file instead.
+
+    train = array_dataset(X_train, y_train, batch_size=256, shuffle=True, threads=4)
+    val = array_dataset(X_val, y_val, batch_size=256)
+    model.fit(train, validation_data=val, epochs=100)
+
+A split of a memory-mapped matrix is streamed without copying it first:
+pass the whole matrix with the split's row indices and the scaler
+(5_train_phishing_detection.py does this for its training rows):
+
+    train = array_dataset(matrix, labels, 256, rows=fit_idx, transform=scale, shuffle=True)
+"""
+
+import numpy as np
+import tensorflow as tf
+
+DEFAULT_CHUNK_ROWS = 65_536
+DEFAULT_SHUFFLE_BUFFER = 100_000
+
+
+def _with_threads(dataset, threads):
+    """Run the pipeline on its own pool of `threads` (None: TensorFlow's shared pool)"""
+    if threads:
+        options = tf.data.Options()
+        options.threading.private_threadpool_size = threads
+        dataset = dataset.with_options(options)
+    return dataset
+
+
+def batch_dataset(make_batches, n_features, label_dtype=np.int32, threads=None, weighted=False):
+    """
+    Dataset over the (X, y) batches yielded by `make_batches()`, which is
+    called again for every epoch. With `weighted`, the batches are
+    (X, y, sample_weight) instead.
+    """
+    signature = (
+        tf.TensorSpec(shape=(None, n_features), dtype=tf.float32),
+        tf.TensorSpec(shape=(None,), dtype=tf.as_dtype(label_dtype)),
+    )
+    if weighted:
+        signature += (tf.TensorSpec(shape=(None,), dtype=tf.float32),)
+
+    def convert(X, y, *weight):
+        return ((np.asarray(X, dtype=np.float32), np.asarray(y, dtype=label_dtype))
+                + tuple(np.asarray(w, dtype=np.float32) for w in weight))
+
+    dataset = tf.data.Dataset.from_generator(
+        lambda: (convert(*batch) for batch in make_batches()),
+        output_signature=signature
+    )
+    return _with_threads(dataset.prefetch(tf.data.AUTOTUNE), threads)
+
+
+def array_dataset(X, y, batch_size, shuffle=False, seed=42, cache=None, transform=None, rows=None,
+                  label_dtype=np.int32, chunk_rows=DEFAULT_CHUNK_ROWS,
+                  shuffle_buffer=DEFAULT_SHUFFLE_BUFFER, threads=None):
+    """
+    Batched (float32 features, label) dataset over the rows of X / y.
+
+    `transform` (e.g. scaler.transform) is applied per chunk, so a raw
+    memory-mapped matrix can be scaled on the fly. `rows` limits the
+    dataset to those row indices of X / y (sorted, so a memory-mapped
+    matrix is read front to back). Use label_dtype np.float32 for binary
+    and regression targets.
+    """
+    n_features = X.shape[1]
+    y = np.asarray(y)
+    if rows is not None:
+        rows = np.sort(np.asarray(rows))
+    n_rows = len(rows) if rows is not None else X.shape[0]
+    rng = np.random.default_rng(seed)
+
+    def chunks():
+        starts = np.arange(0, n_rows, chunk_rows)
+        if shuffle:
+            rng.shuffle(starts)
+        for start in starts:
+            index = slice(start, start + chunk_rows) if rows is None else rows[start:start + chunk_rows]
+            X_chunk = X[index]
+            if transform is not None:
+                X_chunk = transform(X_chunk)
+            yield X_chunk, y[index]
+
+    dataset = batch_dataset(chunks, n_features, label_dtype).unbatch()
+    if cache is not None:
+        dataset = dataset.cache(cache)
+    if shuffle:
+        dataset = dataset.shuffle(min(shuffle_buffer, n_rows), seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size)
+    # Known length, so Keras can size its epochs without a first full pass
+    dataset = dataset.apply(tf.data.experimental.assert_cardinality(-(-n_rows // batch_size)))
+    return _with_threads(dataset.prefetch(tf.data.AUTOTUNE), threads)
@@ -0,0 +1,142 @@
+"""
+Vectorized NSL-KDD prediction builder
+Module: nsl_kdd_predictions.py
+
+Turns NSL-KDD attack records into dashboard "predictions". Severity,
+probability, jitter, timeframe and timestamps are computed for the whole
+frame at once with array masks; dicts are only built when the records
+are written out (see iter_records).
+"""
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Map attack types to threat categories
+ATTACK_TO_THREAT = {
+    'neptune': 'DDoS Attack',
+    'smurf': 'DDoS Attack',
+    'pod': 'DDoS Attack',
+    'teardrop': 'DDoS Attack',
+    'back': 'DDoS Attack',
+    'land': 'DDoS Attack',
+
+    'satan': 'Port Scan',
+    'ipsweep': 'Port Scan',
+    'nmap': 'Port Scan',
+    'portsweep': 'Port Scan',
+
+    'warezclient': 'Unauthorized Access',
+    'warezmaster': 'Unauthorized Access',
+    'ftp_write': 'Unauthorized Access',
+    'imap': 'Unauthorized Access',
+    'multihop': 'Unauthorized Access',
+    'phf': 'Unauthorized Access',
+    'spy': 'Unauthorized Access',
+
+    'guess_passwd': 'Brute Force Attack',
+
+    'buffer_overflow': 'Buffer Overflow Exploit',
+    'loadmodule': 'Privilege Escalation',
+    'perl': 'Script Exploit',
+    'rootkit': 'Rootkit Installation',
+
+    'normal': None  # Skip normal traffic
+}
+
+TIMEFRAMES = np.array(['1-2 days', '3-5 days', '5-7 days', '1-2 weeks'])
+
+# Columns the builder needs from the raw dataset
+REQUIRED_COLUMNS = [
+    'protocol_type', 'service', 'src_bytes', 'dst_bytes', 'wrong_fragment',
+    'num_failed_logins', 'root_shell', 'attack_type'
+]
+
+
+def build_predictions(df, rng=None, now=None):
+    """
+    Score every attack row of `df` (normal traffic is dropped).
+
+    Returns a DataFrame with one row per prediction; use iter_records()
+    to turn it into the JSON records the upload script expects.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    now = now or datetime.now()
+
+    attack_type = df['attack_type'].astype(str)
+    attacks = df[attack_type != 'normal']
+    attack_type = attack_type[attack_type != 'normal']
+    n = len(attacks)
+
+    threat_type = attack_type.map(ATTACK_TO_THREAT).fillna('Unknown Threat')
+
+    src_bytes = attacks['src_bytes'].to_numpy()
+    dst_bytes = attacks['dst_bytes'].to_numpy()
+    failed_logins = attacks['num_failed_logins'].to_numpy()
+
+    # Severity rules - later rules in the original cascade take precedence,
+    # so they come first here (np.select picks the first matching condition)
+    severity = np.select(
+        [
+            (dst_bytes < 1000) & (src_bytes < 1000),
+            (failed_logins > 3) | (attacks['root_shell'].to_numpy() > 0),
+            (dst_bytes > 10000) | (attacks['wrong_fragment'].to_numpy() > 0),
+        ],
+        ['low', 'critical', 'high'],
+        default='medium'
+    )
+
+    # Probability (higher for more severe attacks) plus some randomness
+    base_probability = np.select(
+        [severity == 'critical', severity == 'high', severity == 'low'],
+        [0.85, 0.75, 0.55],
+        default=0.65
+    )
+    probability = np.round(base_probability + rng.uniform(-0.1, 0.1, n), 2)
+    probability = np.clip(probability, 0.5, 0.99)  # Keep between 0.5 and 0.99
+
+    # Spread created_at over last 30 days
+    created_at = pd.Timestamp(now) - pd.to_timedelta(rng.integers(0, 31, n), unit='D')
+
+    return pd.DataFrame({
+        'threat_type': threat_type.to_numpy(),
+        'severity': severity,
+        'probability': probability,
+        'predicted_timeframe': TIMEFRAMES[rng.integers(0, len(TIMEFRAMES), n)],
+        'description': (
+            'Historical pattern analysis detected ' + threat_type.str.lower()
+            + ' signature similar to ' + attack_type
+            + ' attack. Network traffic patterns match known attack vectors.'
+        ).to_numpy(),
+        'protocol': attacks['protocol_type'].astype(str).to_numpy(),
+        'service': attacks['service'].astype(str).to_numpy(),
+        'src_bytes': src_bytes,
+        'dst_bytes': dst_bytes,
+        'failed_logins': failed_logins,
+        'attack_signature': attack_type.to_numpy(),
+        'created_at': created_at,
+    })
+
+
+def iter_records(predictions):
+    """Materialize prediction rows as JSON-ready dicts, one at a time"""
+    for row in predictions.itertuples(index=False):
+        yield {
+            'threat_type': row.threat_type,
+            'severity': row.severity,
+            'probability': float(row.probability),
+            'confidence_score': 0.82,  # Fixed confidence for historical data
+            'predicted_timeframe': row.predicted_timeframe,
+            'description': row.description,
+            'indicators': {
+                'protocol': row.protocol,
+                'service': row.service,
+                'src_bytes': int(row.src_bytes),
+                'dst_bytes': int(row.dst_bytes),
+                'failed_logins': int(row.failed_logins) if row.failed_logins > 0 else None,
+                'attack_signature': row.attack_signature
+            },
+            'source': 'NSL-KDD Historical Dataset',
+            'created_at': row.created_at.isoformat()
+        }
@@ -0,0 +1,201 @@
+"""
+SMOTE oversampling over per-class tree indexes
+Module: oversampling.py
+
+Used by `4_train_intrusion_detection.py --oversampler tree|lazy`.
+imblearn's SMOTE runs an exact k-NN search for every minority row and
+materializes all synthetic rows before training. TreeSMOTE instead:
+
+    - searches neighbours only for the seed rows it actually samples,
+      per class, in a KD-tree over a random projection of the features
+      to `projection_dims` dimensions (KD-trees degrade to brute force
+      in 40+ dimensions) built on at most `index_size` rows of the
+      class - so neighbours are approximate
+    - plans every class in parallel (tree queries release the GIL)
+    - stores a plan of (seed row, neighbour row, gap) per synthetic row
+      instead of the rows themselves
+
+The plan is turned into rows either all at once (fit_resample, the same
+output shape as SMOTE) or lazily per training batch (iter_batches), so
+only one batch of synthetic rows exists at a time.
+"""
+
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from sklearn.neighbors import KDTree
+
+DEFAULT_K_NEIGHBORS = 5
+DEFAULT_INDEX_SIZE = 50_000
+DEFAULT_PROJECTION_DIMS = 8
+
+
+def sampling_targets(y):
+    """Synthetic rows per class to match the majority class (SMOTE's 'auto')"""
+    classes, counts = np.unique(y, return_counts=True)
+    majority = counts.max()
+    return {cls: int(majority - count) for cls, count in zip(classes, counts) if count < majority}
+
+
+class TreeSMOTE:
+    """
+    SMOTE with per-class KD-tree neighbour search.
+
+        sampler = TreeSMOTE(k_neighbors=5).fit(X, y)
+        X_res, y_res = sampler.resample()        # materialized, like SMOTE
+        for X_batch, y_batch in sampler.iter_batches(256):
+            ...                                  # lazy, one batch at a time
+    """
+
+    def __init__(self, k_neighbors=DEFAULT_K_NEIGHBORS, index_size=DEFAULT_INDEX_SIZE,
+                 projection_dims=DEFAULT_PROJECTION_DIMS, workers=None, random_state=42):
+        self.k_neighbors = k_neighbors
+        self.index_size = index_size
+        self.projection_dims = projection_dims
+        self.workers = workers
+        self.random_state = random_state
+
+    def _plan_class(self, cls, n_new):
+        """(seed rows, neighbour rows, gaps) for `n_new` synthetic rows of one class"""
+        rng = np.random.default_rng([self.random_state, int(cls)])
+        rows = np.flatnonzero(self.y_ == cls)
+        k = min(self.k_neighbors, len(rows) - 1)
+        if k < 1:
+            raise ValueError(f"class {cls} has {len(rows)} sample(s); SMOTE needs at least 2")
+
+        index_rows = rows
+        if len(rows) > self.index_size:
+            index_rows = np.sort(rng.choice(rows, size=self.index_size, replace=False))
+        tree = KDTree(self._search_X[index_rows])
+
+        # Neighbours are only needed for the rows that get picked as seeds
+        seeds = rows[rng.integers(len(rows), size=n_new)]
+        unique_seeds, inverse = np.unique(seeds, return_inverse=True)
+        _, neighbours = tree.query(self._search_X[unique_seeds], k=k + 1)
+        neighbours = index_rows[neighbours]
+
+        # Drop each seed from its own neighbour list (or the farthest one if
+        # the seed is not in a subsampled index)
+        is_self = neighbours == unique_seeds[:, None]
+        order = np.argsort(is_self, axis=1, kind='stable')
+        neighbours = np.take_along_axis(neighbours, order, axis=1)[:, :k]
+
+        picks = neighbours[inverse, rng.integers(k, size=n_new)]
+        gaps = rng.random(n_new, dtype=np.float32)
+        return seeds, picks, gaps
+
+    def fit(self, X, y):
+        """Plan the synthetic rows for every minority class"""
+        self.X_ = np.asarray(X)
+        self.y_ = np.asarray(y)
+        targets = sampling_targets(self.y_)
+
+        # Neighbour search space: a Gaussian random projection (roughly
+        # distance preserving) when the features have more dimensions
+        self._search_X = self.X_
+        if self.projection_dims and self.X_.shape[1] > self.projection_dims:
+            rng = np.random.default_rng(self.random_state)
+            projection = rng.normal(size=(self.X_.shape[1], self.projection_dims)) / np.sqrt(self.projection_dims)
+            self._search_X = (self.X_ @ projection).astype(np.float32)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            plans = list(executor.map(lambda item: self._plan_class(*item), targets.items()))
+
+        if plans:
+            self.seeds_ = np.concatenate([plan[0] for plan in plans])
+            self.neighbours_ = np.concatenate([plan[1] for plan in plans])
+            self.gaps_ = np.concatenate([plan[2] for plan in plans])
+        else:
+            self.seeds_ = self.neighbours_ = np.empty(0, dtype=np.int64)
+            self.gaps_ = np.empty(0, dtype=np.float32)
+        del self._search_X
+        return self
+
+    @property
+    def n_synthetic(self):
+        return len(self.seeds_)
+
+    def synthesize(self, ids):
+        """Synthetic rows (and their labels) for plan entries `ids`"""
+        seeds, neighbours = self.seeds_[ids], self.neighbours_[ids]
+        X_seed = self.X_[seeds]
+        X_new = X_seed + self.gaps_[ids, None] * (self.X_[neighbours] - X_seed)
+        return X_new.astype(self.X_.dtype, copy=False), self.y_[seeds]
+
+    def resample(self):
+        """Original rows followed by every synthetic row"""
+        X_new, y_new = self.synthesize(np.arange(self.n_synthetic))
+        return np.vstack([self.X_, X_new]), np.concatenate([self.y_, y_new])
+
+    def fit_resample(self, X, y):
+        return self.fit(X, y).resample()
+
+    def iter_batches(self, batch_size, shuffle=True, seed=None):
+        """
+        One pass over the original and synthetic rows in batches; the
+        synthetic rows of a batch are generated when it is requested.
+        """
+        n_real = len(self.y_)
+        ids = np.arange(n_real + self.n_synthetic)
+        if shuffle:
+            np.random.default_rng(seed).shuffle(ids)
+
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            real = batch[batch < n_real]
+            X_new, y_new = self.synthesize(batch[batch >= n_real] - n_real)
+            yield np.vstack([self.X_[real], X_new]), np.concatenate([self.y_[real], y_new])
+
+    def steps_per_epoch(self, batch_size):
+        return -(-(len(self.y_) + self.n_synthetic) // batch_size)
+
+
+def _measure(function):
+    """(result, seconds, peak traced MB) for function()"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak / (1024 * 1024)
+
+
+def benchmark_oversamplers(X_train, y_train, X_test, y_test, k_neighbors=DEFAULT_K_NEIGHBORS,
+                           workers=None, evaluate=None):
+    """
+    Exact SMOTE vs TreeSMOTE (materialized) vs TreeSMOTE plan only (lazy).
+
+    `evaluate(X, y)` fits a model on the resampled training rows and
+    returns its F1 on (X_test, y_test); the lazy plan yields the same rows
+    as the materialized one, so it is not evaluated separately. Memory is
+    the peak of allocations traced while resampling.
+    """
+    from imblearn.over_sampling import SMOTE
+
+    results = {}
+
+    (X_res, y_res), seconds, peak = _measure(
+        lambda: SMOTE(random_state=42, k_neighbors=k_neighbors).fit_resample(X_train, y_train))
+    results['SMOTE (exact)'] = {'seconds': seconds, 'peak_mb': peak, 'rows': len(y_res)}
+    if evaluate is not None:
+        results['SMOTE (exact)']['f1_score'] = evaluate(X_res, y_res)
+    del X_res, y_res
+
+    sampler = TreeSMOTE(k_neighbors=k_neighbors, workers=workers)
+    (X_res, y_res), seconds, peak = _measure(lambda: sampler.fit_resample(X_train, y_train))
+    results['TreeSMOTE'] = {'seconds': seconds, 'peak_mb': peak, 'rows': len(y_res)}
+    if evaluate is not None:
+        results['TreeSMOTE']['f1_score'] = evaluate(X_res, y_res)
+    del X_res, y_res
+
+    sampler, seconds, peak = _measure(
+        lambda: TreeSMOTE(k_neighbors=k_neighbors, workers=workers).fit(X_train, y_train))
+    results['TreeSMOTE (lazy plan)'] = {
+        'seconds': seconds,
+        'peak_mb': peak,
+        'rows': len(y_train) + sampler.n_synthetic,
+    }
+    return results
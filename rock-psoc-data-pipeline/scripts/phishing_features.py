@@ -0,0 +1,292 @@
+"""
+URL feature extraction for phishing detection
+Module: phishing_features.py
+
+Shared by the processing scripts (3b_*) and by real-time scoring, so a
+model trained on processed_phishing_urls sees exactly the features it is
+later scored with. FEATURE_NAMES is the column order the training script
+saves to phishing_feature_names.json; FEATURE_VERSION is bumped whenever
+a feature definition or the order changes.
+
+For scoring:
+    extract_one(url)      -> 1-D float array in FEATURE_NAMES order
+    extract_batch(urls)   -> 2-D float array, one row per URL
+
+extract_url_features(url) computes the feature dict for a single URL.
+extract_url_features_batch(urls) computes the same features for a whole
+column of URLs at once and returns them as a DataFrame: character counts
+are taken over one contiguous byte buffer with NumPy, pattern checks use
+precompiled regexes, and only the URL parsing step is done per URL.
+extract_url_features_parallel(urls, workers, chunk_size) shards a large
+column across a process pool and reassembles the results in order.
+"""
+
+import json
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+
+IP_PATTERN = re.compile(r'\d+\.\d+\.\d+\.\d+')
+URL_SHORTENERS = ['bit.ly', 'tinyurl', 'goo.gl', 't.co']
+SHORTENER_PATTERN = re.compile('|'.join(re.escape(s) for s in URL_SHORTENERS))
+
+# Characters counted by the num_* features, in feature order
+COUNTED_CHARACTERS = {
+    'num_dots': '.',
+    'num_hyphens': '-',
+    'num_underscores': '_',
+    'num_slashes': '/',
+    'num_question_marks': '?',
+    'num_equals': '=',
+    'num_at': '@',
+    'num_ampersand': '&',
+    'num_hash': '#',
+    'num_percent': '%',
+}
+
+# Bump when a feature definition or the order below changes
+FEATURE_VERSION = 1
+
+FEATURE_NAMES = [
+    'url_length', *COUNTED_CHARACTERS,
+    'num_digits', 'num_letters', 'digit_ratio',
+    'has_https', 'has_http', 'has_ip',
+    'domain_length', 'path_length', 'num_subdomains', 'has_port',
+    'has_double_slash_in_path', 'has_shortened_url',
+]
+
+FEATURE_NAMES_PATH = 'models/preprocessors/phishing_feature_names.json'
+
+# URLs are processed in slices of this many rows to bound the byte buffer
+BATCH_SLICE = 100_000
+
+# Rows per task sent to each worker by extract_url_features_parallel
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+def _url_components(url):
+    """(domain_length, path_length, num_subdomains, has_port) for one URL"""
+    try:
+        parsed = urlparse(url)
+        netloc = parsed.netloc
+        return (
+            len(netloc),
+            len(parsed.path),
+            netloc.count('.') - 1 if '.' in netloc else 0,
+            int(':' in netloc and not netloc.startswith('[')),
+        )
+    except Exception:
+        return (0, 0, 0, 0)
+
+
+def extract_url_features(url):
+    """Extract meaningful features from a URL for phishing detection"""
+
+    features = {}
+
+    # Basic metrics
+    features['url_length'] = len(url)
+    for name, char in COUNTED_CHARACTERS.items():
+        features[name] = url.count(char)
+
+    # Character analysis
+    features['num_digits'] = sum(c.isdigit() for c in url)
+    features['num_letters'] = sum(c.isalpha() for c in url)
+    features['digit_ratio'] = features['num_digits'] / len(url) if len(url) > 0 else 0
+
+    # Protocol and security
+    features['has_https'] = int(url.startswith('https://'))
+    features['has_http'] = int(url.startswith('http://'))
+
+    # IP address in URL (suspicious)
+    features['has_ip'] = int(bool(IP_PATTERN.search(url)))
+
+    # Parse URL components
+    (features['domain_length'], features['path_length'],
+     features['num_subdomains'], features['has_port']) = _url_components(url)
+
+    # Suspicious patterns
+    features['has_double_slash_in_path'] = int('//' in url[8:])  # After protocol
+    features['has_shortened_url'] = int(bool(SHORTENER_PATTERN.search(url)))
+
+    return features
+
+
+def _count_characters(urls, is_ascii):
+    """
+    Character counts for a list of URLs via one contiguous byte buffer.
+
+    The punctuation counts are exact on the UTF-8 bytes of any URL, since
+    ASCII bytes never occur inside multi-byte sequences. Digits and letters
+    use str.isdigit/str.isalpha semantics, so URLs with non-ASCII characters
+    are counted per URL for those two.
+    """
+    encoded = [url.encode('utf-8', 'surrogatepass') for url in urls]
+    lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+    buffer = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+
+    def per_url(mask):
+        totals = np.concatenate(([0], np.cumsum(mask, dtype=np.int64)))
+        return totals[ends] - totals[starts]
+
+    counts = {
+        name: per_url(buffer == ord(char))
+        for name, char in COUNTED_CHARACTERS.items()
+    }
+    counts['num_digits'] = per_url((buffer >= ord('0')) & (buffer <= ord('9')))
+    lower = buffer | 0x20  # ASCII letters fold to lowercase
+    counts['num_letters'] = per_url((lower >= ord('a')) & (lower <= ord('z')))
+
+    for i in np.flatnonzero(~is_ascii):
+        counts['num_digits'][i] = sum(map(str.isdigit, urls[i]))
+        counts['num_letters'][i] = sum(map(str.isalpha, urls[i]))
+    return counts
+
+
+def _extract_slice(urls):
+    """Features for a list of string URLs, as a dict of NumPy columns"""
+    n = len(urls)
+    series = pd.Series(urls, dtype=object)
+    lengths = series.str.len().to_numpy(dtype=np.int64)
+
+    columns = {'url_length': lengths}
+
+    is_ascii = np.fromiter((url.isascii() for url in urls), dtype=bool, count=n)
+    columns.update(_count_characters(urls, is_ascii))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        columns['digit_ratio'] = np.where(lengths > 0, columns['num_digits'] / lengths, 0)
+
+    columns['has_https'] = series.str.startswith('https://').to_numpy(dtype=np.int64)
+    columns['has_http'] = series.str.startswith('http://').to_numpy(dtype=np.int64)
+    columns['has_ip'] = series.str.contains(IP_PATTERN).to_numpy(dtype=np.int64)
+
+    components = np.array([_url_components(url) for url in urls], dtype=np.int64).reshape(n, 4)
+    columns['domain_length'] = components[:, 0]
+    columns['path_length'] = components[:, 1]
+    columns['num_subdomains'] = components[:, 2]
+    columns['has_port'] = components[:, 3]
+
+    columns['has_double_slash_in_path'] = series.str[8:].str.contains('//', regex=False).to_numpy(dtype=np.int64)
+    columns['has_shortened_url'] = series.str.contains(SHORTENER_PATTERN).to_numpy(dtype=np.int64)
+
+    return columns
+
+
+def extract_url_features_batch(urls):
+    """
+    Extract features for many URLs in one call.
+
+    Accepts a Series, list or array of URLs and returns a DataFrame with
+    FEATURE_NAMES columns, indexed like the input. Entries that are not
+    strings (e.g. missing URLs) are dropped, matching what the per-row
+    loop skipped.
+    """
+    series = urls if isinstance(urls, pd.Series) else pd.Series(list(urls), dtype=object)
+    valid = series.map(lambda url: isinstance(url, str)).to_numpy(dtype=bool)
+    series = series[valid]
+    values = series.tolist()
+
+    parts = []
+    for start in range(0, len(values), BATCH_SLICE):
+        columns = _extract_slice(values[start:start + BATCH_SLICE])
+        parts.append(pd.DataFrame(columns, columns=FEATURE_NAMES))
+
+    if not parts:
+        return pd.DataFrame(columns=FEATURE_NAMES, index=series.index)
+
+    features = pd.concat(parts, ignore_index=True)
+    features.index = series.index
+    return features
+
+
+def extract_one(url):
+    """Feature vector for a single URL, in FEATURE_NAMES order"""
+    features = extract_url_features(url)
+    return np.array([features[name] for name in FEATURE_NAMES], dtype=np.float64)
+
+
+def extract_batch(urls):
+    """
+    Feature matrix for many URLs, shape (len(urls), len(FEATURE_NAMES)).
+
+    Unlike extract_url_features_batch() every input gets a row: entries
+    that are not strings are scored as an empty URL (all zeros).
+    """
+    values = [url if isinstance(url, str) else '' for url in urls]
+    matrix = np.empty((len(values), len(FEATURE_NAMES)), dtype=np.float64)
+
+    for start in range(0, len(values), BATCH_SLICE):
+        columns = _extract_slice(values[start:start + BATCH_SLICE])
+        stop = start + len(columns['url_length'])
+        for j, name in enumerate(FEATURE_NAMES):
+            matrix[start:stop, j] = columns[name]
+
+    return matrix
+
+
+def features_frame(matrix, index=None):
+    """DataFrame for an extract_batch() matrix, with integer count columns"""
+    frame = pd.DataFrame(matrix, columns=FEATURE_NAMES, index=index)
+    integer_columns = [name for name in FEATURE_NAMES if name != 'digit_ratio']
+    frame[integer_columns] = frame[integer_columns].astype(np.int64)
+    return frame
+
+
+def load_feature_names(path=FEATURE_NAMES_PATH):
+    """Feature order saved by the training script"""
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def check_feature_names(names):
+    """Raise ValueError if a model was trained on a different feature order"""
+    if list(names) != FEATURE_NAMES:
+        raise ValueError(
+            f"Model features do not match phishing_features v{FEATURE_VERSION}: "
+            f"expected {FEATURE_NAMES}, got {list(names)}"
+        )
+
+
+def _pool_context():
+    """
+    Start method for the extraction pool, or None if pools can't be used.
+
+    The processing scripts run at module level, so start methods that
+    re-import __main__ in the workers (spawn, forkserver) would re-run
+    the whole script; only fork is safe here.
+    """
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return None
+
+
+def extract_url_features_parallel(urls, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    extract_url_features_batch() sharded across a process pool.
+
+    The URLs are split into chunks of `chunk_size` rows, extracted on
+    `workers` processes (default: all cores) and reassembled in input
+    order. Falls back to a single process when workers <= 1, when there
+    is only one chunk, or on platforms without fork.
+    """
+    series = urls if isinstance(urls, pd.Series) else pd.Series(list(urls), dtype=object)
+    workers = workers or os.cpu_count() or 1
+    context = _pool_context()
+
+    if workers <= 1 or len(series) <= chunk_size or context is None:
+        return extract_url_features_batch(series)
+
+    chunks = [series.iloc[start:start + chunk_size] for start in range(0, len(series), chunk_size)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=context) as executor:
+        parts = list(executor.map(extract_url_features_batch, chunks))
+
+    return pd.concat(parts)
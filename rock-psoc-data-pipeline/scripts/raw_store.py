@@ -0,0 +1,203 @@
+"""
+Typed columnar copies of the raw datasets
+Module: raw_store.py
+
+The downloader writes each raw CSV once to Parquet with an explicit
+schema (compact numeric types, categoricals, real dates). Downstream
+scripts load the Parquet copy with column projection instead of
+re-parsing the CSV and re-inferring dtypes on every stage.
+
+If pyarrow is not installed, or a Parquet copy has not been written yet,
+the loaders fall back to the CSV with the same dtypes applied.
+"""
+
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+RAW_DIR = 'data/raw'
+
+NSL_KDD_CSV = f'{RAW_DIR}/nsl_kdd_train.csv'
+NSL_KDD_PARQUET = f'{RAW_DIR}/nsl_kdd_train.parquet'
+NSL_KDD_TEST_CSV = f'{RAW_DIR}/nsl_kdd_test.csv'
+NSL_KDD_TEST_PARQUET = f'{RAW_DIR}/nsl_kdd_test.parquet'
+CISA_KEV_CSV = f'{RAW_DIR}/cisa_kev.csv'
+CISA_KEV_PARQUET = f'{RAW_DIR}/cisa_kev.parquet'
+PHISHING_CSV = f'{RAW_DIR}/phishing_urls.csv'
+PHISHING_PARQUET = f'{RAW_DIR}/phishing_urls.parquet'
+
+# New/changed CVEs since the previous sync (written by kev_sync.py)
+CISA_KEV_DELTA_CSV = f'{RAW_DIR}/cisa_kev_delta.csv'
+CISA_KEV_DELTA_PARQUET = f'{RAW_DIR}/cisa_kev_delta.parquet'
+
+# ============================================
+# SCHEMAS
+# ============================================
+
+# NSL-KDD files have no header row
+NSL_KDD_COLUMNS = [
+    'duration', 'protocol_type', 'service', 'flag', 'src_bytes', 'dst_bytes',
+    'land', 'wrong_fragment', 'urgent', 'hot', 'num_failed_logins',
+    'logged_in', 'num_compromised', 'root_shell', 'su_attempted',
+    'num_root', 'num_file_creations', 'num_shells', 'num_access_files',
+    'num_outbound_cmds', 'is_host_login', 'is_guest_login', 'count',
+    'srv_count', 'serror_rate', 'srv_serror_rate', 'rerror_rate',
+    'srv_rerror_rate', 'same_srv_rate', 'diff_srv_rate',
+    'srv_diff_host_rate', 'dst_host_count', 'dst_host_srv_count',
+    'dst_host_same_srv_rate', 'dst_host_diff_srv_rate',
+    'dst_host_same_src_port_rate', 'dst_host_srv_diff_host_rate',
+    'dst_host_serror_rate', 'dst_host_srv_serror_rate',
+    'dst_host_rerror_rate', 'dst_host_srv_rerror_rate',
+    'attack_type', 'difficulty'
+]
+
+NSL_KDD_CATEGORICAL = ['protocol_type', 'service', 'flag', 'attack_type']
+
+NSL_KDD_DTYPES = {
+    **{col: 'int32' for col in NSL_KDD_COLUMNS if not col.endswith('_rate')},
+    **{col: 'float32' for col in NSL_KDD_COLUMNS if col.endswith('_rate')},
+    **{col: 'category' for col in NSL_KDD_CATEGORICAL},
+    # Byte counters exceed the int32 range on a few records
+    'src_bytes': 'int64',
+    'dst_bytes': 'int64',
+    'difficulty': 'int8',
+}
+
+CISA_KEV_CATEGORICAL = ['vendorProject', 'product', 'knownRansomwareCampaignUse']
+CISA_KEV_DATES = ['dateAdded', 'dueDate']
+
+
+# ============================================
+# WRITERS (used by 1_download_datasets.py)
+# ============================================
+
+def _to_parquet(df, path):
+    if not HAS_PARQUET:
+        print("   ⚠️  pyarrow not installed - skipping columnar copy")
+        return False
+    df.to_parquet(path, index=False)
+    return True
+
+
+def convert_nsl_kdd(csv_path=NSL_KDD_CSV, parquet_path=NSL_KDD_PARQUET):
+    """Write the typed Parquet copy of an NSL-KDD CSV and return the DataFrame"""
+    df = pd.read_csv(csv_path, header=None, names=NSL_KDD_COLUMNS, dtype=NSL_KDD_DTYPES)
+    _to_parquet(df, parquet_path)
+    return df
+
+
+def convert_cisa_kev(vulnerabilities, csv_path=CISA_KEV_CSV, parquet_path=CISA_KEV_PARQUET):
+    """Write the CSV and typed Parquet copies of the KEV feed's vulnerability list"""
+    return save_cisa_kev(pd.DataFrame(vulnerabilities), csv_path, parquet_path)
+
+
+def save_cisa_kev(df, csv_path, parquet_path):
+    """Write a KEV DataFrame as CSV plus a typed Parquet copy"""
+    df.to_csv(csv_path, index=False)
+    _to_parquet(_apply_cisa_dtypes(df), parquet_path)
+    return df
+
+
+def convert_phishing(csv_path=PHISHING_CSV, parquet_path=PHISHING_PARQUET):
+    """Write the Parquet copy of the phishing dataset and return the DataFrame"""
+    df = pd.read_csv(csv_path)
+    _to_parquet(df, parquet_path)
+    return df
+
+
+def _apply_cisa_dtypes(df):
+    df = df.copy()
+    for col in CISA_KEV_DATES:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    for col in CISA_KEV_CATEGORICAL:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
+
+
+# ============================================
+# LOADERS (used by the processing and training scripts)
+# ============================================
+
+def _use_parquet(parquet_path, csv_path):
+    """Prefer the Parquet copy unless the CSV has been replaced since"""
+    if not HAS_PARQUET or not os.path.exists(parquet_path):
+        return False
+    if os.path.exists(csv_path) and os.path.getmtime(csv_path) > os.path.getmtime(parquet_path):
+        return False
+    return True
+
+
+def load_nsl_kdd(columns=None, csv_path=NSL_KDD_CSV, parquet_path=NSL_KDD_PARQUET):
+    """Load NSL-KDD with named, typed columns (optionally only `columns`)"""
+    if _use_parquet(parquet_path, csv_path):
+        return pd.read_parquet(parquet_path, columns=columns)
+
+    dtypes = {col: NSL_KDD_DTYPES[col] for col in (columns or NSL_KDD_COLUMNS)}
+    return pd.read_csv(csv_path, header=None, names=NSL_KDD_COLUMNS,
+                       usecols=columns, dtype=dtypes)[columns or NSL_KDD_COLUMNS]
+
+
+def load_nsl_kdd_all(columns=None):
+    """KDDTrain+ and KDDTest+ (if downloaded) as one frame with shared categories"""
+    frames = [load_nsl_kdd(columns)]
+    if os.path.exists(NSL_KDD_TEST_CSV) or os.path.exists(NSL_KDD_TEST_PARQUET):
+        frames.append(load_nsl_kdd(columns, NSL_KDD_TEST_CSV, NSL_KDD_TEST_PARQUET))
+
+    # Each file has its own category set; concat falls back to object for those
+    df = pd.concat(frames, ignore_index=True)
+    for col in NSL_KDD_CATEGORICAL:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
+
+
+def iter_nsl_kdd_chunks(csv_path, columns=None, chunksize=50_000):
+    """Stream an NSL-KDD format CSV in typed chunks with bounded memory"""
+    dtypes = {col: NSL_KDD_DTYPES[col] for col in (columns or NSL_KDD_COLUMNS)}
+    # Categoricals are inferred per chunk, which would cost more than it
+    # saves on small chunks - read them as plain strings here
+    dtypes = {col: ('object' if dtype == 'category' else dtype) for col, dtype in dtypes.items()}
+    reader = pd.read_csv(csv_path, header=None, names=NSL_KDD_COLUMNS,
+                         usecols=columns, dtype=dtypes, chunksize=chunksize)
+    for chunk in reader:
+        yield chunk[columns] if columns else chunk
+
+
+def load_cisa_kev(columns=None, csv_path=CISA_KEV_CSV, parquet_path=CISA_KEV_PARQUET):
+    """Load the CISA KEV catalog with dates parsed and categoricals applied"""
+    if _use_parquet(parquet_path, csv_path):
+        return pd.read_parquet(parquet_path, columns=columns)
+
+    df = pd.read_csv(csv_path, usecols=columns)
+    return _apply_cisa_dtypes(df)
+
+
+def load_cisa_kev_delta(columns=None):
+    """Load the CVEs added or changed by the last sync (with a 'change' column)"""
+    if not os.path.exists(CISA_KEV_DELTA_CSV):
+        raise FileNotFoundError(f"{CISA_KEV_DELTA_CSV} not found - run 1_download_datasets.py")
+
+    header = pd.read_csv(CISA_KEV_DELTA_CSV, nrows=0).columns
+    if len(header) <= 1:
+        # Empty delta - nothing new since the previous sync
+        return pd.DataFrame(columns=['change'] + list(columns or []))
+
+    columns = ['change'] + [col for col in columns if col != 'change'] if columns else None
+    return load_cisa_kev(columns=columns, csv_path=CISA_KEV_DELTA_CSV,
+                         parquet_path=CISA_KEV_DELTA_PARQUET)
+
+
+def load_phishing(columns=None, csv_path=PHISHING_CSV, parquet_path=PHISHING_PARQUET):
+    """Load the phishing URL dataset"""
+    if _use_parquet(parquet_path, csv_path):
+        return pd.read_parquet(parquet_path, columns=columns)
+
+    return pd.read_csv(csv_path, usecols=columns)
@@ -0,0 +1,110 @@
+"""
+Reading and writing processed record files (JSON array or JSON Lines)
+Module: record_io.py
+
+Processing scripts can write their outputs as JSON Lines (one compact
+record per line, written as it is produced) instead of one indented JSON
+array. Readers stream either format record by record, and pick the
+.jsonl variant of a path automatically when it is the newer file.
+"""
+
+import json
+import os
+
+
+def as_jsonl(path):
+    """data/processed/x.json -> data/processed/x.jsonl"""
+    root, _ = os.path.splitext(path)
+    return f"{root}.jsonl"
+
+
+def output_path(json_path, fmt):
+    """Output path for a processing script given --format json|jsonl"""
+    return as_jsonl(json_path) if fmt == 'jsonl' else json_path
+
+
+class RecordWriter:
+    """
+    Incremental writer for a JSON array or JSON Lines file.
+
+        with RecordWriter(path) as writer:
+            for record in records:
+                writer.write(record)
+
+    `indent` indents the records of a JSON array the way
+    json.dump(records, f, indent=indent) would (JSON Lines stay compact).
+    """
+
+    def __init__(self, path, indent=None):
+        self.path = path
+        self.lines = path.endswith('.jsonl')
+        self.indent = indent
+        self.count = 0
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, 'w')
+        if not self.lines:
+            self._file.write('[')
+        return self
+
+    def write(self, record):
+        if self.lines:
+            self._file.write(json.dumps(record) + '\n')
+        else:
+            text = json.dumps(record, indent=self.indent)
+            if self.indent:
+                pad = ' ' * self.indent
+                text = pad + text.replace('\n', '\n' + pad)
+            self._file.write(('\n' if self.count == 0 else ',\n') + text)
+        self.count += 1
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self.lines:
+            self._file.write('\n]\n')
+        self._file.close()
+        return False
+
+
+def write_records(path, records):
+    """Write an iterable of records, returning how many were written"""
+    with RecordWriter(path) as writer:
+        for record in records:
+            writer.write(record)
+    return writer.count
+
+
+def write_frame(path, df, chunksize=10_000):
+    """Write a DataFrame as records, in chunks when the target is JSON Lines"""
+    if not path.endswith('.jsonl'):
+        df.to_json(path, orient='records', indent=2)
+        return len(df)
+
+    with open(path, 'w') as f:
+        for start in range(0, len(df), chunksize):
+            text = df.iloc[start:start + chunksize].to_json(orient='records', lines=True)
+            f.write(text if text.endswith('\n') else text + '\n')
+    return len(df)
+
+
+def resolve_input(json_path):
+    """Prefer the .jsonl variant of a path if it exists and is at least as new"""
+    jsonl_path = as_jsonl(json_path)
+    if not os.path.exists(jsonl_path):
+        return json_path
+    if os.path.exists(json_path) and os.path.getmtime(json_path) > os.path.getmtime(jsonl_path):
+        return json_path
+    return jsonl_path
+
+
+def iter_records(path):
+    """Yield records from a JSON array or JSON Lines file"""
+    if path.endswith('.jsonl'):
+        with open(path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+    else:
+        with open(path, 'r') as f:
+            yield from json.load(f)
@@ -0,0 +1,133 @@
+"""
+Closed-form KEV risk score
+Module: risk_scoring.py
+
+The vulnerability risk score is a fixed formula over four components:
+
+    urgency     has a due date (20) + up to 20 for a close due date   (0-40)
+    recency     up to 30 for a recently added CVE                     (0-30)
+    ransomware  known ransomware campaign use                         (0/20)
+    complexity  description length / 50                               (0-10)
+
+    risk_score = clip(urgency + recency + ransomware + complexity, 0, 100)
+    severity   = Low [0, 33], Medium (33, 66], High (66, 100]
+
+6_train_vulnerability_scoring.py uses it as the regression target, and
+10_score_vulnerabilities.py rescores the whole catalog with it. It is one
+NumPy pass over the columns (no model to load), so tens of thousands of
+CVEs take milliseconds:
+
+    features = kev_features(df, risk_inputs_only=True)   # from the raw KEV columns
+    scores = risk_score(features)                        # float64 array, 0-100
+    labels = severity_labels(scores)
+
+A missing input column, or a missing value in one row, scores its
+component's fallback points.
+"""
+
+import numpy as np
+import pandas as pd
+
+RISK_INPUTS = ('has_due_date', 'days_until_due', 'days_since_added', 'is_ransomware', 'description_length')
+FALLBACK_POINTS = {'urgency': 20.0, 'recency': 15.0, 'ransomware': 0.0, 'complexity': 5.0}
+SEVERITY_BINS = [0, 33, 66, 100]
+SEVERITY_LABELS = ['Low', 'Medium', 'High']
+NO_DUE_DATE_DAYS = 999  # days_until_due without a due date: far future
+
+
+def kev_features(df, now=None, risk_inputs_only=False):
+    """
+    Numeric features of the raw KEV columns present in `df` (vectorized;
+    one column per feature). With `risk_inputs_only`, just the RISK_INPUTS
+    the formula needs - the word count is most of the cost of the rest.
+    """
+    now = pd.Timestamp.now() if now is None else pd.Timestamp(now)
+    features = pd.DataFrame(index=df.index)
+
+    if 'dateAdded' in df.columns:
+        added = pd.to_datetime(df['dateAdded'], errors='coerce')
+        features['days_since_added'] = (now - added).dt.days
+        if not risk_inputs_only:
+            features['month_added'] = added.dt.month
+            features['year_added'] = added.dt.year
+
+    if 'dueDate' in df.columns:
+        due = pd.to_datetime(df['dueDate'], errors='coerce')
+        features['has_due_date'] = due.notna().astype(int)
+        features['days_until_due'] = (due - now).dt.days.fillna(NO_DUE_DATE_DAYS)
+
+    # Missing text counts as empty
+    if 'shortDescription' in df.columns:
+        description = df['shortDescription'].fillna('').astype(str)
+        features['description_length'] = description.str.len()
+        if not risk_inputs_only:
+            features['description_words'] = description.str.count(r'\S+')
+
+    if 'vulnerabilityName' in df.columns and not risk_inputs_only:
+        features['vuln_name_length'] = df['vulnerabilityName'].fillna('').astype(str).str.len()
+
+    if 'knownRansomwareCampaignUse' in df.columns:
+        # astype(str) first: the Parquet copy stores this column as a category
+        features['is_ransomware'] = (
+            df['knownRansomwareCampaignUse'].astype(str).str.lower() == 'known'
+        ).astype(int)
+
+    return features
+
+
+def _column(features, name):
+    """float64 array of one input (None if absent); `features` is a DataFrame or a dict"""
+    if name not in features:
+        return None
+    return np.atleast_1d(np.asarray(features[name], dtype=np.float64))
+
+
+def _with_fallback(points, name):
+    return np.where(np.isnan(points), FALLBACK_POINTS[name], points)
+
+
+def risk_components(features):
+    """
+    Points per component as {name: float64 array}. `features` is a
+    DataFrame, or a dict of arrays / scalars (one record) for online scoring.
+    """
+    inputs = {name: _column(features, name) for name in RISK_INPUTS}
+    present = [values for values in inputs.values() if values is not None]
+    n_rows = len(present[0]) if present else (len(features) if isinstance(features, pd.DataFrame) else 1)
+    components = {name: np.full(n_rows, points) for name, points in FALLBACK_POINTS.items()}
+
+    has_due_date = inputs['has_due_date']
+    if has_due_date is not None:
+        days_until_due = inputs['days_until_due']
+        if days_until_due is None:
+            days_until_due = np.full(n_rows, float(NO_DUE_DATE_DAYS))
+        components['urgency'] = _with_fallback(
+            has_due_date * 20 + np.clip(30 - days_until_due / 10, 0, 20), 'urgency')
+
+    days_since_added = inputs['days_since_added']
+    if days_since_added is not None:
+        components['recency'] = _with_fallback(np.clip(30 - days_since_added / 20, 0, 30), 'recency')
+
+    is_ransomware = inputs['is_ransomware']
+    if is_ransomware is not None:
+        components['ransomware'] = _with_fallback(is_ransomware * 20, 'ransomware')
+
+    description_length = inputs['description_length']
+    if description_length is not None:
+        components['complexity'] = _with_fallback(np.clip(description_length / 50, 0, 10), 'complexity')
+
+    return components
+
+
+def risk_score(features):
+    """Risk score 0-100 per row"""
+    return np.clip(sum(risk_components(features).values()), 0, 100)
+
+
+def severity_codes(scores):
+    """Index into SEVERITY_LABELS per score (the bins of pd.cut with include_lowest)"""
+    return np.searchsorted(SEVERITY_BINS[1:-1], np.asarray(scores, dtype=np.float64), side='left')
+
+
+def severity_labels(scores):
+    return np.asarray(SEVERITY_LABELS, dtype=object)[severity_codes(scores)]
@@ -0,0 +1,54 @@
+"""
+Small helpers for reporting runtime resource usage
+Module: runtime_stats.py
+"""
+
+import importlib
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None if unavailable"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in KB on Linux and bytes on macOS
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+def format_peak_rss():
+    peak = peak_rss_mb()
+    return f"{peak:,.0f} MB" if peak is not None else "n/a"
+
+
+def import_modules(names):
+    """
+    Import `names` (skipping any already loaded) and return {name: seconds}
+    for the ones this call actually imported.
+    """
+    seconds = {}
+    for name in names:
+        if name in sys.modules:
+            continue
+        started = time.perf_counter()
+        importlib.import_module(name)
+        seconds[name] = time.perf_counter() - started
+    return seconds
+
+
+def format_import_report(seconds):
+    """'tensorflow 4.7s, xgboost 0.4s (peak RSS 850 MB)' for import_modules() output"""
+    imported = ', '.join(f"{name} {elapsed:.1f}s" for name, elapsed in seconds.items()) or 'none'
+    return f"{imported} (peak RSS {format_peak_rss()})"
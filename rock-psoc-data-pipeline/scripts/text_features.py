@@ -0,0 +1,83 @@
+"""
+Hashed TF-IDF text features for the CISA KEV catalog
+Module: text_features.py
+
+Used by `6_train_vulnerability_scoring.py --text-features`. The KEV
+vulnerability names and short descriptions are tokenized into word
+unigrams and bigrams, hashed into `n_buckets` columns (sklearn's
+HashingVectorizer: MurmurHash3, the same column in every process and no
+vocabulary to store or grow) and TF-IDF weighted. Only buckets used by at
+least `min_df` training documents are kept as columns, so histogram
+XGBoost and the forests do not scan thousands of all-zero columns.
+Everything stays a scipy CSR matrix: a description touches a few dozen
+buckets, so tens of thousands of CVEs fit in a few MB, and XGBoost and
+sklearn's forests train on the sparse matrix directly.
+
+    vectorizer = KevTextVectorizer(n_buckets=2 ** 16).fit(kev_text(df))
+    X = stack_features(X_numeric, vectorizer.transform(kev_text(df)))   # CSR
+"""
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+
+DEFAULT_TEXT_BUCKETS = 2 ** 16
+DEFAULT_MIN_DF = 2
+TEXT_COLUMNS = ['vulnerabilityName', 'shortDescription']
+
+
+def kev_text(df, columns=TEXT_COLUMNS):
+    """One document per row: the text columns present in `df`, joined"""
+    present = [col for col in columns if col in df.columns]
+    if not present:
+        raise ValueError(f"none of the text columns {columns} are present")
+    text = df[present[0]].fillna('').astype(str)
+    for col in present[1:]:
+        text = text + ' ' + df[col].fillna('').astype(str)
+    return text
+
+
+class KevTextVectorizer:
+    """
+    Hashed word n-gram counts with TF-IDF weighting. fit() learns only
+    which buckets to keep and their IDF weights; the hashing itself needs
+    no vocabulary.
+    """
+
+    def __init__(self, n_buckets=DEFAULT_TEXT_BUCKETS, ngram_range=(1, 2), min_df=DEFAULT_MIN_DF):
+        self.n_buckets = n_buckets
+        self.ngram_range = ngram_range
+        self.min_df = min_df
+        self.hasher = HashingVectorizer(
+            n_features=n_buckets,
+            ngram_range=ngram_range,
+            alternate_sign=False,  # counts, so TF-IDF weights stay non-negative
+            norm=None,
+            dtype=np.float32,
+        )
+        self.tfidf = TfidfTransformer(sublinear_tf=True)
+        self.buckets_ = None
+
+    @property
+    def n_features(self):
+        return len(self.buckets_)
+
+    def fit(self, texts):
+        self.fit_transform(texts)
+        return self
+
+    def transform(self, texts):
+        """CSR matrix (len(texts) x n_features), float32, rows L2-normalized"""
+        counts = self.hasher.transform(texts)[:, self.buckets_]
+        return self.tfidf.transform(counts).astype(np.float32).tocsr()
+
+    def fit_transform(self, texts):
+        counts = self.hasher.transform(texts).tocsc()
+        self.buckets_ = np.flatnonzero(counts.getnnz(axis=0) >= self.min_df)
+        counts = counts[:, self.buckets_].tocsr()
+        return self.tfidf.fit_transform(counts).astype(np.float32).tocsr()
+
+
+def stack_features(X_numeric, X_text):
+    """[numeric columns | text columns] as one float32 CSR matrix"""
+    return sp.hstack([sp.csr_matrix(np.asarray(X_numeric, dtype=np.float32)), X_text], format='csr')
@@ -0,0 +1,187 @@
+"""
+Concurrent model training under an explicit CPU budget
+Module: training_scheduler.py
+
+The training scripts fit Random Forest, XGBoost and Keras models. Each
+of those would happily use every core (n_jobs=-1, XGBoost's default
+threads, TensorFlow's default pools), so running them side by side
+without limits oversubscribes the machine. The scheduler splits a CPU
+budget between the jobs by weight, hands each fit function its thread
+allotment, and runs the jobs concurrently in threads (the heavy lifting
+happens in native code that releases the GIL).
+
+    jobs = [
+        TrainingJob('Random Forest', fit_rf, weight=2),   # fit_rf(threads) -> model
+        TrainingJob('XGBoost', fit_xgb, weight=2),
+        TrainingJob('Neural Network', fit_nn, weight=1, uses_tensorflow=True),
+    ]
+    models, report = run_jobs(jobs, cpu_budget=8)
+    print_report(report)
+
+The scripts' --models flag (parse_models) selects which model families
+to train; MODEL_FRAMEWORKS lists the heavy imports each one needs, so
+an RF-only run never loads TensorFlow or XGBoost.
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MODEL_KEYS = ('rf', 'xgb', 'nn')
+
+# Imported only when the model family is selected
+MODEL_FRAMEWORKS = {
+    'rf': [],
+    'xgb': ['xgboost'],
+    'nn': ['tensorflow'],
+}
+
+
+def parse_models(value):
+    """argparse type for --models: 'nn,rf' -> ['rf', 'nn'] (MODEL_KEYS order)"""
+    models = {model.strip() for model in value.split(',') if model.strip()}
+    unknown = sorted(models - set(MODEL_KEYS))
+    if unknown or not models:
+        raise argparse.ArgumentTypeError(
+            f"expected a comma-separated subset of {','.join(MODEL_KEYS)}, got '{value}'")
+    return [model for model in MODEL_KEYS if model in models]
+
+
+def frameworks_for(models):
+    """Heavy modules needed to train `models` (--models keys)"""
+    return [name for model in models for name in MODEL_FRAMEWORKS[model]]
+
+
+class TrainingJob:
+    """One model fit: `fit(threads)` builds and trains the model and returns it"""
+
+    def __init__(self, name, fit, weight=1.0, uses_tensorflow=False):
+        self.name = name
+        self.fit = fit
+        self.weight = weight
+        self.uses_tensorflow = uses_tensorflow
+
+
+def allocate_threads(jobs, cpu_budget):
+    """
+    Split `cpu_budget` threads between jobs by weight (at least 1 each).
+    With more jobs than cores every job gets 1 thread, and run_jobs runs
+    at most `cpu_budget` of them at a time.
+    """
+    if len(jobs) >= cpu_budget:
+        return {job.name: 1 for job in jobs}
+
+    total_weight = sum(job.weight for job in jobs) or 1
+    threads = {job.name: max(1, int(cpu_budget * job.weight / total_weight)) for job in jobs}
+
+    # The 1-thread minimum can overshoot: take the excess back from the
+    # largest allotments
+    while sum(threads.values()) > cpu_budget:
+        largest = max(threads, key=threads.get)
+        threads[largest] -= 1
+
+    # Hand out cores lost to rounding down, heaviest jobs first
+    spare = cpu_budget - sum(threads.values())
+    for job in sorted(jobs, key=lambda job: -job.weight):
+        if spare <= 0:
+            break
+        threads[job.name] += 1
+        spare -= 1
+    return threads
+
+
+def configure_tensorflow(intra_op_threads, inter_op_threads=1):
+    """
+    Cap TensorFlow's thread pools. TensorFlow only accepts this before it
+    has run anything, so a later call is ignored.
+    """
+    import tensorflow as tf
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    except RuntimeError:
+        pass
+
+
+def _cpu_seconds():
+    times = os.times()
+    return times.user + times.system
+
+
+def run_jobs(jobs, cpu_budget=None, parallel=True):
+    """
+    Run every job and return ({name: model}, report).
+
+    The report has one entry per job (threads, wall_seconds, and, for
+    sequential runs, cpu_seconds and cpu_utilization) plus a 'total' entry
+    for the whole run. Per-job CPU is not measured for concurrent runs:
+    the process CPU clock cannot tell the jobs' native threads apart.
+    With parallel=False the jobs run one after another, each still
+    limited to its allotment. With more jobs than `cpu_budget`, at most
+    `cpu_budget` run at once and the rest wait in the queue.
+    """
+    cpu_budget = cpu_budget or os.cpu_count() or 1
+    threads = allocate_threads(jobs, cpu_budget)
+    workers = min(len(jobs), cpu_budget) if parallel else 1
+
+    # One process-wide TensorFlow pool: the TF jobs' allotments for
+    # intra-op work, one inter-op thread per TF job running at once. When
+    # jobs are queued, a TF job shares its 1-thread allotment with the
+    # other TF jobs instead
+    tf_jobs = [job for job in jobs if job.uses_tensorflow]
+    if tf_jobs:
+        queued = len(jobs) > workers
+        configure_tensorflow(1 if queued else sum(threads[job.name] for job in tf_jobs),
+                             inter_op_threads=1 if queued or not parallel else len(tf_jobs))
+
+    report = {job.name: {'threads': threads[job.name]} for job in jobs}
+
+    def run(job):
+        print(f"   ▶ {job.name}: started ({threads[job.name]} threads)")
+        started, cpu_started = time.perf_counter(), _cpu_seconds()
+        model = job.fit(threads[job.name])
+        wall = time.perf_counter() - started
+        report[job.name]['wall_seconds'] = wall
+        if not parallel:
+            # Process CPU time is only attributable to one job when it runs alone
+            cpu = _cpu_seconds() - cpu_started
+            report[job.name]['cpu_seconds'] = cpu
+            report[job.name]['cpu_utilization'] = cpu / (wall * threads[job.name])
+        print(f"   ✅ {job.name}: finished in {wall:.2f}s")
+        return model
+
+    started, cpu_started = time.perf_counter(), _cpu_seconds()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {job.name: executor.submit(run, job) for job in jobs}
+        models = {name: future.result() for name, future in futures.items()}
+    wall = time.perf_counter() - started
+    cpu = _cpu_seconds() - cpu_started
+
+    report['total'] = {
+        'threads': cpu_budget,
+        'concurrent_jobs': workers,
+        'wall_seconds': wall,
+        'cpu_seconds': cpu,
+        'cpu_utilization': cpu / (wall * cpu_budget),
+        'sum_of_job_seconds': sum(report[job.name]['wall_seconds'] for job in jobs),
+    }
+    return models, report
+
+
+def print_report(report):
+    print(f"\n   ⏱️  Training schedule:")
+    for name, entry in report.items():
+        if name == 'total':
+            continue
+        line = f"      {name}: {entry['wall_seconds']:.2f}s on {entry['threads']} threads"
+        if 'cpu_utilization' in entry:
+            line += f", CPU {entry['cpu_utilization']:.0%}"
+        print(line)
+
+    total = report['total']
+    print(f"      Total: {total['wall_seconds']:.2f}s wall "
+          f"(sum of jobs {total['sum_of_job_seconds']:.2f}s, {total['concurrent_jobs']} at a time), "
+          f"CPU {total['cpu_utilization']:.0%} of {total['threads']} cores")
+    if total['concurrent_jobs'] > 1:
+        print(f"      (per-model CPU is only measured with --sequential)")
@@ -0,0 +1,394 @@
+"""
+Flattened tree-ensemble export for low-latency scoring
+Module: tree_export.py
+
+Used by 9_export_tree_models.py. A saved Random Forest (sklearn) or
+XGBoost model (XGBClassifier / XGBRegressor / BoosterModel / Booster) is
+compiled into a handful of flat NumPy arrays covering every node of
+every tree:
+
+    feature[node], threshold[node]    the split: go right when x >= threshold
+    children[2 * node + right]        next node (leaves point to themselves)
+    missing_right[node]               where a NaN feature value goes
+    value[node]                       leaf output, one column per class
+
+All trees are walked at once, one level per step, so scoring one event
+is max-depth vectorized steps instead of a Python call per tree - and
+needs neither sklearn nor xgboost at inference time. Splits are compared
+in float32, the precision both libraries use, so the compiled model
+reproduces the original predictions (check_parity). Large batches are
+still scored faster by the libraries' own predict; the compiled form is
+for scoring events one at a time.
+
+XGBoost trained on a scipy sparse matrix (6_train_vulnerability_scoring.py
+--text-features) treats the entries absent from it - the zeros - as
+missing, not as 0.0. Compile such models with compile_model(model,
+sparse_input=True): zeros then take the missing-value branch as well.
+
+    compiled = compile_model(joblib.load('models/saved_models/phishing_detection/rf_model.pkl'))
+    compiled.save('models/saved_models/phishing_detection/rf_model_compiled.npz')
+    CompiledEnsemble.load(path).predict_one(x)   # class probabilities for one event
+"""
+
+import json
+import time
+
+import numpy as np
+
+DEFAULT_CHUNK_ROWS = 4096
+
+# XGBoost objectives -> transform from summed margins to outputs
+XGB_OUTPUTS = {
+    'binary:logistic': 'sigmoid',
+    'binary:logitraw': 'identity',
+    'multi:softprob': 'softmax',
+    'multi:softmax': 'softmax',
+    'reg:squarederror': 'identity',
+    'reg:absoluteerror': 'identity',
+    'reg:pseudohubererror': 'identity',
+}
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+def _softmax(z):
+    z = z - z.max(axis=-1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+def _float32_above(threshold):
+    """Smallest float32 t with (x32 > threshold) == (x32 >= t), for sklearn's x <= threshold splits"""
+    t = threshold.astype(np.float32)
+    below = t.astype(np.float64) <= threshold
+    t[below] = np.nextafter(t[below], np.float32(np.inf))
+    return t
+
+
+class CompiledEnsemble:
+    """
+    A tree ensemble as flat arrays (see the module docstring).
+    With `zero_is_missing`, 0.0 is routed like NaN.
+
+    `aggregate` is 'mean' (Random Forest) or 'sum' (boosting); `output`
+    turns the aggregated leaf values (plus `base`) into predictions:
+    'proba' / 'identity' / 'sigmoid' / 'softmax'.
+    """
+
+    def __init__(self, feature, threshold, children, missing_right, value, roots, max_depth,
+                 aggregate, output, base=0.0, classes=None, source=None, zero_is_missing=False):
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold, dtype=np.float32)
+        self.children = np.asarray(children, dtype=np.int32)
+        self.missing_right = np.asarray(missing_right, dtype=bool)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.max_depth = int(max_depth)
+        self.aggregate = aggregate
+        self.output = output
+        self.base = np.broadcast_to(np.asarray(base, dtype=np.float64), self.value.shape[1:]).copy()
+        self.classes = None if classes is None else np.asarray(classes)
+        self.source = source
+        self.zero_is_missing = bool(zero_is_missing)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @property
+    def is_classifier(self):
+        return self.output != 'identity' or self.classes is not None
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_trees(cls, trees, **kwargs):
+        """
+        Concatenate per-tree node arrays: (left, right, feature, threshold,
+        missing_right, value) with -1 children at leaves and thresholds
+        already in x >= threshold form.
+        """
+        features, thresholds, children, missing, values, roots, depths = [], [], [], [], [], [], []
+        offset = 0
+        for left, right, feature, threshold, missing_right, value in trees:
+            n = len(left)
+            is_leaf = left < 0
+            own = np.arange(n)
+            left = np.where(is_leaf, own, left) + offset
+            right = np.where(is_leaf, own, right) + offset
+
+            features.append(np.where(is_leaf, 0, feature))
+            thresholds.append(threshold)
+            children.append(np.column_stack([left, right]).ravel())
+            missing.append(missing_right)
+            values.append(value)
+            roots.append(offset)
+            depths.append(_tree_depth(left - offset, right - offset, is_leaf))
+            offset += n
+
+        return cls(np.concatenate(features), np.concatenate(thresholds), np.concatenate(children),
+                   np.concatenate(missing), np.concatenate(values), np.array(roots),
+                   max(depths, default=0), **kwargs)
+
+    @classmethod
+    def from_random_forest(cls, model):
+        """sklearn RandomForestClassifier / RandomForestRegressor (or ExtraTrees)"""
+        is_classifier = hasattr(model, 'classes_')
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise ValueError("multi-output forests are not supported")
+
+        trees = []
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            value = tree.value[:, 0, :].astype(np.float64)
+            if is_classifier:
+                # Per-tree class probabilities (older sklearn stores counts)
+                value = value / np.maximum(value.sum(axis=1, keepdims=True), 1e-300)
+            missing_left = getattr(tree, 'missing_go_to_left', None)
+            missing_right = (np.zeros(tree.node_count, dtype=bool) if missing_left is None
+                             else ~missing_left.astype(bool))
+            trees.append((tree.children_left, tree.children_right, tree.feature,
+                          _float32_above(tree.threshold), missing_right, value))
+
+        return cls.from_trees(
+            trees,
+            aggregate='mean',
+            output='proba' if is_classifier else 'identity',
+            classes=model.classes_ if is_classifier else None,
+            source=type(model).__name__,
+        )
+
+    @classmethod
+    def from_xgboost(cls, model, sparse_input=False):
+        """
+        XGBClassifier / XGBRegressor, xgb_training.BoosterModel or a raw
+        Booster. `sparse_input`: trained on a sparse matrix, whose absent
+        entries XGBoost treats as missing.
+        """
+        booster = model
+        if hasattr(model, 'get_booster'):
+            booster = model.get_booster()
+        elif hasattr(model, 'booster'):
+            booster = model.booster
+
+        dump = json.loads(booster.save_raw(raw_format='json'))
+        learner = dump['learner']
+        objective = learner['objective']['name']
+        if objective not in XGB_OUTPUTS:
+            raise ValueError(f"unsupported XGBoost objective '{objective}'")
+        if learner['gradient_booster']['name'] != 'gbtree':
+            raise ValueError("only gbtree boosters can be exported")
+
+        forest = learner['gradient_booster']['model']
+        tree_class = np.asarray(forest['tree_info'], dtype=np.int64)
+        n_outputs = int(tree_class.max()) + 1 if len(tree_class) else 1
+
+        trees = []
+        for tree, out in zip(forest['trees'], tree_class):
+            if int(tree['tree_param'].get('size_leaf_vector', '1')) > 1:
+                raise ValueError("vector-leaf (multi_strategy) trees are not supported")
+            left = np.asarray(tree['left_children'], dtype=np.int64)
+            conditions = np.asarray(tree['split_conditions'], dtype=np.float32)
+            # Leaves keep their value in split_conditions; each tree feeds one class
+            value = np.zeros((len(left), n_outputs))
+            value[:, out] = np.where(left < 0, conditions, 0.0)
+            trees.append((left, np.asarray(tree['right_children'], dtype=np.int64),
+                          np.asarray(tree['split_indices'], dtype=np.int64), conditions,
+                          ~np.asarray(tree['default_left'], dtype=bool), value))
+
+        output = XGB_OUTPUTS[objective]
+        classes = getattr(model, 'classes_', None)
+        if classes is None and output in ('sigmoid', 'softmax'):
+            classes = np.arange(max(2, n_outputs))
+        compiled = cls.from_trees(trees, aggregate='sum', output=output, classes=classes,
+                                  source=type(model).__name__, zero_is_missing=sparse_input)
+
+        # The intercept (base_score, in margin space) is whatever XGBoost adds
+        # on top of the leaf sums; measure it on one row instead of
+        # re-deriving each objective's link function. An all-missing row is
+        # routed the same way by both, whatever zero_is_missing is
+        n_features = booster.num_features()
+        probe = np.full((1, n_features), np.nan, dtype=np.float32)
+        margin = np.asarray(booster.inplace_predict(probe, predict_type='margin'), dtype=np.float64)
+        compiled.base = margin.reshape(-1)[:n_outputs] - compiled.decision(probe)[0]
+        return compiled
+
+    # ------------------------------------------------------------------
+    # Scoring
+    # ------------------------------------------------------------------
+
+    def _leaves(self, X):
+        """Leaf node per (row, tree) for a float32 batch"""
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_trees))
+        has_missing = self.zero_is_missing or np.isnan(X).any()
+        for _ in range(self.max_depth):
+            values = X[rows, self.feature[nodes]]
+            right = values >= self.threshold[nodes]
+            if has_missing:
+                missing = np.isnan(values)
+                if self.zero_is_missing:
+                    missing |= values == 0
+                right = np.where(missing, self.missing_right[nodes], right)
+            nodes = self.children[2 * nodes + right]
+        return nodes
+
+    def decision(self, X):
+        """Aggregated leaf values plus base, before the output transform: (n_rows, n_outputs)"""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        out = np.empty((len(X), self.value.shape[1]))
+        for start in range(0, len(X), DEFAULT_CHUNK_ROWS):
+            leaves = self._leaves(X[start:start + DEFAULT_CHUNK_ROWS])
+            total = self.value[leaves].sum(axis=1)
+            if self.aggregate == 'mean':
+                total /= self.n_trees
+            out[start:start + DEFAULT_CHUNK_ROWS] = total
+        return out + self.base
+
+    def _transform(self, raw):
+        if self.output == 'sigmoid':
+            p = _sigmoid(raw[..., 0])
+            return np.stack([1 - p, p], axis=-1)
+        if self.output == 'softmax':
+            return _softmax(raw)
+        return raw
+
+    def predict_proba(self, X):
+        if not self.is_classifier:
+            raise AttributeError("predict_proba is not available for regression ensembles")
+        return self._transform(self.decision(X))
+
+    def predict(self, X):
+        if not self.is_classifier:
+            return self.decision(X)[:, 0]
+        labels = self.predict_proba(X).argmax(axis=1)
+        return self.classes[labels] if self.classes is not None else labels
+
+    def predict_one(self, x):
+        """
+        Score one event (1-D feature vector): class probabilities for
+        classifiers, the predicted value for regressors. The per-event
+        streaming path: no batching or chunking, and no NaN routing (score
+        rows containing NaN with predict / predict_proba); zeros are
+        routed when zero_is_missing.
+        """
+        x = np.asarray(x, dtype=np.float32)
+        feature, threshold, children = self.feature, self.threshold, self.children
+        nodes = self.roots
+        # take() is markedly cheaper than fancy indexing on arrays this small
+        for _ in range(self.max_depth):
+            values = x.take(feature.take(nodes))
+            right = values >= threshold.take(nodes)
+            if self.zero_is_missing:
+                right = np.where(values == 0, self.missing_right.take(nodes), right)
+            nodes = children.take(2 * nodes + right)
+        total = self.value[nodes].sum(axis=0)
+        if self.aggregate == 'mean':
+            total /= self.n_trees
+        raw = total + self.base
+        return self._transform(raw) if self.is_classifier else raw[0]
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self, path):
+        meta = {'max_depth': self.max_depth, 'aggregate': self.aggregate,
+                'output': self.output, 'source': self.source, 'zero_is_missing': self.zero_is_missing}
+        arrays = dict(feature=self.feature, threshold=self.threshold, children=self.children,
+                      missing_right=self.missing_right, value=self.value, roots=self.roots,
+                      base=self.base, meta=np.array(json.dumps(meta)))
+        if self.classes is not None:
+            arrays['classes'] = self.classes
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            return cls(data['feature'], data['threshold'], data['children'], data['missing_right'],
+                       data['value'], data['roots'], meta['max_depth'], meta['aggregate'], meta['output'],
+                       base=data['base'], classes=data['classes'] if 'classes' in data else None,
+                       source=meta['source'], zero_is_missing=meta.get('zero_is_missing', False))
+
+
+def _tree_depth(left, right, is_leaf):
+    """Longest root-to-leaf path (edges) of one tree"""
+    depth = np.zeros(len(left), dtype=np.int64)
+    frontier, level = np.array([0]), 0
+    while len(frontier):
+        depth[frontier] = level
+        internal = frontier[~is_leaf[frontier]]
+        frontier = np.concatenate([left[internal], right[internal]])
+        level += 1
+    return int(depth.max())
+
+
+def compile_model(model, sparse_input=False):
+    """
+    CompiledEnsemble for a Random Forest or XGBoost model. `sparse_input`:
+    the model was trained on a scipy sparse matrix (only changes XGBoost,
+    whose absent entries are missing values; sklearn reads them as 0.0).
+    """
+    if hasattr(model, 'estimators_') and hasattr(model.estimators_[0], 'tree_'):
+        return CompiledEnsemble.from_random_forest(model)
+    if hasattr(model, 'get_booster') or hasattr(model, 'booster') or hasattr(model, 'save_raw'):
+        return CompiledEnsemble.from_xgboost(model, sparse_input=sparse_input)
+    raise TypeError(f"cannot compile {type(model).__name__}: expected a Random Forest or XGBoost model")
+
+
+def check_parity(model, compiled, X, rtol=1e-5, atol=1e-5):
+    """
+    Compare the compiled ensemble with the original model on rows X
+    (without NaN, which predict_one does not route): max absolute
+    difference of the probabilities (classifiers) or predictions
+    (regressors), whether the single-event path matches the batch path,
+    and label agreement for classifiers. A scipy sparse X is given to the
+    original model as is and to the compiled one densified, the way each
+    scores it in use.
+    """
+    X_model = X
+    if hasattr(X, 'toarray'):
+        X = X.toarray()
+    X = np.asarray(X, dtype=np.float32)
+    if not hasattr(X_model, 'toarray'):
+        X_model = X
+    if compiled.is_classifier:
+        expected, actual = np.asarray(model.predict_proba(X_model)), compiled.predict_proba(X)
+    else:
+        expected, actual = np.asarray(model.predict(X_model)).reshape(-1), compiled.predict(X)
+    one = np.array([compiled.predict_one(x) for x in X[:100]])
+
+    report = {
+        'rows': len(X),
+        'max_abs_diff': float(np.max(np.abs(expected - actual))),
+        'single_event_max_abs_diff': float(np.max(np.abs(one - actual[:len(one)]))),
+        'passed': bool(np.allclose(actual, expected, rtol=rtol, atol=atol)
+                       and np.allclose(one, actual[:len(one)], rtol=rtol, atol=atol)),
+    }
+    if compiled.is_classifier:
+        # Labels can only flip on exact probability ties, so this is reported, not required
+        report['label_agreement'] = float(np.mean(np.asarray(model.predict(X_model)).reshape(-1) == compiled.predict(X)))
+    return report
+
+
+def measure_latency(score, X, repeats=200):
+    """Median microseconds per call of score(x) over single rows of X"""
+    X = np.asarray(X, dtype=np.float32)
+    timings = []
+    for i in range(repeats):
+        x = X[i % len(X)]
+        started = time.perf_counter()
+        score(x)
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings) * 1e6)
@@ -0,0 +1,177 @@
+"""
+Persistent categorical vocabularies for the KEV vendor / product columns
+Module: vocabulary_store.py
+
+A LabelEncoder refit on every run numbers the categories alphabetically,
+so one new vendor shifts the codes of every vendor after it, and a vendor
+it has not seen cannot be encoded at all. A CategoryVocabulary is
+append-only instead: code 0 is the "unseen" bucket, every new value gets
+the next free code, and a code is never reassigned. The vocabularies are
+saved as one JSON file and reloaded by the next run, so retrained and
+online models see the same codes.
+
+    store = VocabularyStore.load('models/preprocessors/vulnerability_vocabularies.json')
+    vendors = store['vendor']
+    vendors.update(df['vendorProject'])               # appends new vendors only
+    df['vendor_encoded'] = vendors.transform(df['vendorProject'], encoding='frequency')
+    store.save()
+
+Encodings (all vectorized through a pandas Index lookup):
+    code       the stable integer code (0 for unseen values)
+    frequency  share of the rows counted by the last update() (0 for unseen)
+    target     smoothed mean target of the rows given to fit_target()
+               (the prior for unseen values); pass `exclude` with the
+               rows' own targets to leave them out when encoding training rows
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+UNSEEN = '<unseen>'
+UNSEEN_CODE = 0
+ENCODINGS = ('code', 'frequency', 'target')
+DEFAULT_SMOOTHING = 10.0
+VOCABULARY_PATH = 'models/preprocessors/vulnerability_vocabularies.json'
+KEV_CATEGORY_COLUMNS = {'vendor': 'vendorProject', 'product': 'product'}
+
+
+class CategoryVocabulary:
+    """Append-only value -> code mapping with per-code counts and target statistics"""
+
+    def __init__(self, smoothing=DEFAULT_SMOOTHING):
+        self.smoothing = smoothing
+        self.values = [UNSEEN]
+        self.counts = np.zeros(1, dtype=np.int64)
+        self.target_sums = np.zeros(1, dtype=np.float64)
+        self.target_counts = np.zeros(1, dtype=np.int64)
+        self.prior = 0.0
+        self._index = None
+
+    def __len__(self):
+        """Known values, not counting the unseen bucket"""
+        return len(self.values) - 1
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = pd.Index(self.values)
+        return self._index
+
+    def codes(self, values):
+        """Code for each value; unseen and missing values get UNSEEN_CODE"""
+        values = pd.Series(values, dtype=object)
+        codes = self.index.get_indexer(values.astype(str))
+        codes[values.isna().to_numpy() | (codes < 0)] = UNSEEN_CODE
+        return codes.astype(np.int64)
+
+    def update(self, values):
+        """
+        Append the values not seen before (sorted, so the codes do not
+        depend on row order) and recount every code from `values`.
+        Returns the number of new values.
+        """
+        values = pd.Series(values, dtype=object).dropna().astype(str)
+        new = sorted(set(values.unique()) - set(self.values))
+        if new:
+            self.values += new
+            self._index = None
+            self.target_sums = np.concatenate([self.target_sums, np.zeros(len(new))])
+            self.target_counts = np.concatenate([self.target_counts, np.zeros(len(new), dtype=np.int64)])
+        self.counts = np.bincount(self.codes(values), minlength=len(self.values)).astype(np.int64)
+        return len(new)
+
+    def fit_target(self, values, target):
+        """Per-code target sums and counts (from the training rows only)"""
+        codes = self.codes(values)
+        target = np.asarray(target, dtype=np.float64)
+        self.target_sums = np.bincount(codes, weights=target, minlength=len(self.values))
+        self.target_counts = np.bincount(codes, minlength=len(self.values)).astype(np.int64)
+        self.prior = float(target.mean()) if len(target) else 0.0
+        return self
+
+    def transform(self, values, encoding='code', exclude=None):
+        """Encoded `values` as a NumPy array (int64 codes, float64 otherwise)"""
+        codes = self.codes(values)
+        if encoding == 'code':
+            return codes
+        if encoding == 'frequency':
+            frequency = self.counts / max(1, self.counts.sum())
+            frequency[UNSEEN_CODE] = 0.0
+            return frequency[codes]
+        if encoding == 'target':
+            sums = self.target_sums[codes]
+            counts = self.target_counts[codes].astype(np.float64)
+            if exclude is not None:
+                # Leave-one-out: a training row does not see its own target
+                seen = counts > 0
+                sums = sums - np.where(seen, np.asarray(exclude, dtype=np.float64), 0.0)
+                counts = counts - seen
+            return (sums + self.smoothing * self.prior) / (counts + self.smoothing)
+        raise ValueError(f"unknown encoding {encoding!r} (expected one of {ENCODINGS})")
+
+    def to_dict(self):
+        return {
+            'smoothing': self.smoothing,
+            'prior': self.prior,
+            'values': self.values,
+            'counts': self.counts.tolist(),
+            'target_sums': self.target_sums.tolist(),
+            'target_counts': self.target_counts.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        vocabulary = cls(smoothing=data['smoothing'])
+        vocabulary.prior = data['prior']
+        vocabulary.values = list(data['values'])
+        vocabulary.counts = np.asarray(data['counts'], dtype=np.int64)
+        vocabulary.target_sums = np.asarray(data['target_sums'], dtype=np.float64)
+        vocabulary.target_counts = np.asarray(data['target_counts'], dtype=np.int64)
+        return vocabulary
+
+
+class VocabularyStore:
+    """Named vocabularies saved together in one JSON file"""
+
+    def __init__(self, path=VOCABULARY_PATH):
+        self.path = path
+        self.vocabularies = {}
+
+    def __getitem__(self, name):
+        if name not in self.vocabularies:
+            self.vocabularies[name] = CategoryVocabulary()
+        return self.vocabularies[name]
+
+    def __contains__(self, name):
+        return name in self.vocabularies
+
+    @classmethod
+    def load(cls, path=VOCABULARY_PATH):
+        """The saved store, or an empty one if there is none yet"""
+        store = cls(path)
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return store
+        store.vocabularies = {name: CategoryVocabulary.from_dict(vocabulary)
+                              for name, vocabulary in data['vocabularies'].items()}
+        return store
+
+    def save(self, path=None):
+        path = path or self.path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'vocabularies': {name: vocabulary.to_dict()
+                                        for name, vocabulary in self.vocabularies.items()}}, f)
+        os.replace(tmp_path, path)
+        return path
+
+    def transform_record(self, record, columns, encoding='code'):
+        """Encode one record (dict) for online scoring: {name: column} -> {'<name>_encoded': value}"""
+        return {f'{name}_encoded': self[name].transform([record.get(column)], encoding)[0].item()
+                for name, column in columns.items()}
@@ -0,0 +1,120 @@
+"""
+Histogram XGBoost with early stopping over cached quantized matrices
+Module: xgb_training.py
+
+Used by the training scripts' --xgb-hist mode (and by hyperparameter
+search). The default XGBClassifier/XGBRegressor fits run a fixed 100-200
+rounds with no eval set and re-quantize the features on every fit.
+Here the feature matrix is quantized once into a QuantileDMatrix (the
+validation matrix shares its bin edges), and every model trained on it -
+regression and classification targets, or one hyperparameter trial after
+another - only swaps the labels and stops when the validation metric has
+not improved for `early_stopping_rounds` rounds.
+
+    split = QuantizedSplit(X_train, X_val)
+    reg = split.train(hist_params('reg:squarederror'), y_train_reg, y_val_reg)
+    clf = split.train(hist_params('multi:softprob', num_class=3), y_train_clf, y_val_clf)
+    clf.predict(X_test), clf.predict_proba(X_test), clf.best_iteration
+"""
+
+import threading
+
+import numpy as np
+import xgboost as xgb
+
+DEFAULT_MAX_BIN = 256
+DEFAULT_MAX_ROUNDS = 1000
+DEFAULT_EARLY_STOPPING_ROUNDS = 20
+
+
+def hist_params(objective, num_class=None, **overrides):
+    """Booster parameters for the histogram tree method"""
+    params = {
+        'objective': objective,
+        'tree_method': 'hist',
+        'max_bin': DEFAULT_MAX_BIN,
+        'max_depth': 6,
+        'learning_rate': 0.1,
+        'seed': 42,
+        'verbosity': 0,
+    }
+    if num_class is not None:
+        params['num_class'] = num_class
+    params.update(overrides)
+    return params
+
+
+class BoosterModel:
+    """
+    Trained Booster with the sklearn-style predict / predict_proba the
+    training scripts evaluate with. Picklable with joblib.
+    """
+
+    def __init__(self, booster, objective):
+        self.booster = booster
+        self.objective = objective
+        self.best_iteration = booster.best_iteration if hasattr(booster, 'best_iteration') else None
+        self.best_score = booster.best_score if hasattr(booster, 'best_score') else None
+
+    @property
+    def n_rounds(self):
+        return self.booster.num_boosted_rounds()
+
+    def _raw_predict(self, X):
+        return self.booster.inplace_predict(X)
+
+    def predict_proba(self, X):
+        if self.objective.startswith('reg:'):
+            raise AttributeError("predict_proba is not available for regression boosters")
+        proba = self._raw_predict(X)
+        if proba.ndim == 1:  # binary:logistic -> P(class 1)
+            return np.column_stack([1 - proba, proba])
+        return proba
+
+    def predict(self, X):
+        if self.objective.startswith('reg:'):
+            return self._raw_predict(X)
+        return self.predict_proba(X).argmax(axis=1)
+
+
+class QuantizedSplit:
+    """
+    Training and validation features quantized once; labels are set per
+    model. Models trained on the same split run one at a time (the labels
+    live on the shared matrices), so concurrent callers simply queue.
+    """
+
+    def __init__(self, X_train, X_val, max_bin=DEFAULT_MAX_BIN, threads=None):
+        self.max_bin = max_bin
+        nthread = threads or -1
+        self.dtrain = xgb.QuantileDMatrix(X_train, max_bin=max_bin, nthread=nthread)
+        self.dval = xgb.QuantileDMatrix(X_val, ref=self.dtrain, nthread=nthread)
+        self._lock = threading.Lock()
+
+    def train(self, params, y_train, y_val, num_boost_round=DEFAULT_MAX_ROUNDS,
+              early_stopping_rounds=DEFAULT_EARLY_STOPPING_ROUNDS, threads=None, sample_weight=None):
+        """Fit one booster with early stopping on the validation matrix"""
+        params = {**params, 'max_bin': self.max_bin}
+        if threads:
+            params['nthread'] = threads
+
+        with self._lock:
+            self.dtrain.set_label(np.asarray(y_train))
+            self.dval.set_label(np.asarray(y_val))
+            # An empty weight vector means unweighted
+            self.dtrain.set_weight(np.asarray(sample_weight) if sample_weight is not None else np.empty(0))
+            booster = xgb.train(
+                params, self.dtrain,
+                num_boost_round=num_boost_round,
+                evals=[(self.dval, 'validation')],
+                early_stopping_rounds=early_stopping_rounds,
+                verbose_eval=False
+            )
+
+        # Keep only the trees up to the best validation round
+        best_iteration = booster.best_iteration
+        best_score = booster.best_score
+        booster = booster[:best_iteration + 1]
+        booster.best_iteration = best_iteration
+        booster.best_score = best_score
+        return BoosterModel(booster, params['objective'])